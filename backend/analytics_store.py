@@ -0,0 +1,345 @@
+"""
+Optional in-memory analytics engine.
+
+Completed sessions and their per-topic rows (session_themes) are loaded into NumPy
+column arrays, with topics and users interned to integer ids. Finished sessions are
+appended as they complete, and the prediction and retention endpoints run as
+vectorized group-bys over these arrays instead of SQL plus Python loops.
+
+Enable with KNOWMETRICS_ANALYTICS_ENGINE=memory. The store only sees sessions finished
+through this process, so use it with a single worker.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from database import tenant_router, DEFAULT_TENANT_ID, WRITER_SOCKET
+from models import StudySession, SessionTheme
+
+ANALYTICS_ENGINE = os.environ.get("KNOWMETRICS_ANALYTICS_ENGINE", "sql")
+LOAD_BATCH_SIZE = 50000
+INITIAL_CAPACITY = 1024
+
+EPOCH = datetime(1970, 1, 1)
+
+SESSION_COLUMNS = {
+    "session_id": np.int64,
+    "quiz_id": np.int32,
+    "user": np.int32,
+    "correct": np.int32,
+    "wrong": np.int32,
+    "total_time": np.float64,
+    "finished_at": np.float64,
+    "alive": np.bool_,
+}
+
+THEME_COLUMNS = {
+    "session_id": np.int64,
+    "quiz_id": np.int32,
+    "user": np.int32,
+    "topic": np.int32,
+    "correct": np.int32,
+    "wrong": np.int32,
+    "average_time": np.float64,
+    "finished_at": np.float64,
+    "alive": np.bool_,
+}
+
+
+def to_timestamp(value: Optional[datetime]) -> float:
+    """Naive UTC datetime to seconds since the epoch"""
+    return (value - EPOCH).total_seconds() if value else 0.0
+
+
+def from_timestamp(value: float) -> datetime:
+    return EPOCH + timedelta(seconds=float(value))
+
+
+class Interner:
+    """Maps strings to dense integer ids"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        index = self.ids.get(name)
+        if index is None:
+            index = len(self.names)
+            self.ids[name] = index
+            self.names.append(name)
+        return index
+
+    def get(self, name: str) -> Optional[int]:
+        return self.ids.get(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(name) for name in self.names) * 2 + len(self.names) * 16
+
+
+class ColumnTable:
+    """Growable set of equally sized NumPy columns (amortized doubling)"""
+
+    def __init__(self, dtypes: Dict[str, type], capacity: int = INITIAL_CAPACITY):
+        self.dtypes = dtypes
+        self.size = 0
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+
+    @property
+    def capacity(self) -> int:
+        return len(self.columns["alive"])
+
+    def append(self, rows: Dict[str, list]):
+        count = len(rows["alive"])
+        if count == 0:
+            return
+        needed = self.size + count
+        if needed > self.capacity:
+            capacity = max(needed, self.capacity * 2)
+            for name, column in self.columns.items():
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        for name, values in rows.items():
+            self.columns[name][self.size:needed] = values
+        self.size = needed
+
+    def view(self) -> Dict[str, np.ndarray]:
+        return {name: column[:self.size] for name, column in self.columns.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+
+def _empty_rows(dtypes: Dict[str, type]) -> Dict[str, list]:
+    return {name: [] for name in dtypes}
+
+
+class AnalyticsStore:
+    """Memory-resident columns of completed sessions and their topic rows"""
+
+    def __init__(self):
+        self.sessions = ColumnTable(SESSION_COLUMNS)
+        self.themes = ColumnTable(THEME_COLUMNS)
+        self.topics = Interner()
+        self.users = Interner()
+        self.loaded_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        """Bulk-load every completed session and its topic rows"""
+        session_query = db.query(
+            StudySession.id,
+            StudySession.quiz_id,
+            StudySession.user_id,
+            StudySession.correct_answers,
+            StudySession.wrong_answers,
+            StudySession.total_time,
+            StudySession.finished_at
+        ).filter(StudySession.is_completed == True).order_by(StudySession.id)
+
+        rows = _empty_rows(SESSION_COLUMNS)
+        for session in session_query.yield_per(LOAD_BATCH_SIZE):
+            self._add_session_row(rows, *session)
+            if len(rows["alive"]) >= LOAD_BATCH_SIZE:
+                self.sessions.append(rows)
+                rows = _empty_rows(SESSION_COLUMNS)
+        self.sessions.append(rows)
+
+        theme_query = db.query(
+            SessionTheme.session_id,
+            StudySession.quiz_id,
+            StudySession.user_id,
+            SessionTheme.topic,
+            SessionTheme.correct_answers,
+            SessionTheme.wrong_answers,
+            SessionTheme.average_time,
+            StudySession.finished_at
+        ).join(
+            StudySession, StudySession.id == SessionTheme.session_id
+        ).filter(StudySession.is_completed == True).order_by(SessionTheme.id)
+
+        rows = _empty_rows(THEME_COLUMNS)
+        for theme in theme_query.yield_per(LOAD_BATCH_SIZE):
+            self._add_theme_row(rows, *theme)
+            if len(rows["alive"]) >= LOAD_BATCH_SIZE:
+                self.themes.append(rows)
+                rows = _empty_rows(THEME_COLUMNS)
+        self.themes.append(rows)
+
+        self.loaded_at = datetime.utcnow()
+
+    def _add_session_row(self, rows, session_id, quiz_id, user_id, correct, wrong, total_time, finished_at):
+        rows["session_id"].append(session_id)
+        rows["quiz_id"].append(quiz_id)
+        rows["user"].append(self.users.intern(user_id))
+        rows["correct"].append(correct or 0)
+        rows["wrong"].append(wrong or 0)
+        rows["total_time"].append(total_time or 0.0)
+        rows["finished_at"].append(to_timestamp(finished_at))
+        rows["alive"].append(True)
+
+    def _add_theme_row(self, rows, session_id, quiz_id, user_id, topic, correct, wrong, average_time, finished_at):
+        rows["session_id"].append(session_id)
+        rows["quiz_id"].append(quiz_id)
+        rows["user"].append(self.users.intern(user_id))
+        rows["topic"].append(self.topics.intern(topic))
+        rows["correct"].append(correct or 0)
+        rows["wrong"].append(wrong or 0)
+        rows["average_time"].append(average_time or 0.0)
+        rows["finished_at"].append(to_timestamp(finished_at))
+        rows["alive"].append(True)
+
+    def add_session(self, session: StudySession, themes: List[SessionTheme]):
+        """Append a session that has just been finished"""
+        with self._lock:
+            rows = _empty_rows(SESSION_COLUMNS)
+            self._add_session_row(
+                rows, session.id, session.quiz_id, session.user_id,
+                session.correct_answers, session.wrong_answers,
+                session.total_time, session.finished_at
+            )
+            self.sessions.append(rows)
+
+            rows = _empty_rows(THEME_COLUMNS)
+            for theme in themes:
+                self._add_theme_row(
+                    rows, session.id, session.quiz_id, session.user_id,
+                    theme.topic, theme.correct_answers, theme.wrong_answers,
+                    theme.average_time, session.finished_at
+                )
+            self.themes.append(rows)
+
+    def remove_session(self, session_id: int):
+        with self._lock:
+            for table in (self.sessions, self.themes):
+                view = table.view()
+                view["alive"][view["session_id"] == session_id] = False
+
+    def remove_quiz(self, quiz_id: int):
+        with self._lock:
+            for table in (self.sessions, self.themes):
+                view = table.view()
+                view["alive"][view["quiz_id"] == quiz_id] = False
+
+    def _mask(self, view: Dict[str, np.ndarray], quiz_id: Optional[int], user_id: Optional[str]) -> Optional[np.ndarray]:
+        mask = view["alive"].copy()
+        if quiz_id is not None:
+            mask &= view["quiz_id"] == quiz_id
+        if user_id:
+            user = self.users.get(user_id)
+            if user is None:
+                return None
+            mask &= view["user"] == user
+        return mask
+
+    def session_totals(
+        self,
+        quiz_id: Optional[int] = None,
+        user_id: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-session (correct, wrong, total_time) columns of completed sessions"""
+        with self._lock:
+            view = self.sessions.view()
+            mask = self._mask(view, quiz_id, user_id)
+            if mask is None:
+                empty = np.zeros(0)
+                return empty, empty, empty
+            return view["correct"][mask], view["wrong"][mask], view["total_time"][mask]
+
+    def topic_aggregates(
+        self,
+        quiz_id: Optional[int] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        Per-topic correct/wrong sums, exposures and last review, in the shape the
+        retention functions take.
+        """
+        with self._lock:
+            view = self.themes.view()
+            mask = self._mask(view, quiz_id, user_id)
+            if mask is None:
+                return {}
+            topics = view["topic"][mask]
+            n = len(self.topics)
+            correct = np.bincount(topics, weights=view["correct"][mask], minlength=n)
+            wrong = np.bincount(topics, weights=view["wrong"][mask], minlength=n)
+            exposures = np.bincount(topics, minlength=n)
+            last_review = np.zeros(n)
+            np.maximum.at(last_review, topics, view["finished_at"][mask])
+            names = self.topics.names
+
+        return {
+            names[i]: {
+                'correct': int(correct[i]),
+                'wrong': int(wrong[i]),
+                'exposures': int(exposures[i]),
+                'last_review': from_timestamp(last_review[i])
+            }
+            for i in np.flatnonzero(exposures)
+        }
+
+    def memory_usage(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": self.sessions.size,
+                "topic_rows": self.themes.size,
+                "topics": len(self.topics),
+                "users": len(self.users),
+                "session_bytes": self.sessions.nbytes,
+                "topic_row_bytes": self.themes.nbytes,
+                "intern_bytes": self.topics.nbytes + self.users.nbytes,
+                "total_bytes": self.sessions.nbytes + self.themes.nbytes
+                + self.topics.nbytes + self.users.nbytes,
+                "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None
+            }
+
+
+class AnalyticsStoreRegistry:
+    """One lazily loaded store per tenant shard"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._stores: Dict[str, AnalyticsStore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: Optional[str] = None) -> Optional[AnalyticsStore]:
+        """Return the tenant's store, loading it on first use; None when disabled"""
+        if not self.enabled:
+            return None
+        tenant_id = tenant_id or DEFAULT_TENANT_ID
+        with self._lock:
+            store = self._stores.get(tenant_id)
+            if store is None:
+                store = AnalyticsStore()
+                db = tenant_router.get_read_sessionmaker(tenant_id)()
+                try:
+                    store.load(db)
+                finally:
+                    db.close()
+                self._stores[tenant_id] = store
+            return store
+
+    def peek(self, tenant_id: Optional[str] = None) -> Optional[AnalyticsStore]:
+        """Return the tenant's store only if it has already been loaded"""
+        return self._stores.get(tenant_id or DEFAULT_TENANT_ID)
+
+    def status(self) -> Dict:
+        return {
+            "engine": "memory" if self.enabled else "sql",
+            "tenants": {tenant_id: store.memory_usage() for tenant_id, store in list(self._stores.items())}
+        }
+
+
+# Read workers never see the writer's finished sessions, so they stay on SQL
+analytics_stores = AnalyticsStoreRegistry(ANALYTICS_ENGINE == "memory" and not WRITER_SOCKET)
@@ -1,32 +1,552 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import importlib
 import os
+import re
+import sqlite3
+import threading
+import time
 
-DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DATABASE_DIR = os.environ.get("KNOWMETRICS_DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 os.makedirs(DATABASE_DIR, exist_ok=True)
 
 DATABASE_URL = f"sqlite:///{os.path.join(DATABASE_DIR, 'knowmetrics.db')}"
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False},
-    echo=False
-)
+# Writes and latency-critical requests use the write pool; analytics and list
+# endpoints use a separate read-only pool so dashboards cannot starve answer submits
+WRITE_POOL_SIZE = int(os.environ.get("KNOWMETRICS_WRITE_POOL_SIZE", "5"))
+READ_POOL_SIZE = int(os.environ.get("KNOWMETRICS_READ_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.environ.get("KNOWMETRICS_POOL_MAX_OVERFLOW", "10"))
+
+# Set in read workers of a multi-process deployment: writes are forwarded to the
+# single writer process listening on this Unix socket (see writer.py)
+WRITER_SOCKET = os.environ.get("KNOWMETRICS_WRITER_SOCKET")
+
+
+def create_sqlite_engine(url: str, pool_size: int, read_only: bool = False):
+    """Create a SQLite engine in WAL mode; read-only engines reject writes via query_only"""
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=POOL_MAX_OVERFLOW,
+        echo=False
+    )
+    
+    @event.listens_for(new_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the single writer
+        cursor.execute("PRAGMA journal_mode=WAL")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    
+    return new_engine
+
+
+engine = create_sqlite_engine(DATABASE_URL, WRITE_POOL_SIZE)
+read_engine = create_sqlite_engine(DATABASE_URL, READ_POOL_SIZE, read_only=True)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
-def get_db():
-    """Dependency to get database session"""
-    db = SessionLocal()
+# Tenant shards: each tenant gets its own SQLite file (and write lock)
+TENANTS_DIR = os.path.join(DATABASE_DIR, "tenants")
+DEFAULT_TENANT_ID = "default"
+TENANT_HEADER = "X-Tenant-Id"
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+MAX_OPEN_TENANTS = int(os.environ.get("KNOWMETRICS_MAX_OPEN_TENANTS", "32"))
+
+# Columns added to existing tables after their creation (create_all does not alter tables)
+SCHEMA_UPGRADES = {
+    "quizzes": [("content_version", "INTEGER NOT NULL DEFAULT 0")],
+    "study_sessions": [
+        ("user_id", "VARCHAR(64) NOT NULL DEFAULT 'default'"),
+        ("question_ids", "JSON"),
+        ("shuffle_seed", "INTEGER"),
+    ],
+    "session_themes": [
+        ("user_id", "VARCHAR(64) NOT NULL DEFAULT 'default'"),
+        ("topic_id", "INTEGER REFERENCES topics(id)"),
+    ],
+    "session_answers": [
+        ("user_id", "VARCHAR(64) NOT NULL DEFAULT 'default'"),
+        ("answer_index", "SMALLINT"),
+        ("user_answer", "TEXT"),
+    ],
+    "questions": [
+        ("topic_id", "INTEGER REFERENCES topics(id)"),
+        ("correct_index", "SMALLINT"),
+    ],
+    "jobs": [
+        ("owner", "VARCHAR(100)"),
+        ("heartbeat_at", "DATETIME"),
+        ("cancel_requested", "BOOLEAN NOT NULL DEFAULT 0"),
+    ],
+}
+
+# Statements that fill a column right after SCHEMA_UPGRADES added it (run after create_all)
+SCHEMA_BACKFILLS = {
+    ("questions", "topic_id"): [
+        "INSERT OR IGNORE INTO topics (name, created_at) "
+        "SELECT DISTINCT TRIM(topic), CURRENT_TIMESTAMP FROM questions",
+        "UPDATE questions SET topic_id = "
+        "(SELECT id FROM topics WHERE topics.name = TRIM(questions.topic)) WHERE topic_id IS NULL",
+    ],
+    ("session_themes", "topic_id"): [
+        "INSERT OR IGNORE INTO topics (name, created_at) "
+        "SELECT DISTINCT TRIM(topic), CURRENT_TIMESTAMP FROM session_themes",
+        "UPDATE session_themes SET topic_id = "
+        "(SELECT id FROM topics WHERE topics.name = TRIM(session_themes.topic)) WHERE topic_id IS NULL",
+    ],
+    ("questions", "correct_index"): [
+        "UPDATE questions SET correct_index = "
+        "(SELECT CAST(j.key AS INTEGER) FROM json_each(questions.alternatives) j "
+        "WHERE CAST(j.value AS TEXT) = questions.correct_answer ORDER BY j.key LIMIT 1)",
+    ],
+    # Answers were stored as alternative text (NOT NULL): index them and keep the text only
+    # of answers that match no alternative, in a nullable column (requires SQLite 3.35+)
+    ("session_answers", "answer_index"): [
+        "ALTER TABLE session_answers RENAME COLUMN user_answer TO legacy_user_answer",
+        "ALTER TABLE session_answers ADD COLUMN user_answer TEXT",
+        "UPDATE session_answers SET answer_index = "
+        "(SELECT CAST(j.key AS INTEGER) FROM questions q, json_each(q.alternatives) j "
+        "WHERE q.id = session_answers.question_id AND CAST(j.value AS TEXT) = session_answers.legacy_user_answer "
+        "ORDER BY j.key LIMIT 1)",
+        "UPDATE session_answers SET user_answer = legacy_user_answer WHERE answer_index IS NULL",
+        "ALTER TABLE session_answers DROP COLUMN legacy_user_answer",
+    ],
+}
+
+# SQLite version a backfill needs (DROP COLUMN), checked before an upgrade changes anything
+SCHEMA_BACKFILL_MIN_SQLITE = {
+    ("session_answers", "answer_index"): (3, 35, 0),
+}
+
+# Statements that make existing rows satisfy a new unique index (run before creating it)
+INDEX_PREREQUISITES = {
+    "ux_session_answers_session_question": [
+        # Sessions that recorded a question twice: keep the first answer, recount the session
+        "CREATE TEMP TABLE duplicate_answer_sessions AS SELECT DISTINCT session_id FROM session_answers "
+        "GROUP BY session_id, question_id HAVING COUNT(*) > 1",
+        "DELETE FROM session_answers WHERE id NOT IN "
+        "(SELECT MIN(id) FROM session_answers GROUP BY session_id, question_id)",
+        "UPDATE study_sessions SET "
+        "correct_answers = (SELECT COUNT(*) FROM session_answers a WHERE a.session_id = study_sessions.id AND a.is_correct), "
+        "wrong_answers = (SELECT COUNT(*) FROM session_answers a WHERE a.session_id = study_sessions.id AND NOT a.is_correct), "
+        "total_time = (SELECT COALESCE(SUM(a.time_spent), 0) FROM session_answers a WHERE a.session_id = study_sessions.id) "
+        "WHERE id IN (SELECT session_id FROM duplicate_answer_sessions)",
+        "DROP TABLE duplicate_answer_sessions",
+    ],
+}
+
+# Derived tables added after release, filled from existing sessions and questions when first created
+DERIVED_TABLE_BUILDERS = {
+    "question_stats": ("question_stats", "rebuild_question_stats"),
+    "review_queue": ("review_queue", "rebuild_review_queue"),
+    "topic_rollups": ("topic_rollup", "rebuild_topic_rollup"),
+    "question_signatures": ("near_duplicates", "rebuild_question_signatures"),
+}
+
+# Derived tables whose primary key changed; they are dropped and rebuilt from answers
+REBUILDABLE_TABLES = {
+    "question_reviews": "user_id",
+}
+
+class TenantRouter:
+    """
+    Maps tenant ids to their own SQLite engine.
+    Shards are created and upgraded on first use; open engines are kept in an LRU cache.
+    The default tenant is the main database and is never evicted.
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_TENANTS):
+        self.max_open = max_open
+        self._engines = OrderedDict()  # tenant_id -> (engine, sessionmaker, read_engine, read_sessionmaker)
+        self._on_open = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_valid(tenant_id: str) -> bool:
+        return bool(TENANT_ID_PATTERN.match(tenant_id))
+
+    @staticmethod
+    def database_path(tenant_id: str) -> str:
+        if tenant_id == DEFAULT_TENANT_ID:
+            return os.path.join(DATABASE_DIR, "knowmetrics.db")
+        return os.path.join(TENANTS_DIR, f"{tenant_id}.db")
+
+    def on_open(self, callback):
+        """Register callback(tenant_id, sessionmaker) run when a shard is opened"""
+        self._on_open.append(callback)
+
+    def get_engine(self, tenant_id: Optional[str] = None):
+        return self._open(tenant_id)[0]
+
+    def get_sessionmaker(self, tenant_id: Optional[str] = None):
+        return self._open(tenant_id)[1]
+
+    def get_read_sessionmaker(self, tenant_id: Optional[str] = None):
+        return self._open(tenant_id)[3]
+
+    def _open(self, tenant_id: Optional[str]):
+        tenant_id = tenant_id or DEFAULT_TENANT_ID
+        if tenant_id == DEFAULT_TENANT_ID:
+            return engine, SessionLocal, read_engine, ReadSessionLocal
+        if not self.is_valid(tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id}")
+        
+        with self._lock:
+            if tenant_id in self._engines:
+                self._engines.move_to_end(tenant_id)
+                return self._engines[tenant_id]
+            
+            os.makedirs(TENANTS_DIR, exist_ok=True)
+            url = f"sqlite:///{self.database_path(tenant_id)}"
+            if WRITER_SOCKET:
+                # Read worker: the writer creates and migrates the shard, so workers never race on DDL
+                from writer import open_tenant_on_writer
+                open_tenant_on_writer(WRITER_SOCKET, tenant_id)
+            tenant_engine = create_sqlite_engine(url, WRITE_POOL_SIZE)
+            if not WRITER_SOCKET:
+                upgrade_db(tenant_engine)
+            tenant_read_engine = create_sqlite_engine(url, READ_POOL_SIZE, read_only=True)
+            
+            factory = sessionmaker(autocommit=False, autoflush=False, bind=tenant_engine)
+            read_factory = sessionmaker(autocommit=False, autoflush=False, bind=tenant_read_engine)
+            self._engines[tenant_id] = (tenant_engine, factory, tenant_read_engine, read_factory)
+            
+            while len(self._engines) > self.max_open:
+                _, (evicted, _, evicted_read, _) = self._engines.popitem(last=False)
+                evicted.dispose()
+                evicted_read.dispose()
+        
+        for callback in self._on_open:
+            callback(tenant_id, factory)
+        return tenant_engine, factory, tenant_read_engine, read_factory
+
+    def close(self, tenant_id: str):
+        """Dispose the engines of an open tenant; its next use reopens the file"""
+        with self._lock:
+            opened = self._engines.pop(tenant_id, None)
+        if opened:
+            opened[0].dispose()
+            opened[2].dispose()
+
+    def list_tenants(self) -> List[str]:
+        """All tenants with a database file, default first"""
+        tenants = [DEFAULT_TENANT_ID]
+        if os.path.isdir(TENANTS_DIR):
+            tenants += sorted(
+                name[:-3] for name in os.listdir(TENANTS_DIR)
+                if name.endswith(".db") and self.is_valid(name[:-3])
+            )
+        return tenants
+
+    def open_tenants(self) -> List[str]:
+        """Tenants with an open engine in this process, default first"""
+        with self._lock:
+            return [DEFAULT_TENANT_ID] + list(self._engines)
+
+    def open_count(self) -> int:
+        return len(self._engines)
+
+
+tenant_router = TenantRouter()
+
+def get_tenant_id(request: Request) -> str:
+    """Dependency to get the tenant of a request (set by TenantMiddleware)"""
+    return getattr(request.state, "tenant_id", None) or DEFAULT_TENANT_ID
+
+class PoolMetrics:
+    """Connection acquisition wait times per pool role (write/read)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, role: str, wait: float):
+        with self._lock:
+            stats = self._stats.setdefault(role, {"acquired": 0, "total_wait": 0.0, "max_wait": 0.0})
+            stats["acquired"] += 1
+            stats["total_wait"] += wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                role: {
+                    "acquired": stats["acquired"],
+                    "avg_wait_ms": round(stats["total_wait"] / stats["acquired"] * 1000, 3),
+                    "max_wait_ms": round(stats["max_wait"] * 1000, 3)
+                }
+                for role, stats in self._stats.items()
+            }
+
+
+pool_metrics = PoolMetrics()
+
+def _acquire(db, role: str):
+    """Check out the session's connection up front, timing the pool wait"""
+    start = time.perf_counter()
+    db.connection()
+    pool_metrics.record(role, time.perf_counter() - start)
+
+def get_db(request: Request):
+    """Dependency to get database session for the request's tenant"""
+    db = tenant_router.get_sessionmaker(get_tenant_id(request))()
     try:
+        _acquire(db, "write")
         yield db
     finally:
         db.close()
 
+def get_read_db(request: Request):
+    """Dependency to get a read-only database session (analytics and list endpoints)"""
+    db = tenant_router.get_read_sessionmaker(get_tenant_id(request))()
+    try:
+        _acquire(db, "read")
+        yield db
+    finally:
+        db.close()
+
+def pool_status() -> dict:
+    """Sizes, usage and wait times of the default tenant's pools"""
+    waits = pool_metrics.snapshot()
+    return {
+        role: {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "max_overflow": POOL_MAX_OVERFLOW,
+            **waits.get(role, {"acquired": 0, "avg_wait_ms": 0.0, "max_wait_ms": 0.0})
+        }
+        for role, pool in (("write", engine.pool), ("read", read_engine.pool))
+    }
+
+def get_user_id(request: Request) -> Optional[str]:
+    """Dependency to get the user scope of a request (routes mounted under /users/{user_id})"""
+    return request.path_params.get("user_id")
+
+def scope_to_user(query, model, user_id: Optional[str]):
+    """Restrict a query to one user's rows when the request is user-scoped"""
+    if user_id:
+        return query.filter(model.user_id == user_id)
+    return query
+
+def archive_database_path(db: Session) -> str:
+    """Raw answer archive next to the live database (knowmetrics.db -> knowmetrics.archive.db)"""
+    path = db.get_bind().url.database
+    root, ext = os.path.splitext(path)
+    return f"{root}.archive{ext or '.db'}"
+
+class TopicCache:
+    """
+    In-memory topic name -> id map per database file.
+    Questions and session themes get their topic_id from it when flushed; topics
+    created by a transaction are cached only once that transaction commits.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return (name or "").strip()
+
+    def resolve(self, db: Session, name: str):
+        """Return the topic id of a name, or a new Topic added to the session"""
+        from models import Topic
+        
+        shard = str(db.get_bind().url)
+        with self._lock:
+            topic_id = self._ids.get(shard, {}).get(name)
+        if topic_id is not None:
+            return topic_id
+        
+        created = db.info.setdefault("created_topics", {})
+        if name in created:
+            return created[name]
+        
+        topic = db.query(Topic).filter(Topic.name == name).first()
+        if topic:
+            with self._lock:
+                self._ids.setdefault(shard, {})[name] = topic.id
+            return topic.id
+        
+        topic = Topic(name=name)
+        db.add(topic)
+        created[name] = topic
+        return topic
+
+    def commit(self, db: Session):
+        flushed = db.info.pop("flushed_topics", None)
+        if flushed:
+            shard = str(db.get_bind().url)
+            with self._lock:
+                self._ids.setdefault(shard, {}).update(flushed)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+topic_cache = TopicCache()
+
+@event.listens_for(Session, "before_flush")
+def assign_topic_ids(db, flush_context, instances):
+    """Intern the topic of new or re-topiced questions and session themes"""
+    from models import Question, SessionTheme
+    
+    for obj in list(db.new) + list(db.dirty):
+        if not isinstance(obj, (Question, SessionTheme)):
+            continue
+        state = inspect(obj)
+        if obj.topic_id is not None and not (state.persistent and state.attrs.topic.history.has_changes()):
+            continue
+        
+        obj.topic = topic_cache.normalize(obj.topic)
+        resolved = topic_cache.resolve(db, obj.topic)
+        if isinstance(resolved, int):
+            obj.topic_id = resolved
+        else:
+            obj.topic_ref = resolved
+
+@event.listens_for(Session, "before_flush")
+def assign_correct_index(db, flush_context, instances):
+    """Keep the correct alternative index of new or edited questions in sync"""
+    from models import Question
+    
+    for obj in list(db.new) + list(db.dirty):
+        if isinstance(obj, Question):
+            obj.correct_index = obj.index_of(obj.correct_answer)
+
+@event.listens_for(Session, "before_flush")
+def bump_quiz_content_version(db, flush_context, instances):
+    """Move a quiz to a new content version whenever one of its questions changes"""
+    from models import Quiz, Question
+    
+    quizzes = set()
+    for obj in list(db.new) + list(db.dirty) + list(db.deleted):
+        if not isinstance(obj, Question) or obj.quiz_id is None:
+            continue
+        if obj in db.dirty and not db.is_modified(obj, include_collections=False):
+            continue
+        quizzes.add(obj.quiz_id)
+    
+    for quiz_id in quizzes:
+        quiz = db.get(Quiz, quiz_id)
+        if quiz is not None and quiz not in db.deleted:
+            # SQL-side increment, so concurrent writers never reuse a version
+            quiz.content_version = Quiz.content_version + 1
+
+@event.listens_for(Session, "after_flush")
+def index_question_signatures(db, flush_context):
+    """Keep the near-duplicate signatures of new, edited and deleted questions in sync"""
+    from models import Question
+    from near_duplicates import SIGNATURE_ATTRIBUTES, index_questions, unindex_questions
+    
+    added, changed, removed = [], [], []
+    for obj in db.new:
+        if isinstance(obj, Question):
+            added.append(obj)
+    for obj in db.dirty:
+        if isinstance(obj, Question) and obj not in db.deleted:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in SIGNATURE_ATTRIBUTES):
+                changed.append(obj)
+    for obj in db.deleted:
+        if isinstance(obj, Question):
+            removed.append(obj.id)
+    if not (added or changed or removed):
+        return
+    
+    unindex_questions(db, removed + [q.id for q in changed])
+    index_questions(db, added + changed)
+
+@event.listens_for(Session, "after_flush_postexec")
+def collect_topic_ids(db, flush_context):
+    created = db.info.pop("created_topics", None)
+    if created:
+        flushed = db.info.setdefault("flushed_topics", {})
+        flushed.update({name: topic.id for name, topic in created.items()})
+
+@event.listens_for(Session, "after_commit")
+def cache_topic_ids(db):
+    topic_cache.commit(db)
+
+@event.listens_for(Session, "after_rollback")
+def discard_topic_ids(db):
+    db.info.pop("created_topics", None)
+    db.info.pop("flushed_topics", None)
+
+def upgrade_db(bind=None):
+    """Add missing columns and indexes to tables created by older versions"""
+    import models  # registers all tables on Base.metadata
+    
+    bind = bind or engine
+    inspector = inspect(bind)
+    added = []
+    
+    for (table, column), version in SCHEMA_BACKFILL_MIN_SQLITE.items():
+        if inspector.has_table(table) and sqlite3.sqlite_version_info < version:
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                raise RuntimeError(
+                    f"Upgrading {table}.{column} needs SQLite {'.'.join(map(str, version))} or newer "
+                    f"(this Python uses {sqlite3.sqlite_version}); the database was left unchanged"
+                )
+    
+    with bind.begin() as conn:
+        for table, column in REBUILDABLE_TABLES.items():
+            if inspector.has_table(table):
+                columns = {c["name"] for c in inspector.get_columns(table)}
+                if column not in columns:
+                    conn.execute(text(f"DROP TABLE {table}"))
+        
+        for table, columns in SCHEMA_UPGRADES.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    added.append((table, name))
+    
+    new_derived = [
+        table for table in DERIVED_TABLE_BUILDERS if not inspector.has_table(table)
+    ] if inspector.has_table("study_sessions") else []
+    
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(bind).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            with bind.begin() as conn:
+                for statement in INDEX_PREREQUISITES.get(index.name, []):
+                    conn.execute(text(statement))
+                index.create(bind=conn)
+    
+    with bind.begin() as conn:
+        for column in added:
+            for statement in SCHEMA_BACKFILLS.get(column, []):
+                conn.execute(text(statement))
+    
+    for table in new_derived:
+        module, builder = DERIVED_TABLE_BUILDERS[table]
+        with Session(bind=bind) as db:
+            getattr(importlib.import_module(module), builder)(db)
+            db.commit()
+
 def init_db():
     """Initialize database creating all tables"""
-    from models import Quiz, Question, StudySession, SessionTheme, SessionAnswer
-    Base.metadata.create_all(bind=engine)
+    from models import Quiz, Topic, Question, StudySession, SessionTheme, SessionAnswer, QuestionStat, QuestionReview, TopicDecay, ReviewQueue, TopicRollup, QuestionSignature, QuestionBand, Job, AnswerSummary
+    upgrade_db()
     print("✅ Database initialized successfully!")
@@ -0,0 +1,263 @@
+"""
+Columnar export of the answer log (Parquet or Arrow IPC).
+
+Answers are read in keyset-paginated batches and written one row group (or record
+batch) at a time, so memory stays bounded regardless of the number of rows.
+
+Answers moved out by the archive job are included when it kept their raw rows
+(keep_raw=true, knowmetrics.archive.db). Answers archived without keep_raw survive
+only as per-question summaries and are not in the log; the file's schema metadata
+records which sources were read.
+
+Run with:
+    python export.py answers.parquet [--format parquet|arrow] [--quiz-id 1]
+                     [--since 2024-01-01] [--until 2024-12-31] [--tenant default]
+"""
+import argparse
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import MetaData, Table, Column, select, union_all
+from sqlalchemy.orm import Session
+
+from database import tenant_router, archive_database_path
+from models import Quiz, Question, StudySession, SessionAnswer
+
+EXPORT_BATCH_SIZE = 50000
+ARCHIVE_SCHEMA = "archive"
+ANSWER_COLUMNS = ("id", "session_id", "user_id", "question_id", "is_correct", "time_spent", "answered_at")
+
+# session_answers of the raw archive file, read through ATTACH
+ARCHIVED_ANSWERS = Table(
+    SessionAnswer.__tablename__,
+    MetaData(schema=ARCHIVE_SCHEMA),
+    *[Column(name, SessionAnswer.__table__.c[name].type) for name in ANSWER_COLUMNS]
+)
+
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+ANSWER_LOG_SCHEMA = pa.schema([
+    ("answer_id", pa.int64()),
+    ("session_id", pa.int64()),
+    ("user_id", pa.string()),
+    ("quiz_id", pa.int64()),
+    ("quiz_name", pa.dictionary(pa.int32(), pa.string())),
+    ("question_id", pa.int64()),
+    ("topic", pa.dictionary(pa.int32(), pa.string())),
+    ("is_correct", pa.bool_()),
+    ("time_spent", pa.float64()),
+    ("answered_at", pa.timestamp("us")),
+])
+
+SUMMARIZED_NOTE = (
+    "Answers archived without keep_raw=true exist only as per-question summaries "
+    "(answer_summaries) and are not included."
+)
+
+
+def answer_log_schema(include_archive: bool) -> pa.Schema:
+    """Answer log schema with metadata stating which answer sources were read"""
+    return ANSWER_LOG_SCHEMA.with_metadata({
+        "knowmetrics.sources": "session_answers,archive" if include_archive else "session_answers",
+        "knowmetrics.note": SUMMARIZED_NOTE,
+    })
+
+
+def attach_archive(db: Session) -> bool:
+    """Attach the raw answer archive to the session's connection; False if there is none"""
+    path = archive_database_path(db)
+    if not os.path.exists(path):
+        return False
+    db.connection().exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+    return True
+
+
+def detach_archive(db: Session):
+    # Pooled connections must not keep the archive attached
+    db.connection().exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+
+def iter_answer_batches(
+    db: Session,
+    quiz_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    include_archive: bool = False,
+    schema: pa.Schema = ANSWER_LOG_SCHEMA
+) -> Iterator[pa.RecordBatch]:
+    """
+    Yield the joined answer log as Arrow record batches, ordered by answer id.
+    With include_archive the attached archive's answers are merged in.
+    """
+    live = SessionAnswer.__table__
+    answers = select(*(live.c[name] for name in ANSWER_COLUMNS))
+    if include_archive:
+        archived = ARCHIVED_ANSWERS
+        # A row copied to the archive but not yet deleted from the live table is read once
+        answers = union_all(answers, select(*(archived.c[name] for name in ANSWER_COLUMNS)).where(
+            archived.c.id.notin_(select(live.c.id))
+        ))
+    answers = answers.subquery("answers")
+
+    query = db.query(
+        answers.c.id,
+        answers.c.session_id,
+        answers.c.user_id,
+        StudySession.quiz_id,
+        Quiz.name,
+        answers.c.question_id,
+        Question.topic,
+        answers.c.is_correct,
+        answers.c.time_spent,
+        answers.c.answered_at
+    ).select_from(answers).join(
+        StudySession, StudySession.id == answers.c.session_id
+    ).join(
+        Question, Question.id == answers.c.question_id
+    ).join(
+        Quiz, Quiz.id == StudySession.quiz_id
+    )
+
+    if quiz_id:
+        query = query.filter(StudySession.quiz_id == quiz_id)
+    if since:
+        query = query.filter(answers.c.answered_at >= since)
+    if until:
+        query = query.filter(answers.c.answered_at < until)
+
+    last_id = 0
+    while True:
+        rows = query.filter(answers.c.id > last_id).order_by(answers.c.id).limit(batch_size).all()
+        if not rows:
+            return
+
+        columns = list(zip(*rows))
+        arrays = [
+            pa.array(values, type=field.type.value_type).dictionary_encode()
+            if pa.types.is_dictionary(field.type)
+            else pa.array(values, type=field.type)
+            for field, values in zip(schema, columns)
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+        last_id = rows[-1][0]
+
+
+class _ChunkSink:
+    """Write-only file object collecting bytes until they are drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _open_writer(sink, fmt: str, schema: pa.Schema):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa.ipc.new_stream(sink, schema)
+
+
+def stream_answer_log(
+    tenant_id: Optional[str],
+    fmt: str = "parquet",
+    quiz_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield the encoded answer log chunk by chunk, one row group per batch.
+    Opens its own read session: it outlives the request's dependencies.
+    """
+    db = tenant_router.get_read_sessionmaker(tenant_id)()
+    archived = attach_archive(db)
+    try:
+        schema = answer_log_schema(archived)
+        sink = _ChunkSink()
+        writer = _open_writer(pa.PythonFile(sink, mode="w"), fmt, schema)
+        for batch in iter_answer_batches(db, quiz_id, since, until, batch_size, archived, schema):
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    finally:
+        if archived:
+            detach_archive(db)
+        db.close()
+
+
+def export_answer_log(
+    path: str,
+    fmt: str = "parquet",
+    tenant_id: Optional[str] = None,
+    quiz_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> int:
+    """Write the answer log to a file; returns the number of rows written"""
+    db = tenant_router.get_read_sessionmaker(tenant_id)()
+    archived = attach_archive(db)
+    rows = 0
+    try:
+        schema = answer_log_schema(archived)
+        with pa.OSFile(path, "wb") as sink:
+            writer = _open_writer(sink, fmt, schema)
+            for batch in iter_answer_batches(db, quiz_id, since, until, include_archive=archived, schema=schema):
+                if fmt == "parquet":
+                    writer.write_table(pa.Table.from_batches([batch]))
+                else:
+                    writer.write_batch(batch)
+                rows += batch.num_rows
+            writer.close()
+    finally:
+        if archived:
+            detach_archive(db)
+        db.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the KnowMetrics answer log")
+    parser.add_argument("output", help="Output file path")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="parquet")
+    parser.add_argument("--quiz-id", type=int, default=None)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--tenant", default=None)
+    args = parser.parse_args()
+
+    print(f"📦 Exporting answer log to {args.output}...")
+    count = export_answer_log(
+        args.output, args.format, args.tenant, args.quiz_id, args.since, args.until
+    )
+    print(f"✅ Exported {count} answers")
@@ -0,0 +1,207 @@
+"""
+Opt-in group commit for answer submissions.
+
+Each answer normally commits on its own, so answer throughput is capped by one SQLite
+fsync per question. With KNOWMETRICS_GROUP_COMMIT=1, submissions arriving within a short
+window are applied by a committer thread on one session and made durable by a single
+commit. Every request waits until the commit of its batch before it is acknowledged.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+
+from database import get_db, tenant_router, DEFAULT_TENANT_ID
+
+GROUP_COMMIT_ENABLED = os.environ.get("KNOWMETRICS_GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("KNOWMETRICS_GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("KNOWMETRICS_GROUP_COMMIT_MAX_BATCH", "64"))
+
+
+class _WorkItem:
+    def __init__(self, func: Callable, args: tuple):
+        self.func = func
+        self.args = args
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitter:
+    """
+    Committer thread of one tenant shard.
+    Work functions take the shared session as their first argument; they must raise
+    HTTPException before making any change, and flush (not commit) what they write.
+    """
+
+    def __init__(self, tenant_id: str, window_ms: float, max_batch: int):
+        self.tenant_id = tenant_id
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[_WorkItem]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "items": 0,
+            "largest_batch": 0,
+            "fallbacks": 0,
+            "total_commit": 0.0,
+            "total_wait": 0.0,
+        }
+        self._thread = threading.Thread(
+            target=self._run, name=f"knowmetrics-group-commit-{tenant_id}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, func: Callable, *args):
+        """Queue func(db, *args) and block until its batch has committed"""
+        item = _WorkItem(func, args)
+        self._queue.put(item)
+        return item.future.result()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+
+    def _commit(self, batch: List[_WorkItem]):
+        session_factory = tenant_router.get_sessionmaker(self.tenant_id)
+        start = time.perf_counter()
+        fallback = False
+
+        db = session_factory()
+        try:
+            for item in batch:
+                try:
+                    item.result = item.func(db, *item.args)
+                except HTTPException as e:
+                    item.error = e
+            db.commit()
+        except Exception:
+            # One failing write poisons the shared transaction: retry each item alone
+            db.rollback()
+            fallback = True
+        finally:
+            db.close()
+
+        if fallback:
+            for item in batch:
+                item.result, item.error = None, None
+                db = session_factory()
+                try:
+                    item.result = item.func(db, *item.args)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    item.error = e
+                finally:
+                    db.close()
+
+        finished = time.perf_counter()
+        with self._lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["items"] += len(batch)
+            stats["largest_batch"] = max(stats["largest_batch"], len(batch))
+            stats["fallbacks"] += int(fallback)
+            stats["total_commit"] += finished - start
+            stats["total_wait"] += sum(finished - item.enqueued_at for item in batch)
+
+        for item in batch:
+            if item.error is not None:
+                item.future.set_exception(item.error)
+            else:
+                item.future.set_result(item.result)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        batches, items = stats["batches"], stats["items"]
+        return {
+            "batches": batches,
+            "answers": items,
+            "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+            "largest_batch": stats["largest_batch"],
+            "fallbacks": stats["fallbacks"],
+            "avg_commit_ms": round(stats["total_commit"] / batches * 1000, 3) if batches else 0.0,
+            "avg_wait_ms": round(stats["total_wait"] / items * 1000, 3) if items else 0.0,
+            "queued": self._queue.qsize()
+        }
+
+
+class GroupCommitRegistry:
+    """One committer thread per tenant shard, started on first use"""
+
+    def __init__(self, enabled: bool, window_ms: float, max_batch: int):
+        self.enabled = enabled
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._committers: Dict[str, GroupCommitter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: Optional[str] = None) -> Optional[GroupCommitter]:
+        """Return the tenant's committer; None when group commit is disabled"""
+        if not self.enabled:
+            return None
+        tenant_id = tenant_id or DEFAULT_TENANT_ID
+        with self._lock:
+            committer = self._committers.get(tenant_id)
+            if committer is None:
+                committer = GroupCommitter(tenant_id, self.window_ms, self.max_batch)
+                self._committers[tenant_id] = committer
+            return committer
+
+    def shutdown(self):
+        with self._lock:
+            committers, self._committers = list(self._committers.values()), {}
+        for committer in committers:
+            committer.stop()
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "tenants": {tenant_id: c.snapshot() for tenant_id, c in list(self._committers.items())}
+        }
+
+
+group_commit = GroupCommitRegistry(GROUP_COMMIT_ENABLED, GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH)
+
+
+def get_answer_db(request: Request):
+    """
+    Dependency for answer submission: the request's write session, or None when
+    answers go through group commit (the committer thread brings its own session).
+    """
+    if group_commit.enabled:
+        yield None
+        return
+    yield from get_db(request)
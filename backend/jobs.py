@@ -0,0 +1,301 @@
+"""
+In-process background job runner.
+Long-running imports and analytics recomputation run in a bounded thread pool;
+their state and progress are persisted in the jobs table so clients can poll them.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from database import SessionLocal, DEFAULT_TENANT_ID, WRITER_SOCKET, tenant_router
+from models import Job
+
+JOB_WORKERS = int(os.environ.get("KNOWMETRICS_JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.environ.get("KNOWMETRICS_JOB_MAX_PENDING", "100"))
+PROGRESS_INTERVAL = 0.5  # seconds between persisted progress updates
+# Each process refreshes heartbeat_at of the jobs it owns; jobs whose owner stopped
+# beating for JOB_STALE_AFTER seconds are failed by whichever process notices
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get("KNOWMETRICS_JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_STALE_AFTER = JOB_HEARTBEAT_INTERVAL * 6
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation has been requested"""
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are waiting to run"""
+
+
+class JobContext:
+    """Handle passed to job functions to report progress and observe cancellation"""
+
+    def __init__(self, runner: "JobRunner", tenant_id: str, job_id: int):
+        self.runner = runner
+        self.tenant_id = tenant_id
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.runner.is_cancel_requested(self.job_id, self.tenant_id)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def update(self, processed: int, total: Optional[int] = None, force: bool = False):
+        """
+        Report progress. Call it between committed batches: progress is written
+        through a separate session, which must not wait on the job's own transaction.
+        """
+        self.check_cancelled()
+
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+
+        fields = {"processed": processed}
+        if total is not None:
+            fields["total"] = total
+            fields["progress"] = round(processed / total, 4) if total > 0 else 0.0
+        self.runner.set_state(self.job_id, self.tenant_id, **fields)
+
+
+class JobRunner:
+    """
+    Bounded thread pool that runs jobs and persists their lifecycle.
+    Jobs are stored in the jobs table of the tenant that submitted them, with the
+    submitting process as owner. Several processes can run jobs on the same
+    databases: each keeps the heartbeat of its own jobs fresh and only fails jobs
+    whose owner stopped beating.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.owner: Optional[str] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[Tuple[str, int], object] = {}
+        self._cancel_requested = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the pool and heartbeat, and fail jobs left behind by stopped processes"""
+        if self._executor is None:
+            # Set here, not at import: forked workers must not share an owner
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="knowmetrics-job"
+            )
+            self._stopped.clear()
+            self._heartbeat = threading.Thread(
+                target=self._beat_loop, name="knowmetrics-job-heartbeat", daemon=True
+            )
+            self._heartbeat.start()
+        self.recover(DEFAULT_TENANT_ID, SessionLocal)
+
+    def recover(self, tenant_id: str, session_factory: Callable):
+        """Mark active jobs of a tenant whose owner stopped sending heartbeats as failed"""
+        with self._lock:
+            running = [job_id for (tenant, job_id) in self._futures if tenant == tenant_id]
+
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+        db = session_factory()
+        try:
+            db.query(Job).filter(
+                Job.status.in_(ACTIVE_STATUSES),
+                Job.id.notin_(running),
+                (Job.heartbeat_at == None) | (Job.heartbeat_at < cutoff)
+            ).update(
+                {
+                    Job.status: "failed",
+                    Job.error: "Interrupted: the server process running it stopped",
+                    Job.finished_at: datetime.utcnow()
+                },
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def shutdown(self):
+        """Stop accepting jobs and cancel those still waiting"""
+        if self._executor is None:
+            return
+        with self._lock:
+            self._cancel_requested.update(self._futures.keys())
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def _beat_loop(self):
+        last_sweep = time.monotonic()
+        while not self._stopped.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                self._beat()
+                # Jobs of processes that died while this one keeps running
+                if time.monotonic() - last_sweep >= JOB_STALE_AFTER:
+                    last_sweep = time.monotonic()
+                    for tenant_id in tenant_router.open_tenants():
+                        self.recover(tenant_id, tenant_router.get_sessionmaker(tenant_id))
+            except Exception:
+                # A busy or evicted shard is retried on the next beat
+                pass
+
+    def _beat(self):
+        """Refresh the heartbeat of this process's jobs and pick up cancellations flagged elsewhere"""
+        with self._lock:
+            owned = defaultdict(list)
+            for tenant_id, job_id in self._futures:
+                owned[tenant_id].append(job_id)
+
+        for tenant_id, job_ids in owned.items():
+            db = tenant_router.get_sessionmaker(tenant_id)()
+            try:
+                db.query(Job).filter(Job.id.in_(job_ids), Job.owner == self.owner).update(
+                    {Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+                )
+                flagged = [
+                    job_id for (job_id,) in db.query(Job.id).filter(
+                        Job.id.in_(job_ids), Job.cancel_requested == True
+                    )
+                ]
+                db.commit()
+            finally:
+                db.close()
+            for job_id in flagged:
+                self.cancel(job_id, tenant_id)
+
+    def submit(self, kind: str, func: Callable, *args, tenant_id: Optional[str] = None, **kwargs) -> Job:
+        """
+        Persist a new job and schedule func(db, ctx, *args, **kwargs) on the pool.
+        The job function receives its own database session on the tenant's shard.
+        """
+        if self._executor is None:
+            self.start()
+        tenant_id = tenant_id or DEFAULT_TENANT_ID
+
+        with self._lock:
+            if len(self._futures) >= self.max_pending:
+                raise JobQueueFull()
+
+        db = tenant_router.get_sessionmaker(tenant_id)()
+        try:
+            job = Job(kind=kind, status="pending", owner=self.owner, heartbeat_at=datetime.utcnow())
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+        finally:
+            db.close()
+
+        key = (tenant_id, job.id)
+        with self._lock:
+            self._futures[key] = self._executor.submit(self._run, key, func, args, kwargs)
+
+        return job
+
+    def cancel(self, job_id: int, tenant_id: Optional[str] = None) -> bool:
+        """
+        Request cancellation; returns False if the job is not active.
+        Jobs owned by another live process are flagged and cancelled by their
+        owner on its next heartbeat.
+        """
+        key = (tenant_id or DEFAULT_TENANT_ID, job_id)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._cancel_requested.add(key)
+        if future is None:
+            return self._flag_cancel(job_id, key[0])
+
+        # A job that has not started yet is cancelled right away
+        if future.cancel():
+            self._finish(key)
+            self.set_state(job_id, key[0], status="cancelled", finished_at=datetime.utcnow())
+        return True
+
+    def _flag_cancel(self, job_id: int, tenant_id: str) -> bool:
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+        db = tenant_router.get_sessionmaker(tenant_id)()
+        try:
+            flagged = db.query(Job).filter(
+                Job.id == job_id,
+                Job.status.in_(ACTIVE_STATUSES),
+                Job.owner != self.owner,
+                Job.heartbeat_at >= cutoff
+            ).update({Job.cancel_requested: True}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        return flagged > 0
+
+    def is_cancel_requested(self, job_id: int, tenant_id: Optional[str] = None) -> bool:
+        return (tenant_id or DEFAULT_TENANT_ID, job_id) in self._cancel_requested
+
+    def set_state(self, job_id: int, tenant_id: Optional[str] = None, **fields):
+        """Persist job fields through a short-lived session"""
+        db = tenant_router.get_sessionmaker(tenant_id)()
+        try:
+            db.query(Job).filter(Job.id == job_id).update(fields, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish(self, key: Tuple[str, int]):
+        with self._lock:
+            self._futures.pop(key, None)
+            self._cancel_requested.discard(key)
+
+    def _run(self, key: Tuple[str, int], func: Callable, args: tuple, kwargs: dict):
+        tenant_id, job_id = key
+        if key in self._cancel_requested:
+            self.set_state(job_id, tenant_id, status="cancelled", finished_at=datetime.utcnow())
+            self._finish(key)
+            return
+
+        now = datetime.utcnow()
+        self.set_state(job_id, tenant_id, status="running", started_at=now, heartbeat_at=now)
+        ctx = JobContext(self, tenant_id, job_id)
+        db = tenant_router.get_sessionmaker(tenant_id)()
+        try:
+            result = func(db, ctx, *args, **kwargs)
+            db.commit()
+            self.set_state(
+                job_id,
+                tenant_id,
+                status="completed",
+                progress=1.0,
+                result=result,
+                finished_at=datetime.utcnow()
+            )
+        except JobCancelled:
+            db.rollback()
+            self.set_state(job_id, tenant_id, status="cancelled", finished_at=datetime.utcnow())
+        except Exception as e:
+            db.rollback()
+            self.set_state(job_id, tenant_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        finally:
+            db.close()
+            self._finish(key)
+
+
+runner = JobRunner()
+
+# Shards opened after startup may hold jobs interrupted by a previous process
+# (read workers leave job state to the writer process, which runs them)
+if not WRITER_SOCKET:
+    tenant_router.on_open(runner.recover)
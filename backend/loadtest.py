@@ -0,0 +1,303 @@
+"""
+Load test of the full study flow against a local server.
+
+Each virtual user (its own user id) lists the quizzes, starts a session, answers every
+question with a think time between answers, finishes the session and opens the
+analytics pages. Latencies are recorded per endpoint (path templates such as
+POST /sessions/{id}/answer) and written to a JSON report with throughput and
+p50/p95/p99, so runs before and after a change can be compared.
+
+Requests carry an X-Tenant-Id header (default "loadtest"), so the data lands in its own
+tenant database. A "Load test" quiz is created there on first use.
+
+Run with a server started by the tool:
+    python loadtest.py --start-server --users 50 --sessions 2 --think-time 0.5 --output before.json
+or against a running one, comparing with an earlier report:
+    python loadtest.py --url http://localhost:8000 --users 50 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+LOADTEST_QUIZ = "Load test"
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Recorder:
+    """Latencies and failures per endpoint template"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.answers = 0
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        name: str,
+        method: str,
+        url: str,
+        **kwargs
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[name].append(time.perf_counter() - start)
+            self.errors[name][type(e).__name__] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name][str(response.status_code)] += 1
+            return None
+        return response
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), round(p / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def _think(mean: float) -> float:
+    return random.uniform(0.5, 1.5) * mean if mean > 0 else 0.0
+
+
+async def ensure_quiz(client: httpx.AsyncClient, questions: int) -> int:
+    """Id of the load-test quiz, created with generated questions if missing"""
+    response = await client.get("/api/quizzes")
+    response.raise_for_status()
+    for quiz in response.json():
+        if quiz["name"] == LOADTEST_QUIZ:
+            return quiz["id"]
+
+    response = await client.post("/api/quizzes", json={
+        "name": LOADTEST_QUIZ, "description": "Generated by loadtest.py"
+    })
+    response.raise_for_status()
+    quiz_id = response.json()["id"]
+
+    generated = []
+    for i in range(questions):
+        alternatives = [f"Option {k} of question {i + 1}" for k in range(4)]
+        generated.append({
+            "quiz_id": quiz_id,
+            "topic": f"Topic {i % 5 + 1}",
+            "question_text": f"Generated question {i + 1}?",
+            "alternatives": alternatives,
+            "correct_answer": alternatives[i % 4],
+            "difficulty": i % 5 + 1
+        })
+    response = await client.post("/api/questions/bulk", json={"quiz_id": quiz_id, "questions": generated})
+    response.raise_for_status()
+    return quiz_id
+
+
+async def run_user(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    user_number: int,
+    quiz_id: int,
+    sessions: int,
+    think_time: float
+):
+    """One student: quiz list, sessions with answers and finish, then analytics"""
+    prefix = f"/api/users/loadtest-{user_number}"
+    for _ in range(sessions):
+        await recorder.request(client, "GET /quizzes", "GET", "/api/quizzes")
+
+        response = await recorder.request(
+            client, "POST /sessions/start", "POST", f"{prefix}/sessions/start", json={"quiz_id": quiz_id}
+        )
+        if response is None:
+            continue
+        started = response.json()
+        session_id = started["session_id"]
+
+        for question in started["questions"]:
+            await asyncio.sleep(_think(think_time))
+            response = await recorder.request(
+                client, "POST /sessions/{id}/answer", "POST", f"{prefix}/sessions/{session_id}/answer",
+                json={
+                    "question_id": question["id"],
+                    "answer_index": random.randrange(len(question["alternatives"])),
+                    "permutation": question["permutation"],
+                    "time_spent": round(random.uniform(2, 30), 2)
+                }
+            )
+            if response is not None:
+                recorder.answers += 1
+
+        await recorder.request(
+            client, "POST /sessions/{id}/finish", "POST", f"{prefix}/sessions/{session_id}/finish"
+        )
+
+        await recorder.request(client, "GET /analytics/dashboard", "GET", f"{prefix}/analytics/dashboard")
+        await recorder.request(client, "GET /analytics/topics", "GET", f"{prefix}/analytics/topics")
+        await recorder.request(
+            client, "GET /analytics/prediction/{id}", "GET", f"{prefix}/analytics/prediction/{quiz_id}",
+            params={"exam_questions": 10, "min_score": 6}
+        )
+        await recorder.request(
+            client, "GET /analytics/retention/{id}", "GET", f"{prefix}/analytics/retention/{quiz_id}"
+        )
+
+
+def build_report(recorder: Recorder, config: dict, started_at: datetime, elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(recorder.latencies):
+        ordered = sorted(recorder.latencies[name])
+        errors = sum(recorder.errors[name].values())
+        endpoints[name] = {
+            "count": len(ordered),
+            "errors": errors,
+            "error_statuses": dict(recorder.errors[name]),
+            "rps": round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2)
+        }
+
+    requests = sum(e["count"] for e in endpoints.values())
+    return {
+        "config": config,
+        "started_at": started_at.isoformat(),
+        "duration_s": round(elapsed, 2),
+        "requests": requests,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+        "answers_per_second": round(recorder.answers / elapsed, 2) if elapsed > 0 else 0.0,
+        "endpoints": endpoints
+    }
+
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    print(f"\n  {report['requests']} requests in {report['duration_s']}s → "
+          f"{report['throughput_rps']} req/s, {report['answers_per_second']} answers/s, "
+          f"{report['errors']} errors")
+    print(f"  {'endpoint':<32} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report["endpoints"].items():
+        line = (f"  {name:<32} {stats['count']:>6} {stats['errors']:>4} "
+                f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        before = (baseline or {}).get("endpoints", {}).get(name)
+        if before:
+            changes = []
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if before[key] > 0:
+                    changes.append(f"{(stats[key] / before[key] - 1) * 100:+.0f}%")
+            line += "   (" + " / ".join(changes) + " vs baseline)"
+        print(line)
+    if baseline:
+        print(f"  throughput: {baseline['throughput_rps']} → {report['throughput_rps']} req/s")
+
+
+async def run(args) -> dict:
+    headers = {"X-Tenant-Id": args.tenant} if args.tenant else {}
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=args.timeout, limits=limits) as client:
+        quiz_id = args.quiz_id or await ensure_quiz(client, args.questions)
+        recorder = Recorder()
+
+        async def user(number: int):
+            if args.ramp_up > 0:
+                await asyncio.sleep(args.ramp_up * number / args.users)
+            await run_user(client, recorder, number + 1, quiz_id, args.sessions, args.think_time)
+
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        await asyncio.gather(*(user(n) for n in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    config = {
+        "url": args.url,
+        "tenant": args.tenant,
+        "quiz_id": quiz_id,
+        "users": args.users,
+        "sessions_per_user": args.sessions,
+        "think_time_s": args.think_time,
+        "ramp_up_s": args.ramp_up,
+        "workers": args.workers if args.start_server else None
+    }
+    return build_report(recorder, config, started_at, elapsed)
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    """Start uvicorn on localhost and wait until /health answers"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server process exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the KnowMetrics study flow")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--start-server", action="store_true", help="start uvicorn locally for the run")
+    parser.add_argument("--port", type=int, default=8765, help="port of the started server")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--tenant", default="loadtest", help="tenant shard to use ('' for the default database)")
+    parser.add_argument("--quiz-id", type=int, help="existing quiz to use instead of the generated one")
+    parser.add_argument("--questions", type=int, default=20, help="questions of the generated quiz")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=1, help="sessions per user")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between answers")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which users start")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", default="loadtest-report.json")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        server = start_server(args.port, args.workers)
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    print(f"⏱️  Load testing {args.url}: {args.users} users × {args.sessions} sessions, "
+          f"think time {args.think_time}s")
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\n📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
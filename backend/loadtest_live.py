@@ -0,0 +1,118 @@
+"""
+Load test comparing answer throughput of the REST session flow and the live
+WebSocket channel against a running server.
+
+Each simulated student (its own user id) starts a session over REST, answers every
+question either with POST .../sessions/{id}/answer or over .../ws/sessions/{id}, and
+finishes it. One warm-up session runs first so per-question rows already exist.
+
+Run with (one uvicorn worker, so the numbers are per worker):
+    uvicorn main:app --workers 1
+    python loadtest_live.py --url http://localhost:8000 --quiz-id 1 --sessions 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+import httpx
+import websockets
+
+
+_student_ids = itertools.count(1)
+
+
+async def _start(client: httpx.AsyncClient, prefix: str, quiz_id: int) -> dict:
+    response = await client.post(f"{prefix}/sessions/start", json={"quiz_id": quiz_id})
+    response.raise_for_status()
+    return response.json()
+
+
+def _answer_payload(question: dict) -> dict:
+    return {
+        "question_id": question["id"],
+        "answer_index": random.randrange(len(question["alternatives"])),
+        "permutation": question["permutation"],
+        "time_spent": round(random.uniform(2, 30), 2)
+    }
+
+
+async def run_rest_session(client: httpx.AsyncClient, ws_url: str, prefix: str, quiz_id: int) -> int:
+    started = await _start(client, prefix, quiz_id)
+    session_id = started["session_id"]
+    for question in started["questions"]:
+        response = await client.post(f"{prefix}/sessions/{session_id}/answer", json=_answer_payload(question))
+        response.raise_for_status()
+    (await client.post(f"{prefix}/sessions/{session_id}/finish")).raise_for_status()
+    return len(started["questions"])
+
+
+async def run_ws_session(client: httpx.AsyncClient, ws_url: str, prefix: str, quiz_id: int) -> int:
+    started = await _start(client, prefix, quiz_id)
+    async with websockets.connect(f"{ws_url}{prefix}/ws/sessions/{started['session_id']}") as ws:
+        json.loads(await ws.recv())
+        for question in started["questions"]:
+            await ws.send(json.dumps({"type": "answer", **_answer_payload(question)}))
+            result = json.loads(await ws.recv())
+            if result["type"] != "result":
+                raise RuntimeError(result)
+        await ws.send(json.dumps({"type": "finish"}))
+        json.loads(await ws.recv())
+    return len(started["questions"])
+
+
+async def measure(mode: str, url: str, quiz_id: int, sessions: int, concurrency: int) -> dict:
+    """Run the sessions with bounded concurrency and return throughput figures"""
+    run_session = run_ws_session if mode == "ws" else run_rest_session
+    ws_url = url.replace("http://", "ws://").replace("https://", "wss://")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        await run_session(client, ws_url, "/api/users/loadtest-warmup", quiz_id)
+
+        async def worker() -> int:
+            async with semaphore:
+                prefix = f"/api/users/loadtest-{next(_student_ids)}"
+                return await run_session(client, ws_url, prefix, quiz_id)
+
+        start = time.perf_counter()
+        answered = await asyncio.gather(*(worker() for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    total = sum(answered)
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "answers": total,
+        "seconds": round(elapsed, 2),
+        "answers_per_second": round(total / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+async def main(args):
+    results = []
+    for mode in (["rest", "ws"] if args.mode == "both" else [args.mode]):
+        result = await measure(mode, args.url, args.quiz_id, args.sessions, args.concurrency)
+        print(f"  {mode:<5} {result['answers']:>6} answers in {result['seconds']:>7.2f}s "
+              f"→ {result['answers_per_second']:>8.1f} answers/s")
+        results.append(result)
+
+    if len(results) == 2 and results[0]["answers_per_second"] > 0:
+        speedup = results[1]["answers_per_second"] / results[0]["answers_per_second"]
+        print(f"  WebSocket / REST: {speedup:.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare REST and WebSocket answer throughput")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--quiz-id", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mode", choices=["rest", "ws", "both"], default="both")
+    args = parser.parse_args()
+
+    print(f"⏱️  Load testing {args.url} ({args.sessions} sessions, concurrency {args.concurrency})")
+    asyncio.run(main(args))
@@ -2,23 +2,46 @@
 KnowMetrics API - Study tracking and performance prediction system.
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 
-from database import init_db
-from routes import quizzes_router, questions_router, sessions_router, analytics_router
+from database import init_db, pool_status, tenant_router, get_tenant_id, WRITER_SOCKET
+from jobs import runner, JobQueueFull
+from analytics_store import analytics_stores
+from group_commit import group_commit
+from question_cache import question_payloads
+from tenants import TenantMiddleware
+from writer import WriteForwardingMiddleware, TENANT_OPEN_PATH
+from routes import (
+    quizzes_router, questions_router, sessions_router, analytics_router,
+    jobs_router, export_router, live_router
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     print("🚀 Starting KnowMetrics API...")
-    init_db()
-    print("✅ Database ready")
+    if WRITER_SOCKET:
+        # Read worker: the writer process owns migrations, jobs and all writes
+        print(f"📖 Read worker, forwarding writes to {WRITER_SOCKET}")
+    else:
+        init_db()
+        print("✅ Database ready")
+        runner.start()
+        print(f"⚙️  Background jobs: {runner.max_workers} workers")
+        if group_commit.enabled:
+            print(f"📦 Group commit: {group_commit.window_ms} ms window, up to {group_commit.max_batch} answers")
+    if analytics_stores.enabled:
+        usage = analytics_stores.get().memory_usage()
+        print(f"📊 Analytics store: {usage['topic_rows']} topic rows, {usage['total_bytes'] / 1024:.1f} KB")
     print("📚 API Documentation: http://localhost:8000/docs")
     yield
+    group_commit.shutdown()
+    if not WRITER_SOCKET:
+        runner.shutdown()
     print("👋 Shutting down KnowMetrics API...")
 
 
@@ -50,6 +73,9 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Tenant routing (X-Tenant-Id header or /t/{tenant_id} prefix)
+app.add_middleware(TenantMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -59,6 +85,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Multi-process mode: forward writes to the single writer (outermost, sees the original request)
+if WRITER_SOCKET:
+    app.add_middleware(WriteForwardingMiddleware, socket_path=WRITER_SOCKET)
+
+
+# Background job queue is full
+@app.exception_handler(JobQueueFull)
+async def job_queue_full_handler(request: Request, exc: JobQueueFull):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many background jobs queued, try again later"}
+    )
+
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -85,7 +124,12 @@ def root():
             "quizzes": "/api/quizzes",
             "questions": "/api/questions",
             "sessions": "/api/sessions",
-            "analytics": "/api/analytics"
+            "analytics": "/api/analytics",
+            "jobs": "/api/jobs",
+            "export": "/api/export",
+            "user_sessions": "/api/users/{user_id}/sessions",
+            "user_analytics": "/api/users/{user_id}/analytics",
+            "live_session": "/ws/sessions/{session_id}"
         }
     }
 
@@ -96,11 +140,47 @@ def health_check():
     return {"status": "healthy", "service": "knowmetrics-api"}
 
 
+# Connection pool sizes and wait times
+@app.get("/health/pools", tags=["Root"])
+def pool_health():
+    return pool_status()
+
+
+# Group commit batching of answer submissions
+@app.get("/health/group-commit", tags=["Root"])
+def group_commit_health():
+    return group_commit.status()
+
+
+# Cached question payloads used by session starts
+@app.get("/health/question-cache", tags=["Root"])
+def question_cache_health():
+    return question_payloads.status()
+
+
+# Single-writer mode: read workers have the writer create and migrate a shard (a POST, so
+# a read worker receiving it forwards it to the writer as well)
+@app.post(TENANT_OPEN_PATH, include_in_schema=False)
+def open_tenant(tenant_id: str = Depends(get_tenant_id)):
+    tenant_router.get_engine(tenant_id)
+    return {"tenant_id": tenant_id}
+
+
 # Include routers
 app.include_router(quizzes_router, prefix="/api")
 app.include_router(questions_router, prefix="/api")
 app.include_router(sessions_router, prefix="/api")
 app.include_router(analytics_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
+app.include_router(export_router, prefix="/api")
+
+# User-scoped session and analytics endpoints
+app.include_router(sessions_router, prefix="/api/users/{user_id}")
+app.include_router(analytics_router, prefix="/api/users/{user_id}")
+
+# Live quiz channel (WebSocket)
+app.include_router(live_router)
+app.include_router(live_router, prefix="/api/users/{user_id}")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, JSON
+from sqlalchemy import (
+    Column, Integer, SmallInteger, BigInteger, String, Float, DateTime, ForeignKey, Text, Boolean, JSON, Index,
+    LargeBinary
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -6,6 +9,9 @@ import uuid
 from database import Base
 
 
+DEFAULT_USER_ID = "default"
+
+
 def generate_uuid():
     return str(uuid.uuid4())
 
@@ -21,6 +27,7 @@ class Quiz(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    content_version = Column(Integer, nullable=False, default=0)  # bumped on any question change
 
     questions = relationship("Question", back_populates="quiz", cascade="all, delete-orphan")
     sessions = relationship("StudySession", back_populates="quiz", cascade="all, delete-orphan")
@@ -29,17 +36,35 @@ class Quiz(Base):
         return f"<Quiz(id={self.id}, name='{self.name}')>"
 
 
+class Topic(Base):
+    """Model for storing interned topic names (referenced by questions and session themes)"""
+    __tablename__ = "topics"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Topic(id={self.id}, name='{self.name}')>"
+
+
 class Question(Base):
     """Model for storing questions"""
     __tablename__ = "questions"
+    __table_args__ = (
+        # Covers id and topic projections of a quiz's questions without reading the text columns
+        Index("ix_questions_quiz_active_topic", "quiz_id", "is_active", "topic"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(String(36), unique=True, default=generate_uuid, index=True)
     quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
     topic = Column(String(255), nullable=False, index=True)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=True, index=True)
     question_text = Column(Text, nullable=False)
     alternatives = Column(JSON, nullable=False)
     correct_answer = Column(Text, nullable=False)
+    correct_index = Column(SmallInteger, nullable=True)  # position of correct_answer in alternatives
     explanation = Column(Text, nullable=True)
     difficulty = Column(Integer, default=1)  # 1-5
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -47,7 +72,18 @@ class Question(Base):
     is_active = Column(Boolean, default=True)
 
     quiz = relationship("Quiz", back_populates="questions")
+    topic_ref = relationship("Topic")
     answers = relationship("SessionAnswer", back_populates="question", cascade="all, delete-orphan")
+    stats = relationship("QuestionStat", back_populates="question", uselist=False, cascade="all, delete-orphan")
+    reviews = relationship("QuestionReview", back_populates="question", cascade="all, delete-orphan")
+    answer_summaries = relationship("AnswerSummary", back_populates="question", cascade="all, delete-orphan")
+
+    def index_of(self, answer: str):
+        """Position of an answer text in alternatives, or None"""
+        for index, alternative in enumerate(self.alternatives or []):
+            if str(alternative) == answer:
+                return index
+        return None
 
     def __repr__(self):
         return f"<Question(id={self.id}, topic='{self.topic}')>"
@@ -56,9 +92,19 @@ class Question(Base):
 class StudySession(Base):
     """Model for storing study/test sessions"""
     __tablename__ = "study_sessions"
+    __table_args__ = (
+        Index("ix_study_sessions_user_quiz_completed", "user_id", "quiz_id", "is_completed"),
+        Index("ix_study_sessions_user_started", "user_id", "started_at"),
+        # Covers summarize_sessions: filters first, then every aggregated column
+        Index(
+            "ix_study_sessions_summary", "user_id", "is_completed", "quiz_id", "finished_at",
+            "correct_answers", "wrong_answers", "total_time", "score"
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(String(36), unique=True, default=generate_uuid, index=True)
+    user_id = Column(String(64), nullable=False, default=DEFAULT_USER_ID)
     quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
     total_questions = Column(Integer, nullable=False)
     correct_answers = Column(Integer, default=0)
@@ -69,28 +115,39 @@ class StudySession(Base):
     started_at = Column(DateTime, default=datetime.utcnow)
     finished_at = Column(DateTime, nullable=True)
     is_completed = Column(Boolean, default=False)
+    question_ids = Column(JSON, nullable=True)  # delivery order of the session's questions
+    shuffle_seed = Column(Integer, nullable=True)  # derives each question's alternative permutation
 
     quiz = relationship("Quiz", back_populates="sessions")
     topics = relationship("SessionTheme", back_populates="session", cascade="all, delete-orphan")
     answers = relationship("SessionAnswer", back_populates="session", cascade="all, delete-orphan")
 
     def __repr__(self):
-        return f"<StudySession(id={self.id}, quiz_id={self.quiz_id}, score={self.score})>"
+        return f"<StudySession(id={self.id}, user_id='{self.user_id}', quiz_id={self.quiz_id}, score={self.score})>"
 
 
 class SessionTheme(Base):
     """Model for storing statistics by topic in each session"""
     __tablename__ = "session_themes"
+    __table_args__ = (
+        Index("ix_session_themes_user_topic", "user_id", "topic"),
+        Index("ix_session_themes_user_session", "user_id", "session_id"),
+        Index("ix_session_themes_topic_id", "topic_id"),
+        Index("ix_session_themes_user_topic_id", "user_id", "topic_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String(64), nullable=False, default=DEFAULT_USER_ID)
     session_id = Column(Integer, ForeignKey("study_sessions.id"), nullable=False)
     topic = Column(String(255), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=True)
     correct_answers = Column(Integer, default=0)
     wrong_answers = Column(Integer, default=0)
     total_time = Column(Float, default=0.0)
     average_time = Column(Float, default=0.0)
 
     session = relationship("StudySession", back_populates="topics")
+    topic_ref = relationship("Topic")
 
     def __repr__(self):
         return f"<SessionTheme(topic='{self.topic}', correct={self.correct_answers})>"
@@ -99,11 +156,19 @@ class SessionTheme(Base):
 class SessionAnswer(Base):
     """Model for storing each individual answer of a session"""
     __tablename__ = "session_answers"
+    __table_args__ = (
+        Index("ix_session_answers_user_session", "user_id", "session_id"),
+        Index("ix_session_answers_user_question", "user_id", "question_id"),
+        # One answer per question and session; inserts rely on it instead of a pre-check
+        Index("ux_session_answers_session_question", "session_id", "question_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String(64), nullable=False, default=DEFAULT_USER_ID)
     session_id = Column(Integer, ForeignKey("study_sessions.id"), nullable=False)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
-    user_answer = Column(Text, nullable=False)
+    answer_index = Column(SmallInteger, nullable=True)  # position in question.alternatives; NULL if none matched
+    user_answer = Column(Text, nullable=True)  # submitted text, kept only when it matched no alternative
     is_correct = Column(Boolean, nullable=False)
     time_spent = Column(Float, default=0.0)
     answered_at = Column(DateTime, default=datetime.utcnow)
@@ -113,3 +178,181 @@ class SessionAnswer(Base):
 
     def __repr__(self):
         return f"<SessionAnswer(question_id={self.question_id}, is_correct={self.is_correct})>"
+
+
+class QuestionStat(Base):
+    """Model for storing running item statistics of each question"""
+    __tablename__ = "question_stats"
+    __table_args__ = (
+        Index("ix_question_stats_quiz_p_value", "quiz_id", "p_value"),
+    )
+
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    attempts = Column(Integer, default=0)
+    correct_count = Column(Integer, default=0)
+    p_value = Column(Float, default=0.0)  # proportion of correct answers
+    mean_time = Column(Float, default=0.0)
+    m2_time = Column(Float, default=0.0)  # Welford sum of squared deviations
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    question = relationship("Question", back_populates="stats")
+
+    def __repr__(self):
+        return f"<QuestionStat(question_id={self.question_id}, attempts={self.attempts}, p_value={self.p_value})>"
+
+
+class QuestionReview(Base):
+    """Model for storing the spaced-repetition (SM-2) state of each question per user"""
+    __tablename__ = "question_reviews"
+    __table_args__ = (
+        Index("ix_question_reviews_user_quiz_due", "user_id", "quiz_id", "due_at"),
+    )
+
+    user_id = Column(String(64), primary_key=True, default=DEFAULT_USER_ID)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    repetitions = Column(Integer, default=0)
+    interval_days = Column(Float, default=0.0)
+    ease_factor = Column(Float, default=2.5)
+    due_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_reviewed_at = Column(DateTime, nullable=True)
+
+    question = relationship("Question", back_populates="reviews")
+
+    def __repr__(self):
+        return f"<QuestionReview(user_id='{self.user_id}', question_id={self.question_id}, due_at={self.due_at})>"
+
+
+class TopicDecay(Base):
+    """Model for storing the fitted forgetting-curve parameters of each topic"""
+    __tablename__ = "topic_decays"
+
+    topic_id = Column(Integer, ForeignKey("topics.id"), primary_key=True)
+    decay_constant = Column(Float, nullable=False)  # λ per hour
+    initial_accuracy = Column(Float, nullable=False)
+    observations = Column(Integer, default=0)
+    fitted_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TopicDecay(topic_id={self.topic_id}, decay_constant={self.decay_constant})>"
+
+
+class ReviewQueue(Base):
+    """Model for storing the next review time of each topic of a quiz per user"""
+    __tablename__ = "review_queue"
+    __table_args__ = (
+        Index("ix_review_queue_user_due", "user_id", "due_at"),
+    )
+
+    user_id = Column(String(64), primary_key=True, default=DEFAULT_USER_ID)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    topic_id = Column(Integer, ForeignKey("topics.id"), primary_key=True)
+    correct_answers = Column(Integer, default=0)
+    wrong_answers = Column(Integer, default=0)
+    exposures = Column(Integer, default=0)  # completed sessions with the topic
+    last_review_at = Column(DateTime, nullable=False)
+    decay_constant = Column(Float, nullable=False)
+    priority_index = Column(Float, default=0.0)
+    due_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ReviewQueue(user_id='{self.user_id}', quiz_id={self.quiz_id}, topic_id={self.topic_id}, due_at={self.due_at})>"
+
+
+class TopicRollup(Base):
+    """Model for storing running per-topic totals of completed sessions per user"""
+    __tablename__ = "topic_rollups"
+
+    user_id = Column(String(64), primary_key=True, default=DEFAULT_USER_ID)
+    topic_id = Column(Integer, ForeignKey("topics.id"), primary_key=True)
+    correct_answers = Column(Integer, default=0)
+    wrong_answers = Column(Integer, default=0)
+    total_time = Column(Float, default=0.0)
+    sessions = Column(Integer, default=0)
+
+    def __repr__(self):
+        return f"<TopicRollup(user_id='{self.user_id}', topic_id={self.topic_id}, sessions={self.sessions})>"
+
+
+class QuestionSignature(Base):
+    """Model for storing the MinHash signature of each question (near-duplicate detection)"""
+    __tablename__ = "question_signatures"
+    __table_args__ = (
+        Index("ix_question_signatures_quiz", "quiz_id"),
+    )
+
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    signature = Column(LargeBinary, nullable=False)  # MinHash values, little-endian uint32
+
+    def __repr__(self):
+        return f"<QuestionSignature(question_id={self.question_id}, quiz_id={self.quiz_id})>"
+
+
+class QuestionBand(Base):
+    """Model for storing the LSH bucket of each band of a question signature"""
+    __tablename__ = "question_bands"
+    # Clustered on the key: bucket lookups within a quiz are one seek per band. Rows of a
+    # question are deleted by key, recomputed from its stored signature.
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+
+    def __repr__(self):
+        return f"<QuestionBand(quiz_id={self.quiz_id}, band={self.band}, question_id={self.question_id})>"
+
+
+class Job(Base):
+    """Model for storing background jobs (imports, analytics recomputation)"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String(36), unique=True, default=generate_uuid, index=True)
+    kind = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, running, completed, failed, cancelled
+    progress = Column(Float, default=0.0)  # 0-1
+    processed = Column(Integer, default=0)
+    total = Column(Integer, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    owner = Column(String(100), nullable=True)  # host:pid:token of the process running it
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed by the owner while the job is active
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
+
+
+class AnswerSummary(Base):
+    """Model for storing compacted per-user summaries of archived session answers"""
+    __tablename__ = "answer_summaries"
+    __table_args__ = (
+        Index("ix_answer_summaries_question", "question_id"),
+    )
+
+    user_id = Column(String(64), primary_key=True, default=DEFAULT_USER_ID)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    attempts = Column(Integer, default=0)
+    correct_count = Column(Integer, default=0)
+    mean_time = Column(Float, default=0.0)
+    m2_time = Column(Float, default=0.0)
+    # SM-2 state after the last archived answer
+    repetitions = Column(Integer, default=0)
+    interval_days = Column(Float, default=0.0)
+    ease_factor = Column(Float, default=2.5)
+    first_answered_at = Column(DateTime, nullable=True)
+    last_answered_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    question = relationship("Question", back_populates="answer_summaries")
+
+    def __repr__(self):
+        return f"<AnswerSummary(user_id='{self.user_id}', question_id={self.question_id}, attempts={self.attempts})>"
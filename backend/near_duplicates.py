@@ -0,0 +1,320 @@
+"""
+Near-duplicate question detection with MinHash and locality-sensitive hashing.
+
+Each question's text and (sorted) alternatives are normalized and cut into 4-byte
+shingles; a signature of NUM_PERM MinHash values estimates the Jaccard similarity of two
+questions as the share of equal positions. Signatures are split into BANDS bands of
+ROWS values, and questions sharing any band bucket are candidate duplicates, so finding
+them never compares all pairs.
+
+question_signatures and question_bands are kept in sync on every flush that adds,
+edits or deletes questions (see database.index_question_signatures). Cluster reports
+band the stored signatures of a quiz in memory; import checks look up the stored
+buckets of one question at a time.
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sqlalchemy import and_, bindparam, delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from models import Question, QuestionSignature, QuestionBand
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# With 32 bands of 4 rows a pair at similarity 0.6 shares a bucket 99% of the time (0.5: 87%)
+DEFAULT_SIMILARITY = 0.6
+MIN_SIMILARITY = 0.5
+# Attributes whose change requires a new signature
+SIGNATURE_ATTRIBUTES = ("question_text", "alternatives", "quiz_id")
+SIGNATURE_BATCH = 2000
+# Shingles hashed per numpy step (NUM_PERM x this many uint64 values)
+HASH_CHUNK = 16384
+DELETE_CHUNK = 10000
+
+
+def _constants(name: str, count: int) -> np.ndarray:
+    """Fixed odd 64-bit multipliers, stable across processes and numpy versions"""
+    return np.array([
+        int.from_bytes(hashlib.blake2b(f"{name}-{i}".encode(), digest_size=8).digest(), "little") | 1
+        for i in range(count)
+    ], dtype=np.uint64)
+
+
+HASH_A = _constants("minhash-a", NUM_PERM)[:, None]
+HASH_B = _constants("minhash-b", NUM_PERM)[:, None]
+BAND_MIX = _constants("band-mix", ROWS)
+
+
+def signature_text(question_text: str, alternatives: Optional[Sequence]) -> str:
+    """Lowercase words of the question and its alternatives, accents removed"""
+    parts = [question_text or ""] + sorted(str(alternative) for alternative in alternatives or [])
+    text = unicodedata.normalize("NFKD", " ".join(parts)).lower()
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"\w+", text))
+
+
+def _shingles(text: str) -> np.ndarray:
+    """Distinct 4-byte windows of the UTF-8 text as uint32"""
+    data = np.frombuffer(text.encode("utf-8").ljust(4), dtype=np.uint8).astype(np.uint32)
+    return np.unique(data[:-3] | data[1:-2] << 8 | data[2:-1] << 16 | data[3:] << 24)
+
+
+def signatures(texts: Sequence[str]) -> np.ndarray:
+    """MinHash signatures (len(texts), NUM_PERM) uint32 of normalized texts"""
+    result = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    shingles = [_shingles(text) for text in texts]
+
+    start = 0
+    while start < len(shingles):
+        # As many texts as fit into one hashing step (at least one)
+        end, size = start, 0
+        while end < len(shingles) and (end == start or size + len(shingles[end]) <= HASH_CHUNK):
+            size += len(shingles[end])
+            end += 1
+
+        values = np.concatenate(shingles[start:end]).astype(np.uint64)
+        offsets = np.cumsum([0] + [len(s) for s in shingles[start:end - 1]])
+        # Multiply-add-shift universal hashing (uint64 arithmetic wraps)
+        hashed = ((HASH_A * values + HASH_B) >> np.uint64(32)).astype(np.uint32)
+        result[start:end] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+
+    return result
+
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """Bucket of each band (len(sigs), BANDS) as non-negative int64"""
+    rows = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    mixed = (rows * BAND_MIX).sum(axis=2, dtype=np.uint64)
+    return (mixed >> np.uint64(1)).astype(np.int64)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of signatures (row-wise)"""
+    return np.count_nonzero(a == b, axis=-1) / NUM_PERM
+
+
+def _to_blob(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def _from_blobs(blobs: Sequence[bytes]) -> np.ndarray:
+    return np.frombuffer(b"".join(blobs), dtype="<u4").reshape(len(blobs), NUM_PERM)
+
+
+def unindex_questions(db: Session, question_ids: Sequence[int]):
+    """Drop the signatures and buckets of questions (not committed)"""
+    connection = db.connection()
+    for start in range(0, len(question_ids), DELETE_CHUNK):
+        rows = connection.execute(select(
+            QuestionSignature.question_id, QuestionSignature.quiz_id, QuestionSignature.signature
+        ).where(QuestionSignature.question_id.in_(question_ids[start:start + DELETE_CHUNK]))).all()
+        if not rows:
+            continue
+
+        # Buckets follow from the stored signature, so rows are deleted by primary key
+        keys = band_keys(_from_blobs([row.signature for row in rows]))
+        connection.execute(delete(QuestionBand).where(
+            QuestionBand.quiz_id == bindparam("b_quiz_id"),
+            QuestionBand.band == bindparam("b_band"),
+            QuestionBand.bucket == bindparam("b_bucket"),
+            QuestionBand.question_id == bindparam("b_question_id")
+        ), [
+            {"b_quiz_id": row.quiz_id, "b_band": band, "b_bucket": bucket, "b_question_id": row.question_id}
+            for row, buckets in zip(rows, keys.tolist())
+            for band, bucket in enumerate(buckets)
+        ])
+        connection.execute(delete(QuestionSignature).where(
+            QuestionSignature.question_id.in_([row.question_id for row in rows])
+        ))
+
+
+def remove_quiz_signatures(db: Session, quiz_id: int):
+    """Drop the signatures and buckets of a whole quiz before it is deleted (not committed)"""
+    db.query(QuestionBand).filter(QuestionBand.quiz_id == quiz_id).delete(synchronize_session=False)
+    db.query(QuestionSignature).filter(QuestionSignature.quiz_id == quiz_id).delete(synchronize_session=False)
+
+
+def index_questions(db: Session, questions: Sequence):
+    """
+    Store signatures and buckets of flushed questions without any (not committed).
+    Questions are objects or rows with id, quiz_id, question_text and alternatives.
+    """
+    if not questions:
+        return
+
+    sigs = signatures([signature_text(q.question_text, q.alternatives) for q in questions])
+    connection = db.connection()
+    connection.execute(insert(QuestionSignature), [
+        {"question_id": q.id, "quiz_id": q.quiz_id, "signature": _to_blob(signature)}
+        for q, signature in zip(questions, sigs)
+    ])
+
+    # Inserted in key order: random bucket order costs a B-tree page per row
+    quiz_ids = np.repeat([q.quiz_id for q in questions], BANDS)
+    question_ids = np.repeat([q.id for q in questions], BANDS)
+    bands = np.tile(np.arange(BANDS), len(questions))
+    buckets = band_keys(sigs).ravel()
+    order = np.lexsort((question_ids, buckets, bands, quiz_ids))
+    connection.execute(insert(QuestionBand), [
+        {"quiz_id": quiz_id, "band": band, "bucket": bucket, "question_id": question_id}
+        for quiz_id, band, bucket, question_id in zip(
+            quiz_ids[order].tolist(), bands[order].tolist(), buckets[order].tolist(), question_ids[order].tolist()
+        )
+    ])
+
+
+def rebuild_question_signatures(db: Session, quiz_id: Optional[int] = None) -> int:
+    """Recompute the signatures of all questions (or one quiz's); returns the question count"""
+    question_query = db.query(Question.id, Question.quiz_id, Question.question_text, Question.alternatives)
+    if quiz_id:
+        remove_quiz_signatures(db, quiz_id)
+        question_query = question_query.filter(Question.quiz_id == quiz_id)
+    else:
+        db.query(QuestionBand).delete(synchronize_session=False)
+        db.query(QuestionSignature).delete(synchronize_session=False)
+
+    count = 0
+    last_id = 0
+    while True:
+        batch = question_query.filter(Question.id > last_id).order_by(Question.id).limit(SIGNATURE_BATCH).all()
+        if not batch:
+            return count
+        index_questions(db, batch)
+        count += len(batch)
+        last_id = batch[-1].id
+
+
+def find_clusters(sigs: np.ndarray, threshold: float = DEFAULT_SIMILARITY) -> List[np.ndarray]:
+    """
+    Groups of row indexes whose signatures are linked by estimated similarity
+    >= threshold, largest first. Candidates come from shared band buckets: within a
+    bucket every member is compared with the first and the previous member only, so a
+    bucket of m identical questions costs O(m) comparisons.
+    """
+    n = len(sigs)
+    if n < 2:
+        return []
+
+    keys = band_keys(sigs)
+    firsts, seconds = [], []
+    positions = np.arange(n)
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind="stable")
+        ordered = keys[order, band]
+        same = ordered[1:] == ordered[:-1]
+        if not same.any():
+            continue
+        run_start = np.maximum.accumulate(np.where(np.r_[True, ~same], positions, 0))
+        members = order[1:][same]
+        firsts += [order[:-1][same], order[run_start[1:][same]]]
+        seconds += [members, members]
+
+    if not firsts:
+        return []
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    pairs = np.unique(np.minimum(first, second) * n + np.maximum(first, second))
+    first, second = pairs // n, pairs % n
+    pairs = pairs[(first != second) & (similarity(sigs[first], sigs[second]) >= threshold)]
+    if len(pairs) == 0:
+        return []
+
+    graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs // n, pairs % n)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    sizes = np.bincount(labels)
+    order = np.argsort(labels, kind="stable")
+    groups = np.split(order, np.cumsum(sizes)[:-1])
+    return sorted((g for g in groups if len(g) > 1), key=lambda g: (-len(g), g[0]))
+
+
+def quiz_clusters(
+    db: Session,
+    quiz_id: int,
+    threshold: float = DEFAULT_SIMILARITY,
+    include_inactive: bool = False
+) -> List[List[Tuple[Question, float]]]:
+    """
+    Near-duplicate clusters of a quiz's questions, each ordered by id with the
+    estimated similarity of every member to the first one.
+    """
+    query = db.query(
+        Question.id, Question.topic, Question.question_text, Question.is_active, QuestionSignature.signature
+    ).join(
+        QuestionSignature, QuestionSignature.question_id == Question.id
+    ).filter(QuestionSignature.quiz_id == quiz_id)
+    if not include_inactive:
+        query = query.filter(Question.is_active == True)
+    rows = query.order_by(Question.id).all()
+    if len(rows) < 2:
+        return []
+
+    sigs = _from_blobs([row.signature for row in rows])
+    clusters = []
+    for group in find_clusters(sigs, threshold):
+        scores = similarity(sigs[group], sigs[group[0]])
+        clusters.append([(rows[i], float(score)) for i, score in zip(group, scores)])
+    return clusters
+
+
+class NearDuplicateFilter:
+    """
+    Import check against one quiz: a question is rejected when it is a near-duplicate
+    of an active question of the quiz or of a question accepted earlier in the import.
+    """
+
+    def __init__(self, db: Session, quiz_id: int, threshold: float = DEFAULT_SIMILARITY):
+        self.db = db
+        self.quiz_id = quiz_id
+        self.threshold = threshold
+        self._labels: List[str] = []
+        self._signatures: List[np.ndarray] = []
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+
+    def check(self, label: str, question_text: str, alternatives: Sequence) -> Optional[Tuple[str, float]]:
+        """(matched question, similarity) of a near-duplicate, or None after accepting the question"""
+        signature = signatures([signature_text(question_text, alternatives)])[0]
+        buckets = list(enumerate(band_keys(signature[None])[0].tolist()))
+        best: Optional[Tuple[str, float]] = None
+
+        # Stored questions sharing a bucket
+        stored = self.db.query(QuestionSignature.question_id, QuestionSignature.signature).join(
+            QuestionBand, QuestionBand.question_id == QuestionSignature.question_id
+        ).join(
+            Question, Question.id == QuestionSignature.question_id
+        ).filter(
+            # Full primary key in every OR term, so each band is one seek (without
+            # the quiz id repeated, SQLite scans all of the quiz's buckets)
+            or_(*(
+                and_(QuestionBand.quiz_id == self.quiz_id, QuestionBand.band == band, QuestionBand.bucket == bucket)
+                for band, bucket in buckets
+            )),
+            Question.is_active == True
+        ).distinct().all()
+        if stored:
+            scores = similarity(_from_blobs([row.signature for row in stored]), signature)
+            top = int(np.argmax(scores))
+            best = (f"question #{stored[top].question_id}", float(scores[top]))
+
+        # Questions accepted earlier in this import (not yet committed)
+        pending = sorted({i for bucket in buckets for i in self._buckets.get(bucket, ())})
+        if pending:
+            scores = similarity(np.stack([self._signatures[i] for i in pending]), signature)
+            top = int(np.argmax(scores))
+            if best is None or scores[top] > best[1]:
+                best = (self._labels[pending[top]], float(scores[top]))
+
+        if best is not None and best[1] >= self.threshold:
+            return best
+
+        for bucket in buckets:
+            self._buckets.setdefault(bucket, []).append(len(self._labels))
+        self._labels.append(label)
+        self._signatures.append(signature)
+        return None
@@ -0,0 +1,166 @@
+"""
+Pre-serialized question payloads per quiz.
+
+Starting a session used to rebuild every question response from ORM rows. The cache
+keeps the JSON of each question once per quiz content version (bumped by any question
+create, update or delete), so a start only picks and permutes ids and splices the
+cached fragments into the response body.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Quiz, Question
+
+QUESTION_CACHE_QUIZZES = int(os.environ.get("KNOWMETRICS_QUESTION_CACHE_QUIZZES", "128"))
+
+# Columns a payload is built from; answers, explanations and timestamps are never sent at start
+PAYLOAD_COLUMNS = (
+    Question.id, Question.uuid, Question.topic, Question.question_text,
+    Question.alternatives, Question.difficulty, Question.is_active
+)
+
+
+def _json(value) -> bytes:
+    # Same encoding as FastAPI's JSONResponse
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class QuestionPayload:
+    """One question's response fragments; the alternatives are spliced in per session"""
+    __slots__ = ("id", "is_active", "head", "alternatives", "tail")
+
+    def __init__(self, question: Question):
+        self.id = question.id
+        self.is_active = bool(question.is_active)
+        self.head = (
+            b'{"id":' + _json(question.id)
+            + b',"uuid":' + _json(question.uuid)
+            + b',"topic":' + _json(question.topic)
+            + b',"question_text":' + _json(question.question_text)
+            + b',"alternatives":['
+        )
+        self.alternatives = [_json(str(alternative)) for alternative in question.alternatives]
+        self.tail = b',"difficulty":' + _json(question.difficulty) + b'}'
+
+    def render(self, permutation: List[int]) -> bytes:
+        return (
+            self.head + b",".join(self.alternatives[i] for i in permutation)
+            + b'],"permutation":' + _json(permutation) + self.tail
+        )
+
+
+class QuizPayloads:
+    """Payloads of every question of one quiz at one content version"""
+
+    def __init__(self, version: int, questions: List[Question]):
+        self.version = version
+        self.questions: Dict[int, QuestionPayload] = {q.id: QuestionPayload(q) for q in questions}
+        self.active_ids = [q.id for q in questions if q.is_active]
+
+    def alternative_count(self, question_id: int) -> int:
+        return len(self.questions[question_id].alternatives)
+
+    def render_questions(self, ids: List[int], permutations: List[List[int]]) -> bytes:
+        return b"[" + b",".join(
+            self.questions[question_id].render(permutation)
+            for question_id, permutation in zip(ids, permutations)
+        ) + b"]"
+
+
+class QuestionPayloadCache:
+    """LRU of QuizPayloads keyed by database file and quiz uuid (ids can be reused)"""
+
+    def __init__(self, max_quizzes: int):
+        self.max_quizzes = max_quizzes
+        self._entries: "OrderedDict[Tuple[str, str], QuizPayloads]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, db: Session, quiz: Quiz) -> QuizPayloads:
+        """Return the quiz's payloads, rebuilding them if its content version moved"""
+        key = (str(db.get_bind().url), quiz.uuid)
+        version = quiz.content_version or 0
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        # Plain column rows: no identity map entries, and only what a payload holds
+        questions = db.query(*PAYLOAD_COLUMNS).filter(Question.quiz_id == quiz.id).order_by(Question.id).all()
+        entry = QuizPayloads(version, questions)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None or current.version <= version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_quizzes:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def status(self) -> dict:
+        with self._lock:
+            entries = list(self._entries.values())
+            hits, misses = self._hits, self._misses
+        return {
+            "quizzes": len(entries),
+            "max_quizzes": self.max_quizzes,
+            "questions": sum(len(e.questions) for e in entries),
+            "hits": hits,
+            "misses": misses
+        }
+
+
+question_payloads = QuestionPayloadCache(QUESTION_CACHE_QUIZZES)
+
+
+def render_session_start(
+    session_id: int,
+    session_uuid: str,
+    quiz_name: str,
+    payloads: QuizPayloads,
+    ids: List[int],
+    permutations: List[List[int]]
+) -> bytes:
+    """SessionStartResponse body built from cached question fragments"""
+    return (
+        b'{"session_id":' + _json(session_id)
+        + b',"session_uuid":' + _json(session_uuid)
+        + b',"quiz_name":' + _json(quiz_name)
+        + b',"total_questions":' + _json(len(ids))
+        + b',"questions":' + payloads.render_questions(ids, permutations) + b'}'
+    )
+
+
+def render_question_page(
+    session_id: int,
+    start: int,
+    total_questions: int,
+    payloads: QuizPayloads,
+    ids: List[int],
+    permutations: List[List[int]],
+    next_from: Optional[int],
+    prefetch_at: Optional[int]
+) -> bytes:
+    """SessionQuestionPage body built from cached question fragments"""
+    return (
+        b'{"session_id":' + _json(session_id)
+        + b',"from":' + _json(start)
+        + b',"count":' + _json(len(ids))
+        + b',"total_questions":' + _json(total_questions)
+        + b',"questions":' + payloads.render_questions(ids, permutations)
+        + b',"next_from":' + _json(next_from)
+        + b',"prefetch_at":' + _json(prefetch_at) + b'}'
+    )
@@ -0,0 +1,144 @@
+"""
+Per-question item statistics and review state rebuilt from answer history.
+
+question_stats and question_reviews are maintained answer by answer; this module
+recomputes them from the archived answer summaries and the live session_answers,
+for the rebuild job and for databases upgraded from before the tables existed.
+"""
+from datetime import timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from models import Question, SessionAnswer, QuestionStat, QuestionReview, AnswerSummary
+from utils.analytics import welford_update, welford_merge, sm2_update
+
+REBUILD_CHUNK_SIZE = 500
+
+
+def apply_to_stat(stat, is_correct: bool, time_spent: float):
+    """Fold one answer into attempts/correct/Welford accumulators"""
+    stat.attempts, stat.mean_time, stat.m2_time = welford_update(
+        stat.attempts, stat.mean_time, stat.m2_time, time_spent or 0.0
+    )
+    if is_correct:
+        stat.correct_count += 1
+
+
+def apply_to_review(review, is_correct: bool):
+    """Fold one answer into SM-2 state"""
+    quality = 4 if is_correct else 1
+    review.repetitions, review.interval_days, review.ease_factor = sm2_update(
+        review.repetitions, review.interval_days, review.ease_factor, quality
+    )
+
+
+def rebuild_question_stats(
+    db: Session,
+    quiz_id: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, int], None]] = None
+) -> dict:
+    """
+    Recompute question_stats and question_reviews from archived answer summaries
+    plus the live session_answers.
+    Questions are processed in committed chunks, so an interrupted rebuild leaves
+    every question either fully rebuilt or untouched. on_chunk(processed, total)
+    runs after each commit.
+    """
+    query = db.query(Question.id, Question.quiz_id)
+    if quiz_id:
+        query = query.filter(Question.quiz_id == quiz_id)
+    questions = query.order_by(Question.id).all()
+    
+    total = len(questions)
+    answers_replayed = 0
+    
+    for start in range(0, total, REBUILD_CHUNK_SIZE):
+        chunk = questions[start:start + REBUILD_CHUNK_SIZE]
+        quiz_by_question = {q.id: q.quiz_id for q in chunk}
+        ids = list(quiz_by_question.keys())
+        
+        summaries = db.query(AnswerSummary).filter(AnswerSummary.question_id.in_(ids)).all()
+        answers = db.query(
+            SessionAnswer.user_id,
+            SessionAnswer.question_id,
+            SessionAnswer.is_correct,
+            SessionAnswer.time_spent,
+            SessionAnswer.answered_at
+        ).filter(
+            SessionAnswer.question_id.in_(ids)
+        ).order_by(SessionAnswer.question_id, SessionAnswer.answered_at).all()
+        
+        db.query(QuestionStat).filter(QuestionStat.question_id.in_(ids)).delete(synchronize_session=False)
+        db.query(QuestionReview).filter(QuestionReview.question_id.in_(ids)).delete(synchronize_session=False)
+        
+        stats = {}
+        reviews = {}
+        
+        def get_stat(qid):
+            if qid not in stats:
+                stats[qid] = QuestionStat(
+                    question_id=qid,
+                    quiz_id=quiz_by_question[qid],
+                    attempts=0,
+                    correct_count=0,
+                    mean_time=0.0,
+                    m2_time=0.0
+                )
+            return stats[qid]
+        
+        # Archived answers start from their summaries
+        for summary in summaries:
+            stat = get_stat(summary.question_id)
+            stat.attempts, stat.mean_time, stat.m2_time = welford_merge(
+                stat.attempts, stat.mean_time, stat.m2_time,
+                summary.attempts, summary.mean_time, summary.m2_time
+            )
+            stat.correct_count += summary.correct_count
+            reviews[(summary.user_id, summary.question_id)] = QuestionReview(
+                user_id=summary.user_id,
+                question_id=summary.question_id,
+                quiz_id=summary.quiz_id,
+                repetitions=summary.repetitions,
+                interval_days=summary.interval_days,
+                ease_factor=summary.ease_factor,
+                last_reviewed_at=summary.last_answered_at
+            )
+        
+        # Live answers are replayed on top, oldest first
+        for answer in answers:
+            qid = answer.question_id
+            apply_to_stat(get_stat(qid), answer.is_correct, answer.time_spent)
+            
+            # Review state is per learner
+            review_key = (answer.user_id, qid)
+            if review_key not in reviews:
+                reviews[review_key] = QuestionReview(
+                    user_id=answer.user_id,
+                    question_id=qid,
+                    quiz_id=quiz_by_question[qid],
+                    repetitions=0,
+                    interval_days=0.0,
+                    ease_factor=2.5
+                )
+            
+            review = reviews[review_key]
+            apply_to_review(review, answer.is_correct)
+            review.last_reviewed_at = answer.answered_at
+        
+        for stat in stats.values():
+            stat.p_value = stat.correct_count / stat.attempts if stat.attempts else 0.0
+        for review in reviews.values():
+            review.due_at = review.last_reviewed_at + timedelta(days=review.interval_days)
+        
+        db.add_all(list(stats.values()) + list(reviews.values()))
+        db.commit()
+        
+        answers_replayed += len(answers)
+        if on_chunk is not None:
+            on_chunk(start + len(chunk), total)
+    
+    return {
+        "questions_processed": total,
+        "answers_replayed": answers_replayed
+    }
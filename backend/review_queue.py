@@ -0,0 +1,142 @@
+"""
+Materialized review-due queue.
+
+One row per (user, quiz, topic) holds the running correct/wrong counts of the user's
+completed sessions and the time the topic's retention falls to the review target on
+its forgetting curve. Finishing a session folds its topics into the rows, deleting one
+recomputes the affected rows from session themes, and the schedule endpoint reads due
+rows through the due_at indexes without touching session history.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import StudySession, SessionTheme, TopicDecay, ReviewQueue
+from utils.analytics import (
+    calculate_next_review, calculate_entropy, calculate_priority_index, DEFAULT_DECAY_CONSTANT
+)
+
+REVIEW_TARGET = 0.85
+QUEUE_KEY = ["user_id", "quiz_id", "topic_id"]
+QUEUE_COLUMNS = [column.name for column in ReviewQueue.__table__.columns]
+
+
+def schedule(row: ReviewQueue, decay_constant: float):
+    """Set the decay constant, priority and due time of a row from its counts"""
+    total = row.correct_answers + row.wrong_answers
+    accuracy = row.correct_answers / total if total else 0.0
+    hours = calculate_next_review(accuracy, REVIEW_TARGET, decay_constant)
+    row.decay_constant = decay_constant
+    row.priority_index = calculate_priority_index(calculate_entropy(row.correct_answers, total), row.exposures)
+    row.due_at = row.last_review_at + timedelta(hours=hours)
+
+
+def _decay_constants(db: Session, topic_ids: Optional[Iterable[int]] = None) -> Dict[int, float]:
+    query = db.query(TopicDecay.topic_id, TopicDecay.decay_constant)
+    if topic_ids is not None:
+        query = query.filter(TopicDecay.topic_id.in_(list(topic_ids)))
+    return dict(query.all())
+
+
+def record_session(db: Session, session: StudySession, topic_counts: Dict[int, Tuple[int, int]]):
+    """Fold a completed session's (correct, wrong) per topic id into its queue rows (not committed)"""
+    if not topic_counts:
+        return
+    
+    current = {
+        row.topic_id: row
+        for row in db.query(
+            ReviewQueue.topic_id, ReviewQueue.correct_answers, ReviewQueue.wrong_answers,
+            ReviewQueue.exposures, ReviewQueue.last_review_at
+        ).filter(
+            ReviewQueue.user_id == session.user_id,
+            ReviewQueue.quiz_id == session.quiz_id,
+            ReviewQueue.topic_id.in_(list(topic_counts))
+        )
+    }
+    decays = _decay_constants(db, topic_counts)
+    
+    values = []
+    for topic_id, (correct, wrong) in topic_counts.items():
+        previous = current.get(topic_id)
+        row = ReviewQueue(
+            user_id=session.user_id,
+            quiz_id=session.quiz_id,
+            topic_id=topic_id,
+            correct_answers=correct + (previous.correct_answers if previous else 0),
+            wrong_answers=wrong + (previous.wrong_answers if previous else 0),
+            exposures=1 + (previous.exposures if previous else 0),
+            last_review_at=max(previous.last_review_at, session.finished_at) if previous else session.finished_at
+        )
+        schedule(row, decays.get(topic_id, DEFAULT_DECAY_CONSTANT))
+        values.append({column: getattr(row, column) for column in QUEUE_COLUMNS})
+    
+    # One upsert for all topics, whether or not they are queued already
+    statement = sqlite_insert(ReviewQueue)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=QUEUE_KEY,
+        set_={column: statement.excluded[column] for column in QUEUE_COLUMNS if column not in QUEUE_KEY}
+    ), values)
+
+
+def rebuild_review_queue(
+    db: Session,
+    user_id: Optional[str] = None,
+    quiz_id: Optional[int] = None,
+    topic_ids: Optional[Iterable[int]] = None
+) -> int:
+    """
+    Recompute queue rows from the session themes of completed sessions, for all rows
+    or those matching the given user, quiz and topics (not committed).
+    Returns the number of rows written.
+    """
+    themes = db.query(
+        StudySession.user_id,
+        StudySession.quiz_id,
+        SessionTheme.topic_id,
+        func.sum(SessionTheme.correct_answers),
+        func.sum(SessionTheme.wrong_answers),
+        func.count(SessionTheme.id),
+        func.max(StudySession.finished_at)
+    ).join(
+        StudySession, StudySession.id == SessionTheme.session_id
+    ).filter(
+        StudySession.is_completed == True,
+        StudySession.finished_at.isnot(None),
+        SessionTheme.topic_id.isnot(None)
+    )
+    stale = db.query(ReviewQueue)
+    if user_id is not None:
+        themes = themes.filter(StudySession.user_id == user_id)
+        stale = stale.filter(ReviewQueue.user_id == user_id)
+    if quiz_id is not None:
+        themes = themes.filter(StudySession.quiz_id == quiz_id)
+        stale = stale.filter(ReviewQueue.quiz_id == quiz_id)
+    if topic_ids is not None:
+        topic_ids = list(topic_ids)
+        themes = themes.filter(SessionTheme.topic_id.in_(topic_ids))
+        stale = stale.filter(ReviewQueue.topic_id.in_(topic_ids))
+    
+    aggregates = themes.group_by(StudySession.user_id, StudySession.quiz_id, SessionTheme.topic_id).all()
+    stale.delete(synchronize_session=False)
+    
+    decays = _decay_constants(db, topic_ids)
+    rows = []
+    for user, quiz, topic_id, correct, wrong, exposures, last_review in aggregates:
+        row = ReviewQueue(
+            user_id=user,
+            quiz_id=quiz,
+            topic_id=topic_id,
+            correct_answers=correct or 0,
+            wrong_answers=wrong or 0,
+            exposures=exposures,
+            last_review_at=last_review
+        )
+        schedule(row, decays.get(topic_id, DEFAULT_DECAY_CONSTANT))
+        rows.append(row)
+    
+    db.add_all(rows)
+    return len(rows)
@@ -2,10 +2,16 @@ from .quizzes import router as quizzes_router
 from .questions import router as questions_router
 from .sessions import router as sessions_router
 from .analytics import router as analytics_router
+from .jobs import router as jobs_router
+from .export import router as export_router
+from .live import router as live_router
 
 __all__ = [
     "quizzes_router",
     "questions_router", 
     "sessions_router",
-    "analytics_router"
+    "analytics_router",
+    "jobs_router",
+    "export_router",
+    "live_router"
 ]
@@ -1,57 +1,66 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+from collections import defaultdict
+import math
 
-from database import get_db
-from models import Quiz, Question, StudySession, SessionTheme, SessionAnswer
+from database import get_read_db, get_user_id, get_tenant_id, scope_to_user
+from models import (
+    Quiz, Topic, Question, StudySession, SessionTheme, SessionAnswer, TopicDecay, ReviewQueue,
+    TopicRollup
+)
 from schemas import (
     DashboardStats, PredictionResponse, RetentionResponse,
-    SessionResponse, TopicRetention, StudyScheduleItem
+    SessionResponse, TopicRetention, StudyScheduleItem, TopicDecayResponse, ReviewQueueItem
 )
 from utils.analytics import (
-    predict_performance, analyze_topic_retention, 
-    generate_study_schedule, format_time
+    predict_performance, predict_performance_arrays, analyze_topic_retention, 
+    generate_study_schedule, format_time, calculate_retention_rate, describe_next_review,
+    DEFAULT_DECAY_CONSTANT
 )
+from analytics_store import analytics_stores
+from routes.sessions import summarize_sessions
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+# Session ids per IN (...) query, below SQLite's bound parameter limit
+SESSION_ID_CHUNK = 900
+
 
 @router.get("/dashboard", response_model=DashboardStats)
-def get_dashboard(db: Session = Depends(get_db)):
+def get_dashboard(
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id)
+):
     """Get overall dashboard statistics"""
     # Count totals
     total_quizzes = db.query(func.count(Quiz.id)).filter(Quiz.is_active == True).scalar()
     total_questions = db.query(func.count(Question.id)).filter(Question.is_active == True).scalar()
-    total_sessions = db.query(func.count(StudySession.id)).filter(
-        StudySession.is_completed == True
-    ).scalar()
     
-    # Get completed sessions stats
-    sessions = db.query(StudySession).filter(StudySession.is_completed == True).all()
-    
-    total_time = sum(s.total_time for s in sessions)
-    total_correct = sum(s.correct_answers for s in sessions)
-    total_wrong = sum(s.wrong_answers for s in sessions)
-    total_answered = total_correct + total_wrong
-    
-    avg_score = sum(s.score for s in sessions) / len(sessions) if sessions else 0
-    accuracy = (total_correct / total_answered * 100) if total_answered > 0 else 0
+    # Completed sessions stats, aggregated in SQL
+    totals = summarize_sessions(db, user_id)
+    total_answered = totals.correct + totals.wrong
+    accuracy = (totals.correct / total_answered * 100) if total_answered > 0 else 0
     
     # Get recent sessions
-    recent_sessions_query = db.query(StudySession).filter(
+    recent_sessions_query = scope_to_user(db.query(StudySession), StudySession, user_id).filter(
         StudySession.is_completed == True
     ).order_by(desc(StudySession.finished_at)).limit(5).all()
     
+    quiz_names = dict(
+        db.query(Quiz.id, Quiz.name).filter(Quiz.id.in_({s.quiz_id for s in recent_sessions_query})).all()
+    ) if recent_sessions_query else {}
+    
     recent_sessions = []
     for session in recent_sessions_query:
-        quiz = db.query(Quiz).filter(Quiz.id == session.quiz_id).first()
         recent_sessions.append(SessionResponse(
             id=session.id,
             uuid=session.uuid,
+            user_id=session.user_id,
             quiz_id=session.quiz_id,
-            quiz_name=quiz.name if quiz else "Unknown",
+            quiz_name=quiz_names.get(session.quiz_id, "Unknown"),
             total_questions=session.total_questions,
             correct_answers=session.correct_answers,
             wrong_answers=session.wrong_answers,
@@ -66,60 +75,33 @@ def get_dashboard(db: Session = Depends(get_db)):
     return DashboardStats(
         total_quizzes=total_quizzes,
         total_questions=total_questions,
-        total_sessions=total_sessions,
-        total_study_time=total_time,
-        average_score=round(avg_score, 2),
-        total_correct=total_correct,
-        total_wrong=total_wrong,
+        total_sessions=totals.sessions,
+        total_study_time=totals.total_time,
+        average_score=round(totals.average_score, 2),
+        total_correct=totals.correct,
+        total_wrong=totals.wrong,
         accuracy=round(accuracy, 1),
         recent_sessions=recent_sessions
     )
 
 
-@router.get("/prediction/{quiz_id}", response_model=PredictionResponse)
-def get_performance_prediction(
-    quiz_id: int,
-    exam_questions: int = Query(..., ge=1, description="Number of questions in the exam"),
-    min_score: float = Query(..., ge=1, description="Minimum correct answers to pass"),
-    db: Session = Depends(get_db)
-):
-    """Predict performance for an upcoming exam"""
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Get all completed sessions for this quiz
-    sessions = db.query(StudySession).filter(
-        StudySession.quiz_id == quiz_id,
-        StudySession.is_completed == True
-    ).all()
-    
-    if not sessions:
-        raise HTTPException(
-            status_code=400, 
-            detail="No completed sessions found. Complete some study sessions first."
-        )
-    
-    # Prepare session data for prediction
-    sessions_data = []
-    for session in sessions:
-        sessions_data.append({
-            'correct': session.correct_answers,
-            'wrong': session.wrong_answers,
-            'time': session.total_time,
-            'date': session.finished_at
-        })
+def _collect_topics_data(db: Session, sessions: list, current_time: datetime) -> dict:
+    """Aggregate per-topic correct/wrong, exposures and last review over sessions"""
+    themes_by_session = defaultdict(list)
+    session_ids = [session.id for session in sessions]
+    for start in range(0, len(session_ids), SESSION_ID_CHUNK):
+        themes = db.query(
+            SessionTheme.session_id, SessionTheme.topic,
+            SessionTheme.correct_answers, SessionTheme.wrong_answers
+        ).filter(
+            SessionTheme.session_id.in_(session_ids[start:start + SESSION_ID_CHUNK])
+        ).order_by(SessionTheme.id)
+        for stat in themes:
+            themes_by_session[stat.session_id].append(stat)
     
-    # Get topic-level data
-    current_time = datetime.utcnow()
     topics_data = {}
-    
     for session in sessions:
-        topic_stats = db.query(SessionTheme).filter(
-            SessionTheme.session_id == session.id
-        ).all()
-        
-        for stat in topic_stats:
+        for stat in themes_by_session.get(session.id, ()):
             if stat.topic not in topics_data:
                 topics_data[stat.topic] = {
                     'correct': 0,
@@ -135,19 +117,79 @@ def get_performance_prediction(
             if session.finished_at and session.finished_at > topics_data[stat.topic]['last_review']:
                 topics_data[stat.topic]['last_review'] = session.finished_at
     
+    return topics_data
+
+
+def _topic_decay_constants(db: Session) -> Dict[str, float]:
+    """Fitted decay constant per topic name (topics without a fit use the default)"""
+    return dict(
+        db.query(Topic.name, TopicDecay.decay_constant).join(TopicDecay, TopicDecay.topic_id == Topic.id).all()
+    )
+
+
+@router.get("/prediction/{quiz_id}", response_model=PredictionResponse)
+def get_performance_prediction(
+    quiz_id: int,
+    exam_questions: int = Query(..., ge=1, description="Number of questions in the exam"),
+    min_score: float = Query(..., ge=1, description="Minimum correct answers to pass"),
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id),
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Predict performance for an upcoming exam"""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    current_time = datetime.utcnow()
+    store = analytics_stores.get(tenant_id)
+    
+    if store:
+        correct, wrong, times = store.session_totals(quiz_id, user_id)
+        has_sessions = len(correct) > 0
+    else:
+        # Get all completed sessions for this quiz
+        sessions = scope_to_user(db.query(StudySession), StudySession, user_id).filter(
+            StudySession.quiz_id == quiz_id,
+            StudySession.is_completed == True
+        ).all()
+        has_sessions = bool(sessions)
+    
+    if not has_sessions:
+        raise HTTPException(
+            status_code=400, 
+            detail="No completed sessions found. Complete some study sessions first."
+        )
+    
+    if store:
+        prediction = predict_performance_arrays(correct, wrong, times, exam_questions, min_score)
+        topics_data = store.topic_aggregates(quiz_id, user_id)
+    else:
+        # Prepare session data for prediction
+        sessions_data = []
+        for session in sessions:
+            sessions_data.append({
+                'correct': session.correct_answers,
+                'wrong': session.wrong_answers,
+                'time': session.total_time,
+                'date': session.finished_at
+            })
+        prediction = predict_performance(sessions_data, exam_questions, min_score)
+        topics_data = _collect_topics_data(db, sessions, current_time)
+    
     # Analyze retention by topic
     topics_retention = {}
     topics_analysis = []
+    decay_constants = _topic_decay_constants(db)
     
     for topic, data in topics_data.items():
-        analysis = analyze_topic_retention(data, current_time)
+        analysis = analyze_topic_retention(
+            data, current_time, decay_constants.get(topic, DEFAULT_DECAY_CONSTANT)
+        )
         analysis['topic'] = topic
         topics_analysis.append(analysis)
         topics_retention[topic] = analysis['retention_rate']
     
-    # Generate prediction
-    prediction = predict_performance(sessions_data, exam_questions, min_score)
-    
     # Generate study schedule
     study_schedule = generate_study_schedule(topics_analysis)
     
@@ -163,55 +205,50 @@ def get_performance_prediction(
 
 
 @router.get("/retention/{quiz_id}", response_model=RetentionResponse)
-def get_retention_analysis(quiz_id: int, db: Session = Depends(get_db)):
+def get_retention_analysis(
+    quiz_id: int,
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id),
+    tenant_id: str = Depends(get_tenant_id)
+):
     """Get detailed retention analysis for a quiz"""
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    sessions = db.query(StudySession).filter(
-        StudySession.quiz_id == quiz_id,
-        StudySession.is_completed == True
-    ).all()
+    current_time = datetime.utcnow()
+    store = analytics_stores.get(tenant_id)
+    
+    if store:
+        session_count = len(store.session_totals(quiz_id, user_id)[0])
+    else:
+        sessions = scope_to_user(db.query(StudySession), StudySession, user_id).filter(
+            StudySession.quiz_id == quiz_id,
+            StudySession.is_completed == True
+        ).all()
+        session_count = len(sessions)
     
-    if not sessions:
+    if not session_count:
         raise HTTPException(
             status_code=400,
             detail="No completed sessions found"
         )
     
-    current_time = datetime.utcnow()
-    
     # Aggregate topic data
-    topics_data = {}
-    for session in sessions:
-        topic_stats = db.query(SessionTheme).filter(
-            SessionTheme.session_id == session.id
-        ).all()
-        
-        for stat in topic_stats:
-            if stat.topic not in topics_data:
-                topics_data[stat.topic] = {
-                    'correct': 0,
-                    'wrong': 0,
-                    'exposures': 0,
-                    'last_review': session.finished_at or current_time
-                }
-            
-            topics_data[stat.topic]['correct'] += stat.correct_answers
-            topics_data[stat.topic]['wrong'] += stat.wrong_answers
-            topics_data[stat.topic]['exposures'] += 1
-            
-            if session.finished_at and session.finished_at > topics_data[stat.topic]['last_review']:
-                topics_data[stat.topic]['last_review'] = session.finished_at
+    if store:
+        topics_data = store.topic_aggregates(quiz_id, user_id)
+    else:
+        topics_data = _collect_topics_data(db, sessions, current_time)
     
     # Analyze each topic
     all_topics = []
     topics_at_risk = []
     topics_mastered = []
+    decay_constants = _topic_decay_constants(db)
     
     for topic, data in topics_data.items():
-        analysis = analyze_topic_retention(data, current_time)
+        decay_constant = decay_constants.get(topic, DEFAULT_DECAY_CONSTANT)
+        analysis = analyze_topic_retention(data, current_time, decay_constant)
         
         topic_retention = TopicRetention(
             topic=topic,
@@ -220,7 +257,8 @@ def get_retention_analysis(quiz_id: int, db: Session = Depends(get_db)):
             exposures=analysis['exposures'],
             days_since_review=analysis['days_since_review'],
             hours_until_review=analysis['hours_until_review'],
-            priority_index=analysis['priority_index']
+            priority_index=analysis['priority_index'],
+            decay_constant=decay_constant
         )
         
         all_topics.append(topic_retention)
@@ -245,7 +283,7 @@ def get_retention_analysis(quiz_id: int, db: Session = Depends(get_db)):
     return RetentionResponse(
         quiz_id=quiz.id,
         quiz_name=quiz.name,
-        total_sessions=len(sessions),
+        total_sessions=session_count,
         total_questions=total_questions,
         overall_retention=round(avg_retention, 1),
         topics_at_risk=topics_at_risk,
@@ -255,20 +293,42 @@ def get_retention_analysis(quiz_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/topics")
-def get_all_topics_analytics(db: Session = Depends(get_db)):
-    """Get analytics for all topics across all quizzes"""
-    topics_data = db.query(
-        SessionTheme.topic,
-        func.sum(SessionTheme.correct_answers).label('total_correct'),
-        func.sum(SessionTheme.wrong_answers).label('total_wrong'),
-        func.avg(SessionTheme.average_time).label('avg_time'),
-        func.count(SessionTheme.id).label('occurrences')
-    ).group_by(SessionTheme.topic).all()
+def get_all_topics_analytics(
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id)
+):
+    """Get analytics for all topics across all quizzes (from the maintained topic rollup)"""
+    if user_id:
+        # One row per topic for a single user
+        columns = (
+            TopicRollup.correct_answers.label('total_correct'),
+            TopicRollup.wrong_answers.label('total_wrong'),
+            TopicRollup.total_time.label('total_time'),
+            TopicRollup.sessions.label('occurrences')
+        )
+    else:
+        columns = (
+            func.sum(TopicRollup.correct_answers).label('total_correct'),
+            func.sum(TopicRollup.wrong_answers).label('total_wrong'),
+            func.sum(TopicRollup.total_time).label('total_time'),
+            func.sum(TopicRollup.sessions).label('occurrences')
+        )
+    
+    query = db.query(Topic.name.label('topic'), *columns).select_from(TopicRollup).join(
+        Topic, Topic.id == TopicRollup.topic_id
+    )
+    if user_id:
+        query = query.filter(TopicRollup.user_id == user_id)
+    else:
+        query = query.group_by(TopicRollup.topic_id)
+    topics_data = query.order_by(Topic.name).all()
     
     result = []
     for topic in topics_data:
         total = topic.total_correct + topic.total_wrong
         accuracy = (topic.total_correct / total * 100) if total > 0 else 0
+        # Mean time per answer, weighted by each session's answer count
+        average_time = topic.total_time / total if total > 0 else 0
         
         result.append({
             "topic": topic.topic,
@@ -276,7 +336,7 @@ def get_all_topics_analytics(db: Session = Depends(get_db)):
             "correct": topic.total_correct,
             "wrong": topic.total_wrong,
             "accuracy": round(accuracy, 1),
-            "average_time": round(topic.avg_time or 0, 2),
+            "average_time": round(average_time, 2),
             "sessions_with_topic": topic.occurrences
         })
     
@@ -284,3 +344,81 @@ def get_all_topics_analytics(db: Session = Depends(get_db)):
     result.sort(key=lambda x: x['accuracy'])
     
     return result
+
+
+@router.get("/schedule", response_model=List[ReviewQueueItem])
+def get_review_schedule(
+    within_hours: float = Query(24, ge=0, description="Include topics due up to this many hours from now"),
+    quiz_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id)
+):
+    """Topics due for review, soonest first, read from the review-due queue"""
+    current_time = datetime.utcnow()
+    
+    query = db.query(ReviewQueue, Quiz.name, Topic.name).join(
+        Quiz, Quiz.id == ReviewQueue.quiz_id
+    ).join(
+        Topic, Topic.id == ReviewQueue.topic_id
+    )
+    query = scope_to_user(query, ReviewQueue, user_id).filter(
+        ReviewQueue.due_at <= current_time + timedelta(hours=within_hours),
+        Quiz.is_active == True
+    )
+    if quiz_id:
+        query = query.filter(ReviewQueue.quiz_id == quiz_id)
+    
+    rows = query.order_by(ReviewQueue.due_at, desc(ReviewQueue.priority_index)).limit(limit).all()
+    
+    schedule = []
+    for entry, quiz_name, topic in rows:
+        total = entry.correct_answers + entry.wrong_answers
+        accuracy = entry.correct_answers / total if total else 0.0
+        hours_since = (current_time - entry.last_review_at).total_seconds() / 3600
+        hours_until = max((entry.due_at - current_time).total_seconds() / 3600, 0.0)
+        next_review, priority = describe_next_review(hours_until)
+        
+        schedule.append(ReviewQueueItem(
+            user_id=entry.user_id,
+            quiz_id=entry.quiz_id,
+            quiz_name=quiz_name,
+            topic=topic,
+            accuracy=round(accuracy * 100, 1),
+            retention_rate=round(calculate_retention_rate(accuracy, hours_since, entry.decay_constant) * 100, 1),
+            exposures=entry.exposures,
+            last_review_at=entry.last_review_at,
+            due_at=entry.due_at,
+            hours_until_review=round(hours_until, 1),
+            next_review=next_review,
+            priority=priority,
+            priority_index=round(entry.priority_index, 3)
+        ))
+    
+    return schedule
+
+
+@router.get("/decay", response_model=List[TopicDecayResponse])
+def get_topic_decay(db: Session = Depends(get_read_db)):
+    """Fitted forgetting-curve parameters per topic (POST /api/jobs/fit-decay refits them)"""
+    rows = db.query(Topic.name, TopicDecay).join(TopicDecay, TopicDecay.topic_id == Topic.id).order_by(
+        desc(TopicDecay.decay_constant)
+    ).all()
+    
+    return [
+        TopicDecayResponse(
+            topic=name,
+            decay_constant=decay.decay_constant,
+            half_life_hours=round(math.log(2) / decay.decay_constant, 1) if decay.decay_constant > 0 else None,
+            initial_accuracy=round(decay.initial_accuracy * 100, 1),
+            observations=decay.observations,
+            fitted_at=decay.fitted_at
+        )
+        for name, decay in rows
+    ]
+
+
+@router.get("/engine")
+def get_analytics_engine_status():
+    """Report which analytics engine is active and the in-memory store's footprint"""
+    return analytics_stores.status()
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+
+from database import get_tenant_id
+from export import stream_answer_log, EXPORT_FORMATS
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+
+@router.get("/answers")
+def export_answers(
+    format: str = Query("parquet", pattern="^(parquet|arrow)$"),
+    quiz_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Stream the joined answer log as Parquet or Arrow IPC, in bounded batches"""
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    
+    return StreamingResponse(
+        stream_answer_log(tenant_id, format, quiz_id, since, until),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=answers.{extension}"}
+    )
@@ -0,0 +1,414 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, create_engine, inspect, text, MetaData, Table, Column, insert
+from typing import List, Optional
+from datetime import datetime, timedelta
+import os
+
+import numpy as np
+
+from database import get_db, get_read_db, get_tenant_id, archive_database_path
+from models import Question, StudySession, SessionAnswer, AnswerSummary, TopicDecay, Job
+from schemas import JobResponse
+from jobs import runner, ACTIVE_STATUSES
+from utils.analytics import fit_decay_constants
+from question_stats import rebuild_question_stats as rebuild_stats, apply_to_stat, apply_to_review
+from review_queue import rebuild_review_queue
+from topic_rollup import rebuild_topic_rollup
+from near_duplicates import rebuild_question_signatures
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+ARCHIVE_CHUNK_SIZE = 5000
+ARCHIVE_AFTER_DAYS = int(os.environ.get("KNOWMETRICS_ARCHIVE_AFTER_DAYS", "180"))
+DECAY_READ_BATCH = 10000
+# Repeats closer than this (same sitting) say nothing about forgetting
+DECAY_MIN_GAP_HOURS = 0.25
+EPOCH = datetime(1970, 1, 1)
+
+
+def _rebuild_question_stats_job(db: Session, ctx, quiz_id: Optional[int] = None) -> dict:
+    """Background job: recompute question_stats and question_reviews from answer history"""
+    return rebuild_stats(
+        db, quiz_id, on_chunk=lambda processed, total: ctx.update(processed, total, force=processed == total)
+    )
+
+
+def _fit_decay_job(db: Session, ctx, min_observations: int = 30) -> dict:
+    """
+    Background job: fit the forgetting-curve decay constant of every topic from
+    repeat exposures (consecutive answers of a learner to the same question) and
+    replace the stored topic_decays.
+    """
+    total = db.query(SessionAnswer.id).join(Question, Question.id == SessionAnswer.question_id).filter(
+        Question.topic_id.isnot(None)
+    ).count()
+    
+    users, questions, topics, times, correct = [], [], [], [], []
+    user_ids = {}
+    rows = db.query(
+        SessionAnswer.user_id,
+        SessionAnswer.question_id,
+        Question.topic_id,
+        SessionAnswer.answered_at,
+        SessionAnswer.is_correct
+    ).join(Question, Question.id == SessionAnswer.question_id).filter(
+        Question.topic_id.isnot(None)
+    ).execution_options(yield_per=DECAY_READ_BATCH)
+    
+    for row in rows:
+        users.append(user_ids.setdefault(row.user_id, len(user_ids)))
+        questions.append(row.question_id)
+        topics.append(row.topic_id)
+        times.append((row.answered_at - EPOCH).total_seconds() / 3600 if row.answered_at else np.nan)
+        correct.append(row.is_correct)
+        if len(users) % DECAY_READ_BATCH == 0:
+            ctx.update(len(users), total)
+    
+    users = np.array(users, dtype=np.int64)
+    questions = np.array(questions, dtype=np.int64)
+    topics = np.array(topics, dtype=np.int64)
+    times = np.array(times, dtype=np.float64)
+    correct = np.array(correct, dtype=np.float64)
+    
+    # Consecutive exposures of one learner to one question
+    order = np.lexsort((times, questions, users))
+    users, questions, topics, times, correct = (
+        users[order], questions[order], topics[order], times[order], correct[order]
+    )
+    gaps = np.diff(times)
+    repeat = (users[1:] == users[:-1]) & (questions[1:] == questions[:-1]) & (gaps >= DECAY_MIN_GAP_HOURS)
+    
+    topic_ids, topic_index = np.unique(topics[1:][repeat], return_inverse=True)
+    initial, decay, observations = fit_decay_constants(
+        topic_index, gaps[repeat], correct[1:][repeat], len(topic_ids), min_observations
+    )
+    
+    fitted = ~np.isnan(decay)
+    now = datetime.utcnow()
+    db.query(TopicDecay).delete(synchronize_session=False)
+    db.add_all([
+        TopicDecay(
+            topic_id=int(topic_ids[i]),
+            decay_constant=float(decay[i]),
+            initial_accuracy=float(initial[i]),
+            observations=int(observations[i]),
+            fitted_at=now
+        )
+        for i in np.flatnonzero(fitted)
+    ])
+    # Due times move with the new decay constants
+    rescheduled = rebuild_review_queue(db)
+    db.commit()
+    ctx.update(total, total, force=True)
+    
+    return {
+        "answers_read": len(users),
+        "repeat_exposures": int(repeat.sum()),
+        "topics_fitted": int(fitted.sum()),
+        "topics_skipped": int((~fitted).sum()),
+        "review_queue_rows": rescheduled
+    }
+
+
+def _rebuild_review_queue_job(db: Session, ctx, user_id: Optional[str] = None) -> dict:
+    """Background job: recompute the review-due queue from session themes"""
+    rows = rebuild_review_queue(db, user_id)
+    db.commit()
+    ctx.update(rows, rows, force=True)
+    return {"rows": rows}
+
+
+def _rebuild_topic_rollup_job(db: Session, ctx) -> dict:
+    """Background job: recompute the per-topic rollup from session themes"""
+    rows = rebuild_topic_rollup(db)
+    db.commit()
+    ctx.update(rows, rows, force=True)
+    return {"rows": rows}
+
+
+def _rebuild_question_signatures_job(db: Session, ctx, quiz_id: Optional[int] = None) -> dict:
+    """Background job: recompute the near-duplicate signatures of questions"""
+    questions = rebuild_question_signatures(db, quiz_id)
+    db.commit()
+    ctx.update(questions, questions, force=True)
+    return {"questions": questions}
+
+
+def _database_size(path: str) -> int:
+    """Size of a SQLite database including its write-ahead log"""
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def _archive_table(metadata: MetaData) -> Table:
+    """session_answers mirror without foreign keys, for the archive file"""
+    return Table(
+        SessionAnswer.__tablename__,
+        metadata,
+        *[Column(c.name, c.type, primary_key=c.primary_key) for c in SessionAnswer.__table__.columns]
+    )
+
+
+def _upgrade_archive_table(db: Session, archive_engine, archive_table: Table):
+    """Bring an archive file written by an older version to the current answer columns"""
+    name = archive_table.name
+    existing = {c["name"] for c in inspect(archive_engine).get_columns(name)}
+    legacy = "answer_index" not in existing
+    with archive_engine.begin() as conn:
+        if legacy:
+            # Answers used to be stored as NOT NULL alternative text: move it aside to index it
+            conn.execute(text(f"ALTER TABLE {name} RENAME COLUMN user_answer TO legacy_user_answer"))
+            existing.discard("user_answer")
+        
+        for column in archive_table.columns:
+            if column.name not in existing:
+                ddl = column.type.compile(dialect=archive_engine.dialect)
+                conn.execute(text(f"ALTER TABLE {name} ADD COLUMN {column.name} {ddl}"))
+        
+        if legacy:
+            # Index the text against the live questions; text matching no alternative is kept
+            pairs = conn.execute(text(f"SELECT DISTINCT question_id, legacy_user_answer FROM {name}")).all()
+            questions = {
+                q.id: q for q in db.query(Question).filter(Question.id.in_({qid for qid, _ in pairs}))
+            }
+            for question_id, user_answer in pairs:
+                question = questions.get(question_id)
+                if question is not None:
+                    conn.execute(
+                        text(f"UPDATE {name} SET answer_index = :index "
+                             "WHERE question_id = :question_id AND legacy_user_answer = :answer"),
+                        {"index": question.index_of(user_answer), "question_id": question_id, "answer": user_answer}
+                    )
+            conn.execute(text(f"UPDATE {name} SET user_answer = legacy_user_answer WHERE answer_index IS NULL"))
+            conn.execute(text(f"ALTER TABLE {name} DROP COLUMN legacy_user_answer"))
+
+
+def _archive_answers_job(
+    db: Session,
+    ctx,
+    older_than_days: int,
+    keep_raw: bool,
+    vacuum: str
+) -> dict:
+    """
+    Background job: compact answers of completed sessions older than the cutoff.
+    Each (user, question) keeps one answer_summaries row with counts, Welford
+    accumulators and SM-2 state, so question statistics rebuild to the same values.
+    With keep_raw the rows are first copied to an archive database file.
+    The live database is then vacuumed to return the freed pages.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    live_path = db.get_bind().url.database
+    size_before = _database_size(live_path)
+    
+    archive_engine = None
+    archive_table = None
+    if keep_raw:
+        archive_engine = create_engine(f"sqlite:///{archive_database_path(db)}")
+        archive_table = _archive_table(MetaData())
+        archive_table.metadata.create_all(bind=archive_engine)
+        _upgrade_archive_table(db, archive_engine, archive_table)
+    
+    candidates = db.query(SessionAnswer.id).join(
+        StudySession, StudySession.id == SessionAnswer.session_id
+    ).filter(
+        StudySession.is_completed == True,
+        SessionAnswer.answered_at < cutoff
+    )
+    total = candidates.count()
+    
+    archived = 0
+    summaries_touched = set()
+    try:
+        while True:
+            # Ids follow insertion (answer) order, so replay stays chronological
+            ids = [r.id for r in candidates.order_by(SessionAnswer.id).limit(ARCHIVE_CHUNK_SIZE).all()]
+            if not ids:
+                break
+            
+            rows = db.query(SessionAnswer, Question.quiz_id).join(
+                Question, Question.id == SessionAnswer.question_id
+            ).filter(SessionAnswer.id.in_(ids)).order_by(SessionAnswer.id).all()
+            
+            keys = {(answer.user_id, answer.question_id) for answer, _ in rows}
+            summaries = {
+                (s.user_id, s.question_id): s
+                for s in db.query(AnswerSummary).filter(
+                    AnswerSummary.question_id.in_({qid for _, qid in keys})
+                ).all()
+                if (s.user_id, s.question_id) in keys
+            }
+            
+            for answer, quiz_id in rows:
+                key = (answer.user_id, answer.question_id)
+                summary = summaries.get(key)
+                if summary is None:
+                    summary = AnswerSummary(
+                        user_id=answer.user_id,
+                        question_id=answer.question_id,
+                        quiz_id=quiz_id,
+                        attempts=0,
+                        correct_count=0,
+                        mean_time=0.0,
+                        m2_time=0.0,
+                        repetitions=0,
+                        interval_days=0.0,
+                        ease_factor=2.5,
+                        first_answered_at=answer.answered_at
+                    )
+                    db.add(summary)
+                    summaries[key] = summary
+                
+                apply_to_stat(summary, answer.is_correct, answer.time_spent)
+                apply_to_review(summary, answer.is_correct)
+                summary.last_answered_at = answer.answered_at
+                summaries_touched.add(key)
+            
+            if archive_engine is not None:
+                with archive_engine.begin() as conn:
+                    conn.execute(
+                        insert(archive_table).prefix_with("OR IGNORE"),
+                        [
+                            {c.name: getattr(answer, c.name) for c in archive_table.columns}
+                            for answer, _ in rows
+                        ]
+                    )
+            
+            db.query(SessionAnswer).filter(SessionAnswer.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            db.expunge_all()
+            
+            archived += len(rows)
+            ctx.update(archived, total)
+    finally:
+        if archive_engine is not None:
+            archive_engine.dispose()
+    
+    # VACUUM cannot run inside a transaction
+    db.commit()
+    if vacuum != "none" and archived > 0:
+        with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            auto_vacuum = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+            if vacuum == "full":
+                conn.exec_driver_sql("VACUUM")
+            elif auto_vacuum == 2:
+                conn.exec_driver_sql("PRAGMA incremental_vacuum")
+            else:
+                # Switching to incremental auto-vacuum takes effect after one full VACUUM
+                conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    return {
+        "answers_archived": archived,
+        "summaries_updated": len(summaries_touched),
+        "cutoff": cutoff.isoformat(),
+        "archive_file": archive_database_path(db) if keep_raw else None,
+        "database_bytes_before": size_before,
+        "database_bytes_after": _database_size(live_path)
+    }
+
+
+@router.get("", response_model=List[JobResponse])
+def list_jobs(
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_read_db)
+):
+    """List background jobs, most recent first"""
+    query = db.query(Job)
+    
+    if status:
+        query = query.filter(Job.status == status)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    
+    return query.order_by(desc(Job.created_at)).limit(limit).all()
+
+
+@router.post("/rebuild-question-stats", response_model=JobResponse)
+def rebuild_question_stats(
+    quiz_id: Optional[int] = None,
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Recompute per-question statistics and review state in a background job"""
+    return runner.submit(
+        "rebuild_question_stats", _rebuild_question_stats_job, quiz_id, tenant_id=tenant_id
+    )
+
+
+@router.post("/archive-answers", response_model=JobResponse)
+def archive_answers(
+    older_than_days: int = Query(ARCHIVE_AFTER_DAYS, ge=1),
+    keep_raw: bool = False,
+    vacuum: str = Query("incremental", pattern="^(incremental|full|none)$"),
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Compact old answers into per-user summaries (optionally keeping raw rows in an archive file)"""
+    return runner.submit(
+        "archive_answers", _archive_answers_job, older_than_days, keep_raw, vacuum,
+        tenant_id=tenant_id
+    )
+
+
+@router.post("/fit-decay", response_model=JobResponse)
+def fit_decay(
+    min_observations: int = Query(30, ge=2),
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Fit per-topic forgetting-curve decay constants from repeat exposures in a background job"""
+    return runner.submit("fit_decay", _fit_decay_job, min_observations, tenant_id=tenant_id)
+
+
+@router.post("/rebuild-review-queue", response_model=JobResponse)
+def rebuild_review_queue_endpoint(
+    user_id: Optional[str] = None,
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Recompute the review-due queue from completed sessions in a background job"""
+    return runner.submit("rebuild_review_queue", _rebuild_review_queue_job, user_id, tenant_id=tenant_id)
+
+
+@router.post("/rebuild-topic-rollup", response_model=JobResponse)
+def rebuild_topic_rollup_endpoint(tenant_id: str = Depends(get_tenant_id)):
+    """Recompute the per-topic analytics rollup from completed sessions in a background job"""
+    return runner.submit("rebuild_topic_rollup", _rebuild_topic_rollup_job, tenant_id=tenant_id)
+
+
+@router.post("/rebuild-question-signatures", response_model=JobResponse)
+def rebuild_question_signatures_endpoint(
+    quiz_id: Optional[int] = None,
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Recompute the near-duplicate signatures of all questions (or one quiz's) in a background job"""
+    return runner.submit(
+        "rebuild_question_signatures", _rebuild_question_signatures_job, quiz_id, tenant_id=tenant_id
+    )
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Get job status and progress"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Request cancellation of a pending or running job"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job.status not in ACTIVE_STATUSES or not runner.cancel(job_id, tenant_id):
+        raise HTTPException(status_code=400, detail=f"Job is not active (status: {job.status})")
+    
+    db.refresh(job)
+    return job
@@ -0,0 +1,150 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import load_only
+from pydantic import ValidationError
+from typing import Dict, Optional, Set
+import json
+
+from database import tenant_router, scope_to_user, DEFAULT_TENANT_ID
+from models import Question, StudySession, SessionAnswer
+from schemas import SessionAnswer as SessionAnswerSchema
+from routes.sessions import record_answer, complete_session, GRADING_COLUMNS
+
+router = APIRouter(prefix="/ws", tags=["Live"])
+
+
+class LiveSession:
+    """
+    Per-connection state of a live quiz session.
+    Holds one database session for the whole connection and keeps the quiz's
+    questions and the answered question ids in memory between answers. The session's
+    transaction ends after every message, so an idle socket holds no pooled connection.
+    """
+
+    def __init__(self, tenant_id: str, user_id: Optional[str], session_id: int):
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+        self.session_id = session_id
+        # Objects stay loaded across commits; this connection is their only writer
+        self.db = tenant_router.get_sessionmaker(tenant_id)(expire_on_commit=False)
+        self.session: Optional[StudySession] = None
+        self.questions: Dict[int, Question] = {}
+        self.answered: Set[int] = set()
+
+    def open(self) -> Optional[StudySession]:
+        query = scope_to_user(self.db.query(StudySession), StudySession, self.user_id)
+        self.session = query.filter(StudySession.id == self.session_id).first()
+        if not self.session:
+            return None
+        
+        # Held for the whole connection: only the columns grading needs
+        self.questions = {
+            q.id: q for q in self.db.query(Question).options(load_only(*GRADING_COLUMNS)).filter(
+                Question.quiz_id == self.session.quiz_id
+            )
+        }
+        self.answered = {
+            question_id for (question_id,) in self.db.query(SessionAnswer.question_id).filter(
+                SessionAnswer.session_id == self.session_id
+            )
+        }
+        self.release()
+        return self.session
+
+    def release(self):
+        """End the current transaction and return its connection to the pool; loaded objects stay usable"""
+        self.db.commit()
+
+    def state(self) -> dict:
+        return {
+            "type": "session",
+            "session_id": self.session.id,
+            "quiz_id": self.session.quiz_id,
+            "total_questions": self.session.total_questions,
+            "questions_answered": self.session.correct_answers + self.session.wrong_answers,
+            "current_score": self.session.correct_answers,
+            "is_completed": self.session.is_completed
+        }
+
+    def answer(self, answer_data: SessionAnswerSchema) -> dict:
+        if self.session.is_completed:
+            raise HTTPException(status_code=400, detail="Session already completed")
+        
+        question = self.questions.get(answer_data.question_id)
+        if question is None:
+            question = self.db.query(Question).options(load_only(*GRADING_COLUMNS)).filter(
+                Question.id == answer_data.question_id
+            ).first()
+            if not question:
+                raise HTTPException(status_code=404, detail="Question not found")
+        
+        if answer_data.question_id in self.answered:
+            raise HTTPException(status_code=400, detail="Question already answered")
+        
+        try:
+            result = record_answer(self.db, self.session, question, answer_data)
+        except HTTPException:
+            # Rejected after its first write (answered or finished elsewhere): release the write lock
+            self.db.rollback()
+            raise
+        self.answered.add(answer_data.question_id)
+        return {"type": "result", "question_id": answer_data.question_id, **result.model_dump()}
+
+    def finish(self) -> dict:
+        if self.session.is_completed:
+            raise HTTPException(status_code=400, detail="Session already completed")
+        result = complete_session(self.db, self.session, self.tenant_id)
+        return {"type": "finished", **result.model_dump()}
+
+    def close(self):
+        self.db.close()
+
+
+@router.websocket("/sessions/{session_id}")
+async def live_session(websocket: WebSocket, session_id: int):
+    """
+    Live quiz channel. After the initial "session" message the client sends
+    {"type": "answer", "question_id", "answer_index", "permutation", "time_spent"} and receives a
+    "result" with grading, explanation and running score; {"type": "finish"}
+    completes the session and closes the connection.
+    """
+    tenant_id = websocket.scope.get("state", {}).get("tenant_id", DEFAULT_TENANT_ID)
+    live = LiveSession(tenant_id, websocket.path_params.get("user_id"), session_id)
+    
+    try:
+        # Accept before rejecting so the close code reaches clients through proxies
+        await websocket.accept()
+        if not await run_in_threadpool(live.open):
+            await websocket.close(code=4404, reason="Session not found")
+            return
+        
+        await websocket.send_json(live.state())
+        
+        while True:
+            text = await websocket.receive_text()
+            
+            try:
+                message = json.loads(text)
+                kind = message.get("type") if isinstance(message, dict) else None
+                if kind == "answer":
+                    answer_data = SessionAnswerSchema.model_validate(message)
+                    await websocket.send_json(await run_in_threadpool(live.answer, answer_data))
+                elif kind == "finish":
+                    await websocket.send_json(await run_in_threadpool(live.finish))
+                    await websocket.close()
+                    return
+                else:
+                    await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "status": 422, "detail": e.errors(include_url=False)})
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "status": 400, "detail": "Message is not valid JSON"})
+            finally:
+                # Lookups of a rejected message (expired state, unknown question) may have checked one out
+                await run_in_threadpool(live.release)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await run_in_threadpool(live.close)
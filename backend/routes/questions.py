@@ -1,19 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy import func
 from typing import List, Optional
+import math
 import random
 
-from database import get_db
-from models import Quiz, Question
+from database import get_db, get_read_db
+from models import Quiz, Topic, Question, QuestionStat
 from schemas import (
     QuestionCreate, QuestionUpdate, QuestionResponse,
-    QuestionBulkCreate, MessageResponse
+    QuestionBulkCreate, QuestionStatsResponse, MessageResponse
 )
+from utils.analytics import welford_variance
 
 router = APIRouter(prefix="/questions", tags=["Questions"])
 
 
+# Fields a client can ask for with ?fields=; each is a Question column
+QUESTION_FIELDS = tuple(QuestionResponse.model_fields)
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Requested QuestionResponse fields in response order (id always included), or None for whole rows"""
+    if fields is None:
+        return None
+    
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(QUESTION_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(QUESTION_FIELDS)}"
+        )
+    requested.add("id")
+    return [name for name in QUESTION_FIELDS if name in requested]
+
+
+def _question_query(db: Session, selected: Optional[List[str]]):
+    """Query of the selected Question columns, or of whole Question rows"""
+    if selected:
+        return db.query(*(getattr(Question, name) for name in selected))
+    return db.query(Question)
+
+
+def _field_rows(rows, fields: List[str]) -> JSONResponse:
+    """Column rows as JSON objects holding only the requested fields"""
+    return JSONResponse(content=jsonable_encoder([dict(zip(fields, row)) for row in rows]))
+
+
 @router.get("", response_model=List[QuestionResponse])
 def list_questions(
     quiz_id: Optional[int] = None,
@@ -22,10 +58,16 @@ def list_questions(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,topic"),
+    db: Session = Depends(get_read_db)
 ):
-    """List questions with optional filters"""
-    query = db.query(Question)
+    """
+    List questions with optional filters.
+    With fields only those columns are read and returned, so listings that need
+    ids and topics skip the question texts, alternatives and explanations.
+    """
+    selected = _parse_fields(fields)
+    query = _question_query(db, selected)
     
     if active_only:
         query = query.filter(Question.is_active == True)
@@ -37,6 +79,8 @@ def list_questions(
         query = query.filter(Question.difficulty == difficulty)
     
     questions = query.offset(skip).limit(limit).all()
+    if selected:
+        return _field_rows(questions, selected)
     return questions
 
 
@@ -45,47 +89,52 @@ def get_random_questions(
     quiz_id: int,
     count: int = Query(10, ge=1, le=100),
     topic: Optional[str] = None,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,topic"),
+    db: Session = Depends(get_read_db)
 ):
-    """Get random questions from a quiz"""
+    """Get random questions from a quiz (fields as in the question list)"""
+    selected = _parse_fields(fields)
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    query = db.query(Question).filter(
+    # Sampled inside SQLite from the covering quiz index; only the picked rows are read
+    picked = db.query(Question.id).filter(
         Question.quiz_id == quiz_id,
         Question.is_active == True
     )
     
     if topic:
-        query = query.filter(Question.topic == topic)
+        picked = picked.filter(Question.topic == topic)
     
-    questions = query.all()
+    picked = picked.order_by(func.random()).limit(count)
     
-    if len(questions) <= count:
-        random.shuffle(questions)
-        return questions
+    query = _question_query(db, selected)
+    questions = query.filter(Question.id.in_(picked.scalar_subquery())).all()
     
-    return random.sample(questions, count)
+    random.shuffle(questions)
+    if selected:
+        return _field_rows(questions, selected)
+    return questions
 
 
 @router.get("/stats/by-topic")
-def get_stats_by_topic(quiz_id: Optional[int] = None, db: Session = Depends(get_db)):
+def get_stats_by_topic(quiz_id: Optional[int] = None, db: Session = Depends(get_read_db)):
     """Get question statistics grouped by topic"""
     query = db.query(
-        Question.topic,
+        Topic.name,
         func.count(Question.id).label('total'),
         func.avg(Question.difficulty).label('avg_difficulty')
-    ).filter(Question.is_active == True)
+    ).join(Topic, Topic.id == Question.topic_id).filter(Question.is_active == True)
     
     if quiz_id:
         query = query.filter(Question.quiz_id == quiz_id)
     
-    results = query.group_by(Question.topic).all()
+    results = query.group_by(Question.topic_id).order_by(Topic.name).all()
     
     return [
         {
-            "topic": r.topic,
+            "topic": r.name,
             "total_questions": r.total,
             "average_difficulty": round(float(r.avg_difficulty or 0), 2)
         }
@@ -102,6 +151,46 @@ def get_question(question_id: int, db: Session = Depends(get_db)):
     return question
 
 
+@router.get("/{question_id}/stats", response_model=QuestionStatsResponse)
+def get_question_stats(question_id: int, db: Session = Depends(get_read_db)):
+    """Get item statistics (p-value and response time) for a question"""
+    question = db.query(Question).options(
+        load_only(Question.id, Question.quiz_id, Question.topic, Question.question_text)
+    ).filter(Question.id == question_id).first()
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    
+    stat = db.query(QuestionStat).filter(QuestionStat.question_id == question_id).first()
+    if not stat:
+        return QuestionStatsResponse(
+            question_id=question.id,
+            quiz_id=question.quiz_id,
+            topic=question.topic,
+            question_text=question.question_text,
+            attempts=0,
+            correct_count=0,
+            p_value=0.0,
+            mean_time=0.0,
+            time_variance=0.0,
+            time_stddev=0.0
+        )
+    
+    variance = welford_variance(stat.attempts, stat.m2_time)
+    
+    return QuestionStatsResponse(
+        question_id=question.id,
+        quiz_id=question.quiz_id,
+        topic=question.topic,
+        question_text=question.question_text,
+        attempts=stat.attempts,
+        correct_count=stat.correct_count,
+        p_value=round(stat.p_value, 3),
+        mean_time=round(stat.mean_time, 2),
+        time_variance=round(variance, 2),
+        time_stddev=round(math.sqrt(variance), 2)
+    )
+
+
 @router.post("", response_model=QuestionResponse)
 def create_question(question_data: QuestionCreate, db: Session = Depends(get_db)):
     """Create a new question"""
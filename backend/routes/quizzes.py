@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import func, desc
+from typing import List, Optional, Tuple
 import csv
 import io
 import json
+import math
 
-from database import get_db
-from models import Quiz, Question, StudySession
+from database import get_db, get_read_db, get_tenant_id
+from models import Quiz, Question, StudySession, QuestionStat, ReviewQueue
 from schemas import (
     QuizCreate, QuizUpdate, QuizResponse, 
-    CSVImportResponse, CSVTemplateColumn, MessageResponse
+    CSVImportResponse, CSVTemplateColumn, QuestionStatsResponse, JobResponse, MessageResponse,
+    NearDuplicateCluster, NearDuplicateQuestion
 )
+from jobs import runner
+from analytics_store import analytics_stores
+from topic_rollup import remove_quiz_topics
+from near_duplicates import (
+    NearDuplicateFilter, quiz_clusters, remove_quiz_signatures, DEFAULT_SIMILARITY, MIN_SIMILARITY
+)
+from utils.analytics import welford_variance
 
 router = APIRouter(prefix="/quizzes", tags=["Quizzes"])
 
@@ -22,7 +31,7 @@ def list_quizzes(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """List all quizzes with question and session counts"""
     query = db.query(Quiz)
@@ -30,18 +39,26 @@ def list_quizzes(
         query = query.filter(Quiz.is_active == True)
     
     quizzes = query.offset(skip).limit(limit).all()
+    quiz_ids = [quiz.id for quiz in quizzes]
     
-    result = []
-    for quiz in quizzes:
-        question_count = db.query(func.count(Question.id)).filter(
-            Question.quiz_id == quiz.id,
+    # One grouped count per table instead of two queries per quiz
+    question_counts = dict(
+        db.query(Question.quiz_id, func.count(Question.id)).filter(
+            Question.quiz_id.in_(quiz_ids),
             Question.is_active == True
-        ).scalar()
-        
-        session_count = db.query(func.count(StudySession.id)).filter(
-            StudySession.quiz_id == quiz.id,
+        ).group_by(Question.quiz_id).all()
+    ) if quiz_ids else {}
+    session_counts = dict(
+        db.query(StudySession.quiz_id, func.count(StudySession.id)).filter(
+            StudySession.quiz_id.in_(quiz_ids),
             StudySession.is_completed == True
-        ).scalar()
+        ).group_by(StudySession.quiz_id).all()
+    ) if quiz_ids else {}
+    
+    result = []
+    for quiz in quizzes:
+        question_count = question_counts.get(quiz.id, 0)
+        session_count = session_counts.get(quiz.id, 0)
         
         quiz_dict = {
             "id": quiz.id,
@@ -140,98 +157,266 @@ def get_csv_columns():
     ]
 
 
-@router.post("/import-csv", response_model=CSVImportResponse)
-async def import_questions_csv(
-    file: UploadFile = File(...),
-    quiz_name: str = Form(...),
-    quiz_description: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
-):
-    """Import questions from CSV file"""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="File must be a CSV")
-    
-    # Check if quiz exists or create new
+IMPORT_BATCH_SIZE = 1000
+
+
+def _get_or_create_quiz(db: Session, quiz_name: str, quiz_description: Optional[str]) -> Quiz:
+    """Get quiz by name or create a new one"""
     existing_quiz = db.query(Quiz).filter(Quiz.name == quiz_name).first()
     if existing_quiz:
-        quiz = existing_quiz
-    else:
-        quiz = Quiz(name=quiz_name, description=quiz_description)
-        db.add(quiz)
-        db.commit()
-        db.refresh(quiz)
+        return existing_quiz
     
-    # Read CSV content
-    content = await file.read()
+    quiz = Quiz(name=quiz_name, description=quiz_description)
+    db.add(quiz)
+    db.commit()
+    db.refresh(quiz)
+    return quiz
+
+
+def _decode_csv(content: bytes) -> str:
     try:
-        decoded = content.decode('utf-8')
+        return content.decode('utf-8')
     except UnicodeDecodeError:
-        decoded = content.decode('latin-1')
-    
+        return content.decode('latin-1')
+
+
+def _csv_question(quiz_id: int, row_num: int, row: dict, duplicates: Optional[NearDuplicateFilter]) -> Question:
+    """Question of one CSV row; ValueError with the reason if the row is rejected"""
+    # Clean row keys (remove BOM and whitespace)
+    row = {k.strip().replace('\ufeff', ''): v.strip() if v else '' for k, v in row.items()}
+    
+    # Extract required fields
+    topic = row.get('topic', '').strip()
+    question_text = row.get('question_text', '').strip()
+    correct_answer = row.get('correct_answer', '').strip()
+    
+    if not topic or not question_text or not correct_answer:
+        raise ValueError("Missing required fields (topic, question_text, or correct_answer)")
+    
+    # Build alternatives list
+    alternatives = []
+    for i in range(1, 7):
+        alt = row.get(f'alternative_{i}', '').strip()
+        if alt:
+            alternatives.append(alt)
+    
+    if len(alternatives) < 2:
+        raise ValueError("At least 2 alternatives required")
+    
+    if correct_answer not in alternatives:
+        raise ValueError("correct_answer must be one of the alternatives")
+    
+    # Get optional fields
+    explanation = row.get('explanation', '').strip() or None
+    try:
+        difficulty = int(row.get('difficulty', 1) or 1)
+        difficulty = max(1, min(5, difficulty))
+    except ValueError:
+        difficulty = 1
+    
+    if duplicates:
+        match = duplicates.check(f"row {row_num}", question_text, alternatives)
+        if match:
+            raise ValueError(f"Near-duplicate of {match[0]} (similarity {match[1]:.2f})")
+    
+    return Question(
+        quiz_id=quiz_id,
+        topic=topic,
+        question_text=question_text,
+        alternatives=alternatives,
+        correct_answer=correct_answer,
+        explanation=explanation,
+        difficulty=difficulty
+    )
+
+
+def _json_question(quiz_id: int, i: int, q: dict, duplicates: Optional[NearDuplicateFilter]) -> Question:
+    """Question of one JSON item; ValueError with the reason if the item is rejected"""
+    # Map different possible field names
+    topic = q.get('topic') or q.get('tema') or q.get('theme', 'General')
+    question_text = q.get('question_text') or q.get('pergunta') or q.get('question', '')
+    alternatives = q.get('alternatives') or q.get('alternativas') or q.get('options', [])
+    correct_answer = q.get('correct_answer') or q.get('resposta') or q.get('answer', '')
+    explanation = q.get('explanation') or q.get('explicacao') or None
+    difficulty = q.get('difficulty') or q.get('dificuldade') or 1
+    
+    if not question_text or not alternatives or not correct_answer:
+        raise ValueError("Missing required fields")
+    
+    if len(alternatives) < 2:
+        raise ValueError("At least 2 alternatives required")
+    
+    if correct_answer not in alternatives:
+        raise ValueError("correct_answer must be in alternatives")
+    
+    if duplicates:
+        match = duplicates.check(f"item {i}", str(question_text), alternatives)
+        if match:
+            raise ValueError(f"Near-duplicate of {match[0]} (similarity {match[1]:.2f})")
+    
+    return Question(
+        quiz_id=quiz_id,
+        topic=str(topic),
+        question_text=str(question_text),
+        alternatives=alternatives,
+        correct_answer=str(correct_answer),
+        explanation=explanation,
+        difficulty=max(1, min(5, int(difficulty)))
+    )
+
+
+def _import_csv_rows(
+    db: Session,
+    quiz_id: int,
+    decoded: str,
+    ctx=None,
+    reject_near_duplicates: bool = False
+) -> Tuple[int, int, List[str]]:
+    """
+    Import questions from decoded CSV text.
+    Run as a job (with ctx), the import commits every IMPORT_BATCH_SIZE rows read and
+    reports progress after each batch; otherwise it is one transaction.
+    With reject_near_duplicates, rows similar to a question of the quiz or to an
+    earlier row are counted as failed.
+    """
     reader = csv.DictReader(io.StringIO(decoded))
+    total = max(decoded.count('\n') - 1, 0)  # estimate, quoted newlines are rare
+    duplicates = NearDuplicateFilter(db, quiz_id) if reject_near_duplicates else None
     
     questions_imported = 0
     questions_failed = 0
     errors = []
     
-    for row_num, row in enumerate(reader, start=2):
+    for processed, row in enumerate(reader, start=1):
+        row_num = processed + 1  # the header is row 1
         try:
-            # Clean row keys (remove BOM and whitespace)
-            row = {k.strip().replace('\ufeff', ''): v.strip() if v else '' for k, v in row.items()}
-            
-            # Extract required fields
-            topic = row.get('topic', '').strip()
-            question_text = row.get('question_text', '').strip()
-            correct_answer = row.get('correct_answer', '').strip()
-            
-            if not topic or not question_text or not correct_answer:
-                errors.append(f"Row {row_num}: Missing required fields (topic, question_text, or correct_answer)")
-                questions_failed += 1
-                continue
-            
-            # Build alternatives list
-            alternatives = []
-            for i in range(1, 7):
-                alt = row.get(f'alternative_{i}', '').strip()
-                if alt:
-                    alternatives.append(alt)
-            
-            if len(alternatives) < 2:
-                errors.append(f"Row {row_num}: At least 2 alternatives required")
-                questions_failed += 1
-                continue
-            
-            if correct_answer not in alternatives:
-                errors.append(f"Row {row_num}: correct_answer must be one of the alternatives")
-                questions_failed += 1
-                continue
-            
-            # Get optional fields
-            explanation = row.get('explanation', '').strip() or None
-            try:
-                difficulty = int(row.get('difficulty', 1) or 1)
-                difficulty = max(1, min(5, difficulty))
-            except ValueError:
-                difficulty = 1
-            
-            # Create question
-            question = Question(
-                quiz_id=quiz.id,
-                topic=topic,
-                question_text=question_text,
-                alternatives=alternatives,
-                correct_answer=correct_answer,
-                explanation=explanation,
-                difficulty=difficulty
-            )
-            db.add(question)
+            db.add(_csv_question(quiz_id, row_num, row, duplicates))
             questions_imported += 1
-            
         except Exception as e:
             errors.append(f"Row {row_num}: {str(e)}")
             questions_failed += 1
+        
+        # Skipped and rejected rows count towards the batch too
+        if ctx and processed % IMPORT_BATCH_SIZE == 0:
+            db.commit()
+            ctx.update(processed, max(total, processed))
     
     db.commit()
+    if ctx:
+        processed = questions_imported + questions_failed
+        ctx.update(processed, processed, force=True)
+    
+    return questions_imported, questions_failed, errors
+
+
+def _import_json_items(
+    db: Session,
+    quiz_id: int,
+    questions_data: list,
+    ctx=None,
+    reject_near_duplicates: bool = False
+) -> Tuple[int, int, List[str]]:
+    """
+    Import questions from parsed JSON items.
+    Run as a job (with ctx), the import commits every IMPORT_BATCH_SIZE items read and
+    reports progress after each batch; otherwise it is one transaction.
+    With reject_near_duplicates, items similar to a question of the quiz or to an
+    earlier item are counted as failed.
+    """
+    total = len(questions_data)
+    duplicates = NearDuplicateFilter(db, quiz_id) if reject_near_duplicates else None
+    
+    questions_imported = 0
+    questions_failed = 0
+    errors = []
+    
+    for i, q in enumerate(questions_data, start=1):
+        try:
+            db.add(_json_question(quiz_id, i, q, duplicates))
+            questions_imported += 1
+        except Exception as e:
+            errors.append(f"Question {i}: {str(e)}")
+            questions_failed += 1
+        
+        if ctx and i % IMPORT_BATCH_SIZE == 0:
+            db.commit()
+            ctx.update(i, total)
+    
+    db.commit()
+    if ctx:
+        ctx.update(total, total, force=True)
+    
+    return questions_imported, questions_failed, errors
+
+
+def _parse_json_questions(content: bytes) -> list:
+    try:
+        data = json.loads(content.decode('utf-8'))
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON format")
+    
+    # Handle both array and object with 'questions' key
+    return data if isinstance(data, list) else data.get('questions', [])
+
+
+def _import_csv_job(db: Session, ctx, quiz_id: int, decoded: str, reject_near_duplicates: bool = False) -> dict:
+    """Background job: import questions from CSV text"""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    imported, failed, errors = _import_csv_rows(db, quiz.id, decoded, ctx, reject_near_duplicates)
+    
+    return CSVImportResponse(
+        success=imported > 0,
+        quiz_id=quiz.id,
+        quiz_name=quiz.name,
+        questions_imported=imported,
+        questions_failed=failed,
+        errors=errors[:10]
+    ).model_dump()
+
+
+def _import_json_job(
+    db: Session,
+    ctx,
+    quiz_id: int,
+    questions_data: list,
+    reject_near_duplicates: bool = False
+) -> dict:
+    """Background job: import questions from parsed JSON"""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    imported, failed, errors = _import_json_items(db, quiz.id, questions_data, ctx, reject_near_duplicates)
+    
+    return CSVImportResponse(
+        success=imported > 0,
+        quiz_id=quiz.id,
+        quiz_name=quiz.name,
+        questions_imported=imported,
+        questions_failed=failed,
+        errors=errors[:10]
+    ).model_dump()
+
+
+@router.post("/import-csv", response_model=CSVImportResponse)
+async def import_questions_csv(
+    file: UploadFile = File(...),
+    quiz_name: str = Form(...),
+    quiz_description: Optional[str] = Form(None),
+    reject_near_duplicates: bool = Form(False),
+    db: Session = Depends(get_db)
+):
+    """Import questions from CSV file"""
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+    
+    # Check if quiz exists or create new
+    quiz = _get_or_create_quiz(db, quiz_name, quiz_description)
+    
+    # Read CSV content
+    content = await file.read()
+    decoded = _decode_csv(content)
+    
+    questions_imported, questions_failed, errors = _import_csv_rows(
+        db, quiz.id, decoded, reject_near_duplicates=reject_near_duplicates
+    )
     
     return CSVImportResponse(
         success=questions_imported > 0,
@@ -243,11 +428,34 @@ async def import_questions_csv(
     )
 
 
+@router.post("/import-csv/async", response_model=JobResponse)
+async def import_questions_csv_async(
+    file: UploadFile = File(...),
+    quiz_name: str = Form(...),
+    quiz_description: Optional[str] = Form(None),
+    reject_near_duplicates: bool = Form(False),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Import questions from CSV file in a background job; poll /jobs/{id} for progress"""
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+    
+    quiz = _get_or_create_quiz(db, quiz_name, quiz_description)
+    content = await file.read()
+    
+    return runner.submit(
+        "import_csv", _import_csv_job, quiz.id, _decode_csv(content), reject_near_duplicates,
+        tenant_id=tenant_id
+    )
+
+
 @router.post("/import-json", response_model=CSVImportResponse)
 async def import_questions_json(
     file: UploadFile = File(...),
     quiz_name: str = Form(...),
     quiz_description: Optional[str] = Form(None),
+    reject_near_duplicates: bool = Form(False),
     db: Session = Depends(get_db)
 ):
     """Import questions from JSON file"""
@@ -255,70 +463,14 @@ async def import_questions_json(
         raise HTTPException(status_code=400, detail="File must be JSON")
     
     content = await file.read()
-    try:
-        data = json.loads(content.decode('utf-8'))
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON format")
+    questions_data = _parse_json_questions(content)
     
     # Check if quiz exists or create new
-    existing_quiz = db.query(Quiz).filter(Quiz.name == quiz_name).first()
-    if existing_quiz:
-        quiz = existing_quiz
-    else:
-        quiz = Quiz(name=quiz_name, description=quiz_description)
-        db.add(quiz)
-        db.commit()
-        db.refresh(quiz)
-    
-    # Handle both array and object with 'questions' key
-    questions_data = data if isinstance(data, list) else data.get('questions', [])
+    quiz = _get_or_create_quiz(db, quiz_name, quiz_description)
     
-    questions_imported = 0
-    questions_failed = 0
-    errors = []
-    
-    for i, q in enumerate(questions_data, start=1):
-        try:
-            # Map different possible field names
-            topic = q.get('topic') or q.get('tema') or q.get('theme', 'General')
-            question_text = q.get('question_text') or q.get('pergunta') or q.get('question', '')
-            alternatives = q.get('alternatives') or q.get('alternativas') or q.get('options', [])
-            correct_answer = q.get('correct_answer') or q.get('resposta') or q.get('answer', '')
-            explanation = q.get('explanation') or q.get('explicacao') or None
-            difficulty = q.get('difficulty') or q.get('dificuldade') or 1
-            
-            if not question_text or not alternatives or not correct_answer:
-                errors.append(f"Question {i}: Missing required fields")
-                questions_failed += 1
-                continue
-            
-            if len(alternatives) < 2:
-                errors.append(f"Question {i}: At least 2 alternatives required")
-                questions_failed += 1
-                continue
-            
-            if correct_answer not in alternatives:
-                errors.append(f"Question {i}: correct_answer must be in alternatives")
-                questions_failed += 1
-                continue
-            
-            question = Question(
-                quiz_id=quiz.id,
-                topic=str(topic),
-                question_text=str(question_text),
-                alternatives=alternatives,
-                correct_answer=str(correct_answer),
-                explanation=explanation,
-                difficulty=max(1, min(5, int(difficulty)))
-            )
-            db.add(question)
-            questions_imported += 1
-            
-        except Exception as e:
-            errors.append(f"Question {i}: {str(e)}")
-            questions_failed += 1
-    
-    db.commit()
+    questions_imported, questions_failed, errors = _import_json_items(
+        db, quiz.id, questions_data, reject_near_duplicates=reject_near_duplicates
+    )
     
     return CSVImportResponse(
         success=questions_imported > 0,
@@ -330,6 +482,29 @@ async def import_questions_json(
     )
 
 
+@router.post("/import-json/async", response_model=JobResponse)
+async def import_questions_json_async(
+    file: UploadFile = File(...),
+    quiz_name: str = Form(...),
+    quiz_description: Optional[str] = Form(None),
+    reject_near_duplicates: bool = Form(False),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Import questions from JSON file in a background job; poll /jobs/{id} for progress"""
+    if not file.filename.endswith('.json'):
+        raise HTTPException(status_code=400, detail="File must be JSON")
+    
+    content = await file.read()
+    questions_data = _parse_json_questions(content)
+    quiz = _get_or_create_quiz(db, quiz_name, quiz_description)
+    
+    return runner.submit(
+        "import_json", _import_json_job, quiz.id, questions_data, reject_near_duplicates,
+        tenant_id=tenant_id
+    )
+
+
 @router.get("/{quiz_id}", response_model=QuizResponse)
 def get_quiz(quiz_id: int, db: Session = Depends(get_db)):
     """Get quiz by ID"""
@@ -423,13 +598,21 @@ def update_quiz(quiz_id: int, quiz_data: QuizUpdate, db: Session = Depends(get_d
 
 
 @router.delete("/{quiz_id}", response_model=MessageResponse)
-def delete_quiz(quiz_id: int, hard_delete: bool = False, db: Session = Depends(get_db)):
+def delete_quiz(
+    quiz_id: int,
+    hard_delete: bool = False,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id)
+):
     """Delete a quiz (soft delete by default)"""
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
     if hard_delete:
+        db.query(ReviewQueue).filter(ReviewQueue.quiz_id == quiz_id).delete(synchronize_session=False)
+        remove_quiz_topics(db, quiz_id)
+        remove_quiz_signatures(db, quiz_id)
         db.delete(quiz)
         message = f"Quiz '{quiz.name}' permanently deleted"
     else:
@@ -437,11 +620,16 @@ def delete_quiz(quiz_id: int, hard_delete: bool = False, db: Session = Depends(g
         message = f"Quiz '{quiz.name}' deactivated"
     
     db.commit()
+    
+    store = analytics_stores.peek(tenant_id)
+    if store and hard_delete:
+        store.remove_quiz(quiz_id)
+    
     return MessageResponse(message=message)
 
 
 @router.get("/{quiz_id}/topics", response_model=List[str])
-def get_quiz_topics(quiz_id: int, db: Session = Depends(get_db)):
+def get_quiz_topics(quiz_id: int, db: Session = Depends(get_read_db)):
     """Get all unique topics for a quiz"""
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not quiz:
@@ -455,8 +643,87 @@ def get_quiz_topics(quiz_id: int, db: Session = Depends(get_db)):
     return [t[0] for t in topics]
 
 
+@router.get("/{quiz_id}/hardest-questions", response_model=List[QuestionStatsResponse])
+def get_hardest_questions(
+    quiz_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    min_attempts: int = Query(1, ge=1),
+    db: Session = Depends(get_read_db)
+):
+    """Get the questions with the lowest p-value (share of correct answers)"""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    # Served by the (quiz_id, p_value) index
+    rows = db.query(QuestionStat, Question).join(
+        Question, Question.id == QuestionStat.question_id
+    ).options(
+        load_only(Question.id, Question.quiz_id, Question.topic, Question.question_text)
+    ).filter(
+        QuestionStat.quiz_id == quiz_id,
+        QuestionStat.attempts >= min_attempts,
+        Question.is_active == True
+    ).order_by(QuestionStat.p_value, desc(QuestionStat.mean_time)).limit(limit).all()
+    
+    result = []
+    for stat, question in rows:
+        variance = welford_variance(stat.attempts, stat.m2_time)
+        result.append(QuestionStatsResponse(
+            question_id=question.id,
+            quiz_id=question.quiz_id,
+            topic=question.topic,
+            question_text=question.question_text,
+            attempts=stat.attempts,
+            correct_count=stat.correct_count,
+            p_value=round(stat.p_value, 3),
+            mean_time=round(stat.mean_time, 2),
+            time_variance=round(variance, 2),
+            time_stddev=round(math.sqrt(variance), 2)
+        ))
+    
+    return result
+
+
+@router.get("/{quiz_id}/near-duplicates", response_model=List[NearDuplicateCluster])
+def get_near_duplicates(
+    quiz_id: int,
+    threshold: float = Query(DEFAULT_SIMILARITY, ge=MIN_SIMILARITY, le=1.0),
+    include_inactive: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Clusters of near-duplicate questions (paraphrases, reordered alternatives), largest
+    first. Similarity is the MinHash estimate of the Jaccard similarity of the questions'
+    text and alternatives.
+    """
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    clusters = quiz_clusters(db, quiz_id, threshold, include_inactive)
+    
+    return [
+        NearDuplicateCluster(
+            size=len(cluster),
+            questions=[
+                NearDuplicateQuestion(
+                    id=question.id,
+                    topic=question.topic,
+                    question_text=question.question_text,
+                    is_active=question.is_active,
+                    similarity=round(score, 3)
+                )
+                for question, score in cluster
+            ]
+        )
+        for cluster in clusters[:limit]
+    ]
+
+
 @router.get("/{quiz_id}/export")
-def export_quiz(quiz_id: int, format: str = "csv", db: Session = Depends(get_db)):
+def export_quiz(quiz_id: int, format: str = "csv", db: Session = Depends(get_read_db)):
     """Export quiz questions as CSV or JSON"""
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not quiz:
@@ -1,21 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import func, desc, case, update, delete
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
 
-from database import get_db
-from models import Quiz, Question, StudySession, SessionTheme, SessionAnswer
+from database import get_db, get_read_db, get_user_id, get_tenant_id, scope_to_user
+from models import Quiz, Question, StudySession, SessionTheme, SessionAnswer, QuestionStat, QuestionReview, DEFAULT_USER_ID
 from schemas import (
     SessionStart, SessionAnswer as SessionAnswerSchema,
     SessionStartResponse, SessionAnswerResponse, SessionFinishResponse,
-    SessionResponse, SessionSummary, TopicStats, MessageResponse,
-    SessionQuestionResponse
+    SessionResponse, SessionSummary, TopicStats, MessageResponse, SessionQuestionPage
 )
+from utils.analytics import sm2_update
+from analytics_store import analytics_stores
+from group_commit import group_commit, get_answer_db
+from question_cache import question_payloads, render_session_start, render_question_page
+from review_queue import record_session, rebuild_review_queue
+from topic_rollup import add_session_topics, remove_session_topics
 
 router = APIRouter(prefix="/sessions", tags=["Sessions"])
 
+QUESTION_PAGE_SIZE = 20
+MAX_QUESTION_PAGE_SIZE = 100
+
+# Aggregates of summarize_sessions, built once (expression construction dominates the query)
+SUMMARY_COLUMNS = (
+    func.count(StudySession.id).label("sessions"),
+    func.coalesce(func.sum(StudySession.correct_answers), 0).label("correct"),
+    func.coalesce(func.sum(StudySession.wrong_answers), 0).label("wrong"),
+    func.coalesce(func.sum(StudySession.total_time), 0.0).label("total_time"),
+    func.coalesce(func.avg(StudySession.score), 0.0).label("average_score"),
+    func.coalesce(func.max(StudySession.score), 0.0).label("best_score"),
+    func.coalesce(func.min(StudySession.score), 0.0).label("worst_score")
+)
+
+# Question columns record_answer reads; the text, topic and timestamps stay unloaded
+GRADING_COLUMNS = (
+    Question.id, Question.quiz_id, Question.alternatives,
+    Question.correct_answer, Question.correct_index, Question.explanation
+)
+
 
 @router.get("", response_model=List[SessionResponse])
 def list_sessions(
@@ -23,10 +50,11 @@ def list_sessions(
     completed_only: bool = False,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id)
 ):
     """List study sessions"""
-    query = db.query(StudySession)
+    query = scope_to_user(db.query(StudySession), StudySession, user_id)
     
     if quiz_id:
         query = query.filter(StudySession.quiz_id == quiz_id)
@@ -34,15 +62,18 @@ def list_sessions(
         query = query.filter(StudySession.is_completed == True)
     
     sessions = query.order_by(desc(StudySession.started_at)).offset(skip).limit(limit).all()
+    quiz_names = dict(
+        db.query(Quiz.id, Quiz.name).filter(Quiz.id.in_({s.quiz_id for s in sessions})).all()
+    ) if sessions else {}
     
     result = []
     for session in sessions:
-        quiz = db.query(Quiz).filter(Quiz.id == session.quiz_id).first()
         result.append(SessionResponse(
             id=session.id,
             uuid=session.uuid,
+            user_id=session.user_id,
             quiz_id=session.quiz_id,
-            quiz_name=quiz.name if quiz else "Unknown",
+            quiz_name=quiz_names.get(session.quiz_id, "Unknown"),
             total_questions=session.total_questions,
             correct_answers=session.correct_answers,
             wrong_answers=session.wrong_answers,
@@ -57,50 +88,65 @@ def list_sessions(
     return result
 
 
-@router.get("/summary", response_model=SessionSummary)
-def get_sessions_summary(quiz_id: Optional[int] = None, db: Session = Depends(get_db)):
-    """Get summary statistics for sessions"""
-    query = db.query(StudySession).filter(StudySession.is_completed == True)
+def summarize_sessions(
+    db: Session,
+    user_id: Optional[str],
+    quiz_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Count, answer totals, study time and score average/best/worst of completed sessions
+    in one aggregate query (answered from ix_study_sessions_summary alone).
+    """
+    query = scope_to_user(db.query(*SUMMARY_COLUMNS), StudySession, user_id).filter(StudySession.is_completed == True)
     
     if quiz_id:
         query = query.filter(StudySession.quiz_id == quiz_id)
+    if since:
+        query = query.filter(StudySession.finished_at >= since)
+    if until:
+        query = query.filter(StudySession.finished_at < until)
     
-    sessions = query.all()
-    
-    if not sessions:
-        return SessionSummary(
-            total_sessions=0,
-            completed_sessions=0,
-            total_questions_answered=0,
-            total_correct=0,
-            total_wrong=0,
-            average_score=0.0,
-            total_study_time=0.0,
-            best_score=0.0,
-            worst_score=0.0
-        )
+    return query.one()
+
+
+@router.get("/summary", response_model=SessionSummary)
+def get_sessions_summary(
+    quiz_id: Optional[int] = None,
+    since: Optional[datetime] = Query(None, description="Sessions finished at or after this time"),
+    until: Optional[datetime] = Query(None, description="Sessions finished before this time"),
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id)
+):
+    """Get summary statistics for sessions"""
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
     
-    total_correct = sum(s.correct_answers for s in sessions)
-    total_wrong = sum(s.wrong_answers for s in sessions)
-    scores = [s.score for s in sessions]
+    totals = summarize_sessions(db, user_id, quiz_id, since, until)
     
     return SessionSummary(
-        total_sessions=len(sessions),
-        completed_sessions=len(sessions),
-        total_questions_answered=total_correct + total_wrong,
-        total_correct=total_correct,
-        total_wrong=total_wrong,
-        average_score=sum(scores) / len(scores) if scores else 0.0,
-        total_study_time=sum(s.total_time for s in sessions),
-        best_score=max(scores) if scores else 0.0,
-        worst_score=min(scores) if scores else 0.0
+        total_sessions=totals.sessions,
+        completed_sessions=totals.sessions,
+        total_questions_answered=totals.correct + totals.wrong,
+        total_correct=totals.correct,
+        total_wrong=totals.wrong,
+        average_score=totals.average_score,
+        total_study_time=totals.total_time,
+        best_score=totals.best_score,
+        worst_score=totals.worst_score
     )
 
 
 @router.get("/{session_id}", response_model=SessionResponse)
-def get_session(session_id: int, db: Session = Depends(get_db)):
+def get_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    user_id: Optional[str] = Depends(get_user_id)
+):
     """Get session by ID"""
-    session = db.query(StudySession).filter(StudySession.id == session_id).first()
+    query = scope_to_user(db.query(StudySession), StudySession, user_id)
+    session = query.filter(StudySession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -109,6 +155,7 @@ def get_session(session_id: int, db: Session = Depends(get_db)):
     return SessionResponse(
         id=session.id,
         uuid=session.uuid,
+        user_id=session.user_id,
         quiz_id=session.quiz_id,
         quiz_name=quiz.name if quiz else "Unknown",
         total_questions=session.total_questions,
@@ -123,59 +170,167 @@ def get_session(session_id: int, db: Session = Depends(get_db)):
     )
 
 
+def _get_due_question_ids(db: Session, user_id: str, quiz_id: int, limit: Optional[int]) -> List[int]:
+    """Get the ids of a user's questions due for review, most overdue first, then never-reviewed ones"""
+    now = datetime.utcnow()
+    
+    # Range scan on the (user_id, quiz_id, due_at) index
+    due_query = db.query(Question.id).join(
+        QuestionReview, QuestionReview.question_id == Question.id
+    ).filter(
+        QuestionReview.user_id == user_id,
+        QuestionReview.quiz_id == quiz_id,
+        QuestionReview.due_at <= now,
+        Question.is_active == True
+    ).order_by(QuestionReview.due_at)
+    if limit:
+        due_query = due_query.limit(limit)
+    question_ids = [question_id for (question_id,) in due_query]
+    
+    if limit and len(question_ids) >= limit:
+        return question_ids
+    
+    # Questions never answered have no review state and are always due
+    new_query = db.query(Question.id).outerjoin(
+        QuestionReview,
+        (QuestionReview.question_id == Question.id) & (QuestionReview.user_id == user_id)
+    ).filter(
+        Question.quiz_id == quiz_id,
+        Question.is_active == True,
+        QuestionReview.question_id == None
+    ).order_by(Question.id)
+    if limit:
+        new_query = new_query.limit(limit - len(question_ids))
+    
+    return question_ids + [question_id for (question_id,) in new_query]
+
+
+def _permutation(seed: int, question_id: int, size: int) -> List[int]:
+    """Alternative order of a question in a session, reproducible from the session's seed"""
+    permutation = list(range(size))
+    random.Random(seed * 1_000_003 + question_id).shuffle(permutation)
+    return permutation
+
+
 @router.post("/start", response_model=SessionStartResponse)
-def start_session(session_data: SessionStart, db: Session = Depends(get_db)):
-    """Start a new study session"""
+def start_session(
+    session_data: SessionStart,
+    db: Session = Depends(get_db),
+    user_id: Optional[str] = Depends(get_user_id)
+):
+    """
+    Start a new study session.
+    With lazy=true only the ordered question ids are returned and the questions are
+    fetched page by page from GET /sessions/{id}/questions.
+    """
+    user_id = user_id or DEFAULT_USER_ID
     quiz = db.query(Quiz).filter(Quiz.id == session_data.quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Get questions
-    query = db.query(Question).filter(
-        Question.quiz_id == session_data.quiz_id,
-        Question.is_active == True
-    )
-    
-    questions = query.all()
-    
-    if not questions:
-        raise HTTPException(status_code=400, detail="Quiz has no active questions")
+    # Serialized questions of the quiz's current content version
+    payloads = question_payloads.get(db, quiz)
     
-    # Limit questions if requested
-    if session_data.num_questions and session_data.num_questions < len(questions):
-        questions = random.sample(questions, session_data.num_questions)
+    if session_data.mode == "due":
+        question_ids = _get_due_question_ids(db, user_id, quiz.id, session_data.num_questions)
+        if not question_ids:
+            raise HTTPException(status_code=400, detail="No questions due for review")
     else:
-        random.shuffle(questions)
+        question_ids = list(payloads.active_ids)
+        if not question_ids:
+            raise HTTPException(status_code=400, detail="Quiz has no active questions")
+        
+        # Limit questions if requested
+        if session_data.num_questions and session_data.num_questions < len(question_ids):
+            question_ids = random.sample(question_ids, session_data.num_questions)
+        else:
+            random.shuffle(question_ids)
     
-    # Create session
+    quiz_name = quiz.name
+    
+    # Create session; its question order and seed let any page be served later
     session = StudySession(
+        user_id=user_id,
         quiz_id=quiz.id,
-        total_questions=len(questions)
+        total_questions=len(question_ids),
+        question_ids=question_ids,
+        shuffle_seed=random.getrandbits(31)
     )
     db.add(session)
     db.commit()
-    db.refresh(session)
-    
-    # Shuffle alternatives for each question
-    question_responses = []
-    for q in questions:
-        alternatives = q.alternatives.copy()
-        random.shuffle(alternatives)
-        question_responses.append(SessionQuestionResponse(
-            id=q.id,
-            uuid=q.uuid,
-            topic=q.topic,
-            question_text=q.question_text,
-            alternatives=alternatives,
-            difficulty=q.difficulty
-        ))
     
-    return SessionStartResponse(
-        session_id=session.id,
-        session_uuid=session.uuid,
-        quiz_name=quiz.name,
-        total_questions=len(questions),
-        questions=question_responses
+    if session_data.lazy:
+        return SessionStartResponse(
+            session_id=session.id,
+            session_uuid=session.uuid,
+            quiz_name=quiz_name,
+            total_questions=len(question_ids),
+            questions=[],
+            question_ids=question_ids,
+            page_size=QUESTION_PAGE_SIZE
+        )
+    
+    # Shuffle alternatives for each question; the client echoes the permutation with its answers
+    permutations = [
+        _permutation(session.shuffle_seed, question_id, payloads.alternative_count(question_id))
+        for question_id in question_ids
+    ]
+    
+    return Response(
+        content=render_session_start(session.id, session.uuid, quiz_name, payloads, question_ids, permutations),
+        media_type="application/json"
+    )
+
+
+@router.get("/{session_id}/questions", response_model=SessionQuestionPage)
+def get_session_questions(
+    session_id: int,
+    request: Request,
+    from_: int = Query(0, alias="from", ge=0),
+    count: int = Query(QUESTION_PAGE_SIZE, ge=1, le=MAX_QUESTION_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    user_id: Optional[str] = Depends(get_user_id)
+):
+    """
+    Page of a session's questions in delivery order, with the same alternative
+    permutations as a full start. prefetch_at (and a Link rel="next" header) tell
+    the client when to request the following page.
+    """
+    query = scope_to_user(db.query(StudySession), StudySession, user_id)
+    session = query.filter(StudySession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.question_ids is None:
+        raise HTTPException(status_code=400, detail="Session was started without a stored question order")
+    
+    quiz = db.query(Quiz).filter(Quiz.id == session.quiz_id).first()
+    payloads = question_payloads.get(db, quiz)
+    
+    total = len(session.question_ids)
+    # Questions deleted since the start are skipped
+    page_ids = [
+        question_id for question_id in session.question_ids[from_:from_ + count]
+        if question_id in payloads.questions
+    ]
+    permutations = [
+        _permutation(session.shuffle_seed, question_id, payloads.alternative_count(question_id))
+        for question_id in page_ids
+    ]
+    
+    next_from = from_ + count if from_ + count < total else None
+    prefetch_at = from_ + max(1, count // 2) if next_from is not None else None
+    
+    headers = {}
+    if next_from is not None:
+        next_url = request.url.include_query_params(**{"from": next_from, "count": count})
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    
+    return Response(
+        content=render_question_page(
+            session.id, from_, total, payloads, page_ids, permutations, next_from, prefetch_at
+        ),
+        media_type="application/json",
+        headers=headers
     )
 
 
@@ -183,55 +338,177 @@ def start_session(session_data: SessionStart, db: Session = Depends(get_db)):
 def submit_answer(
     session_id: int,
     answer_data: SessionAnswerSchema,
-    db: Session = Depends(get_db)
+    db: Optional[Session] = Depends(get_answer_db),
+    user_id: Optional[str] = Depends(get_user_id),
+    tenant_id: str = Depends(get_tenant_id)
 ):
     """Submit an answer for a question in a session"""
-    session = db.query(StudySession).filter(StudySession.id == session_id).first()
+    committer = group_commit.get(tenant_id)
+    if committer:
+        return committer.submit(_submit_answer, session_id, user_id, answer_data)
+    
+    response = _submit_answer(db, session_id, user_id, answer_data)
+    db.commit()
+    return response
+
+
+def _submit_answer(
+    db: Session,
+    session_id: int,
+    user_id: Optional[str],
+    answer_data: SessionAnswerSchema
+) -> SessionAnswerResponse:
+    """Validate and record an answer; writes are flushed, the caller commits"""
+    query = scope_to_user(db.query(StudySession), StudySession, user_id)
+    session = query.filter(StudySession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     if session.is_completed:
         raise HTTPException(status_code=400, detail="Session already completed")
     
-    question = db.query(Question).filter(Question.id == answer_data.question_id).first()
+    question = db.query(Question).options(load_only(*GRADING_COLUMNS)).filter(
+        Question.id == answer_data.question_id
+    ).first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
-    # Check if already answered
-    existing = db.query(SessionAnswer).filter(
-        SessionAnswer.session_id == session_id,
-        SessionAnswer.question_id == answer_data.question_id
-    ).first()
-    if existing:
+    return record_answer(db, session, question, answer_data, commit=False)
+
+
+def _resolve_answer_index(question: Question, answer_data: SessionAnswerSchema) -> Optional[int]:
+    """Map a submitted answer to its position in question.alternatives (None if it matches none)"""
+    # The permutation also maps the correct index back for the response, whichever field was sent
+    permutation = answer_data.permutation or list(range(len(question.alternatives)))
+    if len(permutation) != len(question.alternatives):
+        raise HTTPException(status_code=400, detail="Answer does not match the question's alternatives")
+    
+    if answer_data.answer_index is None:
+        return question.index_of(answer_data.user_answer)
+    if answer_data.answer_index >= len(permutation):
+        raise HTTPException(status_code=400, detail="Answer does not match the question's alternatives")
+    return permutation[answer_data.answer_index]
+
+
+def record_answer(
+    db: Session,
+    session: StudySession,
+    question: Question,
+    answer_data: SessionAnswerSchema,
+    commit: bool = True
+) -> SessionAnswerResponse:
+    """
+    Grade and store an answer, updating session, item and review statistics.
+    Callers check that the session is open. A question already answered in the
+    session (a retried or concurrent submit) raises 400 before anything changes.
+    With commit=False the changes are only flushed and the caller commits.
+    """
+    # Check answer
+    answer_index = _resolve_answer_index(question, answer_data)
+    is_correct = answer_index is not None and answer_index == question.correct_index
+    now = datetime.utcnow()
+    time_spent = answer_data.time_spent
+    
+    # Save answer first: the unique (session_id, question_id) index rejects duplicates, and
+    # this write takes the database write lock, so the reads below see no concurrent writer
+    answer_id = db.execute(
+        sqlite_insert(SessionAnswer).values(
+            user_id=session.user_id,
+            session_id=session.id,
+            question_id=answer_data.question_id,
+            answer_index=answer_index,
+            user_answer=answer_data.user_answer if answer_index is None else None,
+            is_correct=is_correct,
+            time_spent=time_spent,
+            answered_at=now
+        ).on_conflict_do_nothing(
+            index_elements=["session_id", "question_id"]
+        ).returning(SessionAnswer.id)
+    ).scalar()
+    if answer_id is None:
         raise HTTPException(status_code=400, detail="Question already answered")
     
-    # Check answer
-    is_correct = answer_data.user_answer == question.correct_answer
+    # Update session stats in place, unless a concurrent finish closed the session
+    counters = db.execute(
+        update(StudySession).where(
+            StudySession.id == session.id,
+            StudySession.is_completed == False
+        ).values(
+            correct_answers=StudySession.correct_answers + int(is_correct),
+            wrong_answers=StudySession.wrong_answers + int(not is_correct),
+            total_time=StudySession.total_time + time_spent
+        ).returning(
+            StudySession.correct_answers, StudySession.wrong_answers, StudySession.total_time
+        ).execution_options(synchronize_session=False)
+    ).first()
+    if counters is None:
+        db.execute(delete(SessionAnswer).where(SessionAnswer.id == answer_id))
+        raise HTTPException(status_code=400, detail="Session already completed")
+    for name, value in counters._mapping.items():
+        set_committed_value(session, name, value)
+    
+    # Update per-question item statistics (Welford step evaluated on the stored row)
+    count = QuestionStat.attempts + 1
+    delta = time_spent - QuestionStat.mean_time
+    stat_insert = sqlite_insert(QuestionStat).values(
+        question_id=question.id,
+        quiz_id=question.quiz_id,
+        attempts=1,
+        correct_count=int(is_correct),
+        mean_time=time_spent,
+        m2_time=0.0,
+        p_value=float(is_correct),
+        updated_at=now
+    )
+    db.execute(stat_insert.on_conflict_do_update(
+        index_elements=["question_id"],
+        set_={
+            "attempts": count,
+            "correct_count": QuestionStat.correct_count + int(is_correct),
+            "mean_time": QuestionStat.mean_time + delta / count,
+            "m2_time": QuestionStat.m2_time + delta * (time_spent - (QuestionStat.mean_time + delta / count)),
+            "p_value": (QuestionStat.correct_count + int(is_correct)) * 1.0 / count,
+            "updated_at": now
+        }
+    ))
+    
+    # Update spaced-repetition state
+    review = db.query(QuestionReview).filter(
+        QuestionReview.user_id == session.user_id,
+        QuestionReview.question_id == question.id
+    ).first()
+    if not review:
+        review = QuestionReview(
+            user_id=session.user_id,
+            question_id=question.id,
+            quiz_id=question.quiz_id,
+            repetitions=0,
+            interval_days=0.0,
+            ease_factor=2.5
+        )
+        db.add(review)
     
-    # Save answer
-    session_answer = SessionAnswer(
-        session_id=session_id,
-        question_id=answer_data.question_id,
-        user_answer=answer_data.user_answer,
-        is_correct=is_correct,
-        time_spent=answer_data.time_spent
+    quality = 4 if is_correct else 1
+    review.repetitions, review.interval_days, review.ease_factor = sm2_update(
+        review.repetitions, review.interval_days, review.ease_factor, quality
     )
-    db.add(session_answer)
+    review.last_reviewed_at = now
+    review.due_at = now + timedelta(days=review.interval_days)
     
-    # Update session stats
-    session.total_time += answer_data.time_spent
-    if is_correct:
-        session.correct_answers += 1
+    if commit:
+        db.commit()
     else:
-        session.wrong_answers += 1
-    
-    db.commit()
+        db.flush()
     
     questions_answered = session.correct_answers + session.wrong_answers
+    correct_index = question.correct_index
+    if correct_index is not None and answer_data.permutation:
+        correct_index = answer_data.permutation.index(correct_index)
     
     return SessionAnswerResponse(
         is_correct=is_correct,
         correct_answer=question.correct_answer,
+        correct_index=correct_index,
         explanation=question.explanation,
         current_score=session.correct_answers,
         questions_answered=questions_answered,
@@ -240,34 +517,71 @@ def submit_answer(
 
 
 @router.post("/{session_id}/finish", response_model=SessionFinishResponse)
-def finish_session(session_id: int, db: Session = Depends(get_db)):
+def finish_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    user_id: Optional[str] = Depends(get_user_id),
+    tenant_id: str = Depends(get_tenant_id)
+):
     """Finish a study session and calculate final statistics"""
-    session = db.query(StudySession).filter(StudySession.id == session_id).first()
+    query = scope_to_user(db.query(StudySession), StudySession, user_id)
+    session = query.filter(StudySession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     if session.is_completed:
         raise HTTPException(status_code=400, detail="Session already completed")
     
-    # Calculate final stats
-    total_answered = session.correct_answers + session.wrong_answers
-    session.score = round((session.correct_answers / session.total_questions) * 10, 2) if session.total_questions > 0 else 0
-    session.average_time = session.total_time / total_answered if total_answered > 0 else 0
-    session.finished_at = datetime.utcnow()
-    session.is_completed = True
-    
+    return complete_session(db, session, tenant_id)
+
+
+def complete_session(db: Session, session: StudySession, tenant_id: Optional[str]) -> SessionFinishResponse:
+    """
+    Compute final and per-topic statistics of an open session and mark it completed.
+    The session is claimed with one conditional UPDATE, so of two concurrent finishes
+    only one proceeds; the other raises 400.
+    """
+    # Calculate final stats from the stored counters
+    total_answered = StudySession.correct_answers + StudySession.wrong_answers
+    final = db.execute(
+        update(StudySession).where(
+            StudySession.id == session.id,
+            StudySession.is_completed == False
+        ).values(
+            score=case(
+                (StudySession.total_questions > 0,
+                 func.round(StudySession.correct_answers * 10.0 / StudySession.total_questions, 2)),
+                else_=0
+            ),
+            average_time=case((total_answered > 0, StudySession.total_time / total_answered), else_=0),
+            finished_at=datetime.utcnow(),
+            is_completed=True
+        ).returning(
+            StudySession.correct_answers, StudySession.wrong_answers, StudySession.total_time,
+            StudySession.score, StudySession.average_time, StudySession.finished_at, StudySession.is_completed
+        ).execution_options(synchronize_session=False)
+    ).first()
+    if final is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Session already completed")
+    for name, value in final._mapping.items():
+        set_committed_value(session, name, value)
+
     # Calculate topic statistics
-    answers = db.query(SessionAnswer).filter(SessionAnswer.session_id == session_id).all()
+    answers = db.query(
+        SessionAnswer.is_correct, SessionAnswer.time_spent, Question.topic, Question.topic_id
+    ).join(
+        Question, Question.id == SessionAnswer.question_id
+    ).filter(
+        SessionAnswer.session_id == session.id
+    ).order_by(SessionAnswer.id).all()
     
     topic_stats = {}
     for answer in answers:
-        question = db.query(Question).filter(Question.id == answer.question_id).first()
-        if not question:
-            continue
-        
-        topic = question.topic
+        topic = answer.topic
         if topic not in topic_stats:
             topic_stats[topic] = {
+                "topic_id": answer.topic_id,
                 "correct": 0,
                 "wrong": 0,
                 "total_time": 0.0,
@@ -283,6 +597,7 @@ def finish_session(session_id: int, db: Session = Depends(get_db)):
     
     # Save topic stats and build response
     topics_response = []
+    topic_records = []
     for topic, stats in topic_stats.items():
         total = stats["correct"] + stats["wrong"]
         accuracy = (stats["correct"] / total * 100) if total > 0 else 0
@@ -290,14 +605,17 @@ def finish_session(session_id: int, db: Session = Depends(get_db)):
         
         # Save to database
         topic_record = SessionTheme(
-            session_id=session_id,
+            user_id=session.user_id,
+            session_id=session.id,
             topic=topic,
+            topic_id=stats["topic_id"],
             correct_answers=stats["correct"],
             wrong_answers=stats["wrong"],
             total_time=stats["total_time"],
             average_time=avg_time
         )
         db.add(topic_record)
+        topic_records.append(topic_record)
         
         topics_response.append(TopicStats(
             topic=topic,
@@ -307,8 +625,20 @@ def finish_session(session_id: int, db: Session = Depends(get_db)):
             average_time=round(avg_time, 2)
         ))
     
+    record_session(db, session, {
+        stats["topic_id"]: (stats["correct"], stats["wrong"])
+        for stats in topic_stats.values() if stats["topic_id"] is not None
+    })
+    add_session_topics(db, session.user_id, {
+        stats["topic_id"]: (stats["correct"], stats["wrong"], stats["total_time"])
+        for stats in topic_stats.values() if stats["topic_id"] is not None
+    })
     db.commit()
     
+    store = analytics_stores.peek(tenant_id)
+    if store:
+        store.add_session(session, topic_records)
+    
     return SessionFinishResponse(
         session_id=session.id,
         total_questions=session.total_questions,
@@ -322,13 +652,28 @@ def finish_session(session_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/{session_id}", response_model=MessageResponse)
-def delete_session(session_id: int, db: Session = Depends(get_db)):
+def delete_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    user_id: Optional[str] = Depends(get_user_id),
+    tenant_id: str = Depends(get_tenant_id)
+):
     """Delete a session"""
-    session = db.query(StudySession).filter(StudySession.id == session_id).first()
+    query = scope_to_user(db.query(StudySession), StudySession, user_id)
+    session = query.filter(StudySession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    topic_ids = {theme.topic_id for theme in session.topics if theme.topic_id is not None}
+    remove_session_topics(db, session)
     db.delete(session)
+    if topic_ids:
+        db.flush()
+        rebuild_review_queue(db, session.user_id, session.quiz_id, topic_ids)
     db.commit()
     
+    store = analytics_stores.peek(tenant_id)
+    if store:
+        store.remove_session(session_id)
+    
     return MessageResponse(message="Session deleted successfully")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Optional, List, Any
 from datetime import datetime
 
@@ -81,6 +81,32 @@ class QuestionBulkCreate(BaseModel):
     questions: List[QuestionBase]
 
 
+class QuestionStatsResponse(BaseModel):
+    question_id: int
+    quiz_id: int
+    topic: str
+    question_text: str
+    attempts: int
+    correct_count: int
+    p_value: float
+    mean_time: float
+    time_variance: float
+    time_stddev: float
+
+
+class NearDuplicateQuestion(BaseModel):
+    id: int
+    topic: str
+    question_text: str
+    is_active: bool
+    similarity: float  # estimated similarity to the cluster's first question
+
+
+class NearDuplicateCluster(BaseModel):
+    size: int
+    questions: List[NearDuplicateQuestion]
+
+
 # ========== CSV Import Schemas ==========
 class CSVImportResponse(BaseModel):
     success: bool
@@ -102,13 +128,25 @@ class CSVTemplateColumn(BaseModel):
 class SessionStart(BaseModel):
     quiz_id: int
     num_questions: Optional[int] = None
+    mode: str = Field(default="random", pattern="^(random|due)$")
+    lazy: bool = False  # return only question ids; fetch pages from /sessions/{id}/questions
 
 
 class SessionAnswer(BaseModel):
     question_id: int
-    user_answer: str
+    answer_index: Optional[int] = Field(None, ge=0)  # position in the alternatives as shown
+    permutation: Optional[List[int]] = None  # echoed from the session start response
+    user_answer: Optional[str] = None  # alternative text, for older clients
     time_spent: float = Field(..., ge=0)
 
+    @model_validator(mode='after')
+    def validate_answer(self):
+        if self.answer_index is None and self.user_answer is None:
+            raise ValueError('answer_index or user_answer is required')
+        if self.permutation is not None and sorted(self.permutation) != list(range(len(self.permutation))):
+            raise ValueError('permutation must be an ordering of the alternative indices')
+        return self
+
 
 class SessionQuestionResponse(BaseModel):
     id: int
@@ -116,6 +154,7 @@ class SessionQuestionResponse(BaseModel):
     topic: str
     question_text: str
     alternatives: List[str]
+    permutation: List[int]  # alternatives[i] is the question's alternative permutation[i]
     difficulty: int
 
     class Config:
@@ -128,11 +167,24 @@ class SessionStartResponse(BaseModel):
     quiz_name: str
     total_questions: int
     questions: List[SessionQuestionResponse]
+    question_ids: Optional[List[int]] = None  # lazy sessions: delivery order, questions is empty
+    page_size: Optional[int] = None  # lazy sessions: suggested page size
+
+
+class SessionQuestionPage(BaseModel):
+    session_id: int
+    from_: int = Field(..., alias="from")
+    count: int
+    total_questions: int
+    questions: List[SessionQuestionResponse]
+    next_from: Optional[int]  # None on the last page
+    prefetch_at: Optional[int]  # request the next page once the student reaches this position
 
 
 class SessionAnswerResponse(BaseModel):
     is_correct: bool
     correct_answer: str
+    correct_index: Optional[int] = None  # in the submitted (permuted) order
     explanation: Optional[str]
     current_score: int
     questions_answered: int
@@ -161,6 +213,7 @@ class SessionFinishResponse(BaseModel):
 class SessionResponse(BaseModel):
     id: int
     uuid: str
+    user_id: str
     quiz_id: int
     quiz_name: str
     total_questions: int
@@ -210,6 +263,32 @@ class TopicRetention(BaseModel):
     days_since_review: int
     hours_until_review: float
     priority_index: float
+    decay_constant: float
+
+
+class ReviewQueueItem(BaseModel):
+    user_id: str
+    quiz_id: int
+    quiz_name: str
+    topic: str
+    accuracy: float
+    retention_rate: float
+    exposures: int
+    last_review_at: datetime
+    due_at: datetime
+    hours_until_review: float
+    next_review: str
+    priority: str
+    priority_index: float
+
+
+class TopicDecayResponse(BaseModel):
+    topic: str
+    decay_constant: float
+    half_life_hours: Optional[float]
+    initial_accuracy: float
+    observations: int
+    fitted_at: datetime
 
 
 class StudyScheduleItem(BaseModel):
@@ -238,6 +317,25 @@ class RetentionResponse(BaseModel):
     all_topics: List[TopicRetention]
 
 
+# ========== Job Schemas ==========
+class JobResponse(BaseModel):
+    id: int
+    uuid: str
+    kind: str
+    status: str
+    progress: float
+    processed: int
+    total: Optional[int]
+    result: Optional[Any]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
 # ========== Generic Schemas ==========
 class MessageResponse(BaseModel):
     message: str
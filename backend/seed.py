@@ -6,6 +6,8 @@ import random
 from datetime import datetime, timedelta
 from database import SessionLocal, init_db
 from models import Quiz, Question, StudySession, SessionTheme
+from review_queue import rebuild_review_queue
+from topic_rollup import rebuild_topic_rollup
 
 def seed_database():
     """Populate database with example quizzes and questions"""
@@ -296,6 +298,10 @@ def seed_database():
         
         print(f"  ✓ Created sessions for: {quiz.name}")
     
+    # Sessions were written directly, so fill the derived tables from them
+    db.flush()
+    rebuild_review_queue(db)
+    rebuild_topic_rollup(db)
     db.commit()
     db.close()
     
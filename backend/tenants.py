@@ -0,0 +1,100 @@
+"""
+Tenant routing for per-tenant SQLite shards.
+
+Requests select a tenant with the X-Tenant-Id header or a /t/{tenant_id} path prefix
+(e.g. /t/school-a/api/quizzes); requests without either use the default database.
+
+Manage shards with:
+    python tenants.py list
+    python tenants.py migrate [tenant_id ...]
+"""
+import argparse
+import json
+import os
+
+from database import (
+    tenant_router, upgrade_db, DEFAULT_TENANT_ID, TENANT_HEADER
+)
+
+PATH_PREFIX = "/t/"
+
+
+class TenantMiddleware:
+    """ASGI middleware that resolves the tenant and strips the /t/{tenant_id} prefix"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        tenant_id = None
+        path = scope["path"]
+        if path.startswith(PATH_PREFIX):
+            tenant_id, _, rest = path[len(PATH_PREFIX):].partition("/")
+            scope = dict(scope)
+            scope["path"] = "/" + rest
+            scope["raw_path"] = scope["path"].encode()
+        else:
+            header = TENANT_HEADER.lower().encode()
+            for name, value in scope.get("headers", []):
+                if name == header:
+                    tenant_id = value.decode("latin-1").strip()
+                    break
+
+        if tenant_id and not tenant_router.is_valid(tenant_id):
+            await self._reject(scope, send, f"Invalid tenant id: {tenant_id}")
+            return
+
+        scope.setdefault("state", {})
+        scope["state"]["tenant_id"] = tenant_id or DEFAULT_TENANT_ID
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(scope, send, detail: str):
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 400,
+            "headers": [(b"content-type", b"application/json")]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def list_shards():
+    """Print every tenant shard with its database file size"""
+    for tenant_id in tenant_router.list_tenants():
+        path = tenant_router.database_path(tenant_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        print(f"  {tenant_id:<32} {size / 1024:>10.1f} KB  {path}")
+
+
+def migrate_shards(tenant_ids=None):
+    """Apply schema upgrades to the given shards (all shards by default)"""
+    for tenant_id in tenant_ids or tenant_router.list_tenants():
+        if not tenant_router.is_valid(tenant_id):
+            print(f"  ✗ {tenant_id}: invalid tenant id")
+            continue
+        upgrade_db(tenant_router.get_engine(tenant_id))
+        print(f"  ✓ {tenant_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage KnowMetrics tenant databases")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List tenant databases")
+    migrate_parser = subparsers.add_parser("migrate", help="Upgrade tenant database schemas")
+    migrate_parser.add_argument("tenant_ids", nargs="*", help="Tenants to migrate (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print("🗂️  Tenant databases:")
+        list_shards()
+    else:
+        print("🔧 Migrating tenant databases...")
+        migrate_shards(args.tenant_ids)
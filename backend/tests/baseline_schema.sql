@@ -0,0 +1,90 @@
+-- Schema of the first release (baseline), as created by init_db; used by migration tests
+
+CREATE TABLE quizzes (
+	id INTEGER NOT NULL,
+	uuid VARCHAR(36),
+	name VARCHAR(255) NOT NULL,
+	description TEXT,
+	created_at DATETIME,
+	updated_at DATETIME,
+	is_active BOOLEAN,
+	PRIMARY KEY (id),
+	UNIQUE (name)
+);
+
+CREATE UNIQUE INDEX ix_quizzes_uuid ON quizzes (uuid);
+
+CREATE INDEX ix_quizzes_id ON quizzes (id);
+
+CREATE TABLE questions (
+	id INTEGER NOT NULL,
+	uuid VARCHAR(36),
+	quiz_id INTEGER NOT NULL,
+	topic VARCHAR(255) NOT NULL,
+	question_text TEXT NOT NULL,
+	alternatives JSON NOT NULL,
+	correct_answer TEXT NOT NULL,
+	explanation TEXT,
+	difficulty INTEGER,
+	created_at DATETIME,
+	updated_at DATETIME,
+	is_active BOOLEAN,
+	PRIMARY KEY (id),
+	FOREIGN KEY(quiz_id) REFERENCES quizzes (id)
+);
+
+CREATE INDEX ix_questions_id ON questions (id);
+
+CREATE INDEX ix_questions_topic ON questions (topic);
+
+CREATE UNIQUE INDEX ix_questions_uuid ON questions (uuid);
+
+CREATE TABLE study_sessions (
+	id INTEGER NOT NULL,
+	uuid VARCHAR(36),
+	quiz_id INTEGER NOT NULL,
+	total_questions INTEGER NOT NULL,
+	correct_answers INTEGER,
+	wrong_answers INTEGER,
+	total_time FLOAT,
+	average_time FLOAT,
+	score FLOAT,
+	started_at DATETIME,
+	finished_at DATETIME,
+	is_completed BOOLEAN,
+	PRIMARY KEY (id),
+	FOREIGN KEY(quiz_id) REFERENCES quizzes (id)
+);
+
+CREATE INDEX ix_study_sessions_id ON study_sessions (id);
+
+CREATE UNIQUE INDEX ix_study_sessions_uuid ON study_sessions (uuid);
+
+CREATE TABLE session_themes (
+	id INTEGER NOT NULL,
+	session_id INTEGER NOT NULL,
+	topic VARCHAR(255) NOT NULL,
+	correct_answers INTEGER,
+	wrong_answers INTEGER,
+	total_time FLOAT,
+	average_time FLOAT,
+	PRIMARY KEY (id),
+	FOREIGN KEY(session_id) REFERENCES study_sessions (id)
+);
+
+CREATE INDEX ix_session_themes_id ON session_themes (id);
+
+CREATE TABLE session_answers (
+	id INTEGER NOT NULL,
+	session_id INTEGER NOT NULL,
+	question_id INTEGER NOT NULL,
+	user_answer TEXT NOT NULL,
+	is_correct BOOLEAN NOT NULL,
+	time_spent FLOAT,
+	answered_at DATETIME,
+	PRIMARY KEY (id),
+	FOREIGN KEY(session_id) REFERENCES study_sessions (id),
+	FOREIGN KEY(question_id) REFERENCES questions (id)
+);
+
+CREATE INDEX ix_session_answers_id ON session_answers (id);
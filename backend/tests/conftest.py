@@ -0,0 +1,86 @@
+"""
+Shared test setup.
+
+The backend modules are imported as top-level modules, as uvicorn does from backend/.
+Every database the tests open lives in a temporary data directory, never in backend/data.
+"""
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_schema.sql")
+
+_session_data_dir = None
+
+
+def pytest_configure(config):
+    global _session_data_dir
+    # Read once when database is imported: covers the default database of imported modules
+    if "KNOWMETRICS_DATA_DIR" not in os.environ:
+        _session_data_dir = tempfile.mkdtemp(prefix="knowmetrics-tests-")
+        os.environ["KNOWMETRICS_DATA_DIR"] = _session_data_dir
+
+
+def pytest_unconfigure(config):
+    if _session_data_dir:
+        shutil.rmtree(_session_data_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def free_port():
+    """Function returning a localhost port that is free right now, for test servers"""
+    def pick() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    return pick
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    """
+    Temporary data directory for one test module.
+    Tenant shards opened in this process and servers started by the test use it.
+    """
+    import database
+
+    path = tmp_path_factory.mktemp("data")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(database, "TENANTS_DIR", str(path / "tenants"))
+        patch.setenv("KNOWMETRICS_DATA_DIR", str(path))
+        yield path
+
+
+@pytest.fixture
+def baseline_tenant(data_dir):
+    """
+    Factory creating a tenant shard with the first release's schema, not yet migrated.
+    Extra SQL statements (e.g. rows to migrate) run after the schema; returns the file path.
+    """
+    from database import tenant_router
+
+    def create(tenant_id: str, statements=()) -> str:
+        path = tenant_router.database_path(tenant_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path)
+        try:
+            with open(BASELINE_SCHEMA) as f:
+                conn.executescript(f.read())
+            for statement in statements:
+                conn.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+        return path
+
+    return create
@@ -0,0 +1,199 @@
+"""
+Concurrency of answer submission.
+
+Starts the API with several worker processes and submits answers the way a retrying
+client does: every question of a session is posted several times at once, and all
+questions of a session are in flight together. Each session is then finished by two
+concurrent requests. The tenant database, in a temporary data directory, must then hold:
+
+- every (session, question) once, with exactly one successful submit;
+- exactly one successful finish per session;
+- session counters and total time equal to the stored answers (no lost increments);
+- question_stats attempts, correct counts and mean times equal to the stored answers;
+- one review row per user and question;
+
+and no request may fail with a 5xx status. Both commit modes are checked.
+"""
+import asyncio
+import math
+import random
+import sqlite3
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+import pytest
+
+from database import tenant_router, create_sqlite_engine, upgrade_db
+from loadtest import start_server
+
+WORKERS = 4
+SESSIONS = 40
+USERS = 10  # users the sessions are spread over
+QUESTIONS = 10
+DUPLICATES = 4  # concurrent submits of each answer
+CONNECTIONS = 64
+
+
+async def create_quiz(client: httpx.AsyncClient, questions: int) -> int:
+    response = await client.post("/api/quizzes", json={"name": "Concurrency check"})
+    response.raise_for_status()
+    quiz_id = response.json()["id"]
+    response = await client.post("/api/questions/bulk", json={"quiz_id": quiz_id, "questions": [
+        {
+            "quiz_id": quiz_id,
+            "topic": f"Topic {i % 3 + 1}",
+            "question_text": f"Concurrent question {i + 1}?",
+            "alternatives": ["A", "B", "C", "D"],
+            "correct_answer": "A",
+            "difficulty": 1
+        }
+        for i in range(questions)
+    ]})
+    response.raise_for_status()
+    return quiz_id
+
+
+async def run_session(
+    client: httpx.AsyncClient,
+    user: str,
+    quiz_id: int,
+    duplicates: int,
+    statuses: Dict[Tuple, List[int]]
+):
+    """One session: every answer posted `duplicates` times at once, then two finishes"""
+    prefix = f"/api/users/{user}/sessions"
+    response = await client.post(f"{prefix}/start", json={"quiz_id": quiz_id})
+    response.raise_for_status()
+    started = response.json()
+    session_id = started["session_id"]
+
+    async def submit(question: dict, payload: dict):
+        response = await client.post(f"{prefix}/{session_id}/answer", json=payload)
+        statuses[("answer", session_id, question["id"])].append(response.status_code)
+
+    submits = []
+    for question in started["questions"]:
+        payload = {
+            "question_id": question["id"],
+            "answer_index": random.randrange(len(question["alternatives"])),
+            "permutation": question["permutation"],
+            "time_spent": round(random.uniform(1, 30), 3)
+        }
+        submits.extend(submit(question, payload) for _ in range(duplicates))
+    random.shuffle(submits)
+    await asyncio.gather(*submits)
+
+    async def finish():
+        response = await client.post(f"{prefix}/{session_id}/finish")
+        statuses[("finish", session_id)].append(response.status_code)
+
+    await asyncio.gather(finish(), finish())
+
+
+async def submit_all(url: str, tenant_id: str) -> Dict[Tuple, List[int]]:
+    """Status codes of every answer and finish request, by (kind, session[, question])"""
+    headers = {"X-Tenant-Id": tenant_id}
+    # Idle connections expire before uvicorn's 5 s keep-alive closes them mid-request
+    limits = httpx.Limits(max_connections=CONNECTIONS, keepalive_expiry=2.0)
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=60, limits=limits) as client:
+        quiz_id = await create_quiz(client, QUESTIONS)
+        statuses: Dict[Tuple, List[int]] = defaultdict(list)
+        await asyncio.gather(*(
+            run_session(client, f"cc-{n % USERS}", quiz_id, DUPLICATES, statuses)
+            for n in range(SESSIONS)
+        ))
+    return statuses
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["commit-per-answer", "group-commit"])
+def submitted(request, data_dir, free_port):
+    """Run the concurrent flow once per commit mode; yields (statuses, database connection)"""
+    tenant_id = "concurrency-group" if request.param else "concurrency"
+    # Created and migrated here, before several workers open them at once
+    default_engine = create_sqlite_engine(f"sqlite:///{data_dir / 'knowmetrics.db'}", 1)
+    upgrade_db(default_engine)
+    default_engine.dispose()
+    tenant_router.get_engine(tenant_id)
+    tenant_router.close(tenant_id)
+
+    port = free_port()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("KNOWMETRICS_GROUP_COMMIT", "1" if request.param else "0")
+        server = start_server(port, WORKERS)
+    try:
+        statuses = asyncio.run(submit_all(f"http://127.0.0.1:{port}", tenant_id))
+    finally:
+        server.terminate()
+        server.wait()
+
+    conn = sqlite3.connect(tenant_router.database_path(tenant_id))
+    yield statuses, conn
+    conn.close()
+
+
+def test_no_server_errors(submitted):
+    statuses, _ = submitted
+    failed = {key: codes for key, codes in statuses.items() if any(code >= 500 for code in codes)}
+    assert not failed
+
+
+def test_each_answer_accepted_once(submitted):
+    statuses, _ = submitted
+    answers = {key: codes for key, codes in statuses.items() if key[0] == "answer"}
+    assert len(answers) == SESSIONS * QUESTIONS
+    assert {key: sorted(codes) for key, codes in answers.items() if codes.count(200) != 1} == {}
+
+
+def test_each_finish_succeeds_once(submitted):
+    statuses, _ = submitted
+    finishes = {key: codes for key, codes in statuses.items() if key[0] == "finish"}
+    assert len(finishes) == SESSIONS
+    assert {key: sorted(codes) for key, codes in finishes.items() if codes.count(200) != 1} == {}
+
+
+def test_each_answer_stored_once(submitted):
+    _, conn = submitted
+    duplicates = conn.execute(
+        "SELECT session_id, question_id, COUNT(*) FROM session_answers "
+        "GROUP BY session_id, question_id HAVING COUNT(*) > 1"
+    ).fetchall()
+    assert duplicates == []
+    assert conn.execute("SELECT COUNT(*) FROM session_answers").fetchone()[0] == SESSIONS * QUESTIONS
+
+
+def test_session_counters_match_answers(submitted):
+    _, conn = submitted
+    rows = conn.execute(
+        "SELECT s.id, s.correct_answers, s.wrong_answers, s.total_time, s.is_completed, "
+        "COALESCE(SUM(a.is_correct), 0), COALESCE(SUM(NOT a.is_correct), 0), COALESCE(SUM(a.time_spent), 0) "
+        "FROM study_sessions s LEFT JOIN session_answers a ON a.session_id = s.id GROUP BY s.id"
+    ).fetchall()
+    assert len(rows) == SESSIONS
+    for session_id, correct, wrong, total_time, completed, stored_correct, stored_wrong, stored_time in rows:
+        assert completed, f"session {session_id} not finished"
+        assert (correct, wrong) == (stored_correct, stored_wrong), f"session {session_id}"
+        assert math.isclose(total_time, stored_time), f"session {session_id}"
+
+
+def test_question_stats_match_answers(submitted):
+    _, conn = submitted
+    stats = {row[0]: row[1:] for row in conn.execute(
+        "SELECT question_id, attempts, correct_count, mean_time FROM question_stats"
+    )}
+    answers = conn.execute(
+        "SELECT question_id, COUNT(*), SUM(is_correct), AVG(time_spent) FROM session_answers GROUP BY question_id"
+    ).fetchall()
+    assert len(answers) == QUESTIONS
+    for question_id, attempts, correct, mean_time in answers:
+        stat = stats.get(question_id)
+        assert stat is not None and stat[:2] == (attempts, correct), f"question {question_id}"
+        assert math.isclose(stat[2], mean_time), f"question {question_id}"
+
+
+def test_one_review_per_user_and_question(submitted):
+    _, conn = submitted
+    reviews = Counter(conn.execute("SELECT user_id, question_id FROM question_reviews").fetchall())
+    answered = set(conn.execute("SELECT DISTINCT user_id, question_id FROM session_answers").fetchall())
+    assert set(reviews) == answered
+    assert max(reviews.values()) == 1
@@ -0,0 +1,127 @@
+"""
+Answer log export (Parquet / Arrow IPC) with and without the raw answer archive.
+
+Old and recent answers alternate, so after the archive job moves the old ones out the
+live and archived answer ids interleave; small batches then put page boundaries
+between the two sources.
+"""
+import io
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from database import tenant_router, TENANT_HEADER
+from export import stream_answer_log, export_answer_log
+from models import Quiz, Question, StudySession, SessionAnswer
+from routes.jobs import _archive_answers_job
+import main
+
+TENANT = "export"
+SESSIONS = 6
+ANSWERS_PER_SESSION = 4
+ANSWERS = SESSIONS * ANSWERS_PER_SESSION
+BATCH_SIZE = 5  # does not divide the answer count
+
+
+class Progress:
+    def update(self, processed, total=None, force=False):
+        pass
+
+
+@pytest.fixture(scope="module")
+def answer_ids(data_dir):
+    """Seed the tenant; returns (all answer ids, ids of the old answers the archive job moves)"""
+    engine = tenant_router.get_engine(TENANT)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Quiz.__table__), [{"id": 1, "name": "Export", "is_active": True}])
+        conn.execute(insert(Question.__table__), [
+            {"id": q, "quiz_id": 1, "topic": f"Topic {q % 2}", "question_text": f"Question {q}?",
+             "alternatives": ["A", "B"], "correct_answer": "A", "correct_index": 0, "is_active": True}
+            for q in range(1, ANSWERS_PER_SESSION + 1)
+        ])
+        # Even sessions are a year old, odd ones recent; answers are inserted session by session
+        # in alternating order, so old and recent answer ids interleave
+        conn.execute(insert(StudySession.__table__), [
+            {"id": s, "quiz_id": 1, "total_questions": ANSWERS_PER_SESSION, "is_completed": True,
+             "started_at": now - timedelta(days=365 if s % 2 == 0 else 1)}
+            for s in range(1, SESSIONS + 1)
+        ])
+        answers = [
+            {"session_id": s, "question_id": q, "answer_index": 0, "is_correct": q % 2 == 1, "time_spent": 3.0,
+             "answered_at": now - timedelta(days=365 if s % 2 == 0 else 1)}
+            for q in range(1, ANSWERS_PER_SESSION + 1)
+            for s in range(1, SESSIONS + 1)
+        ]
+        conn.execute(insert(SessionAnswer.__table__), answers)
+
+    with tenant_router.get_sessionmaker(TENANT)() as db:
+        ids = [answer.id for answer in db.query(SessionAnswer).order_by(SessionAnswer.id)]
+        old = [answer.id for answer in db.query(SessionAnswer).join(StudySession).filter(
+            StudySession.started_at < now - timedelta(days=180)
+        )]
+    yield ids, sorted(old)
+    tenant_router.close(TENANT)
+
+
+def read_parquet(chunks) -> pa.Table:
+    return pq.read_table(io.BytesIO(b"".join(chunks)))
+
+
+def test_export_live_answers(answer_ids):
+    ids, _ = answer_ids
+
+    table = read_parquet(stream_answer_log(TENANT, "parquet", batch_size=BATCH_SIZE))
+
+    assert table.column("answer_id").to_pylist() == ids
+    assert table.schema.metadata[b"knowmetrics.sources"] == b"session_answers"
+    assert pq.ParquetFile(io.BytesIO(b"".join(
+        stream_answer_log(TENANT, "parquet", batch_size=BATCH_SIZE)
+    ))).num_row_groups == -(-ANSWERS // BATCH_SIZE)
+
+
+def test_export_includes_archived_answers(answer_ids, tmp_path):
+    ids, old = answer_ids
+    with tenant_router.get_sessionmaker(TENANT)() as db:
+        result = _archive_answers_job(db, Progress(), older_than_days=180, keep_raw=True, vacuum="none")
+        assert result["answers_archived"] == len(old)
+        assert db.query(SessionAnswer).count() == ANSWERS - len(old)
+
+        # Copied to the archive but not yet deleted from the live table: exported once
+        first = old[0]
+        with tenant_router.get_engine(TENANT).begin() as conn:
+            conn.execute(insert(SessionAnswer.__table__), [{
+                "id": first, "session_id": 2, "question_id": 1, "answer_index": 0, "is_correct": True,
+                "time_spent": 3.0, "answered_at": datetime.utcnow() - timedelta(days=365)
+            }])
+
+    table = read_parquet(stream_answer_log(TENANT, "parquet", batch_size=BATCH_SIZE))
+    assert table.column("answer_id").to_pylist() == ids
+    assert table.schema.metadata[b"knowmetrics.sources"] == b"session_answers,archive"
+    assert set(table.column("quiz_name").to_pylist()) == {"Export"}
+
+    reader = pa.ipc.open_stream(b"".join(stream_answer_log(TENANT, "arrow", batch_size=BATCH_SIZE)))
+    batches = list(reader)
+    assert [batch.num_rows for batch in batches] == [BATCH_SIZE] * (ANSWERS // BATCH_SIZE) + [ANSWERS % BATCH_SIZE]
+    assert pa.Table.from_batches(batches).column("answer_id").to_pylist() == ids
+
+    path = str(tmp_path / "answers.parquet")
+    assert export_answer_log(path, "parquet", TENANT) == ANSWERS
+    assert pq.read_table(path).column("answer_id").to_pylist() == ids
+
+    # The pooled read connection does not keep the archive attached
+    with tenant_router.get_read_sessionmaker(TENANT)() as db:
+        attached = [row[1] for row in db.connection().exec_driver_sql("PRAGMA database_list")]
+    assert attached == ["main"]
+
+    recent = [i for i in ids if i not in old]
+    since = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    response = TestClient(main.app).get(
+        "/api/export/answers", params={"since": since}, headers={TENANT_HEADER: TENANT}
+    )
+    assert response.status_code == 200
+    assert pq.read_table(io.BytesIO(response.content)).column("answer_id").to_pylist() == recent
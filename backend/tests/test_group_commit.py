@@ -0,0 +1,146 @@
+"""
+Group commit: answers of different requests applied in one transaction.
+
+A failing answer in a batch (a duplicate, a missing session, or a database error
+that aborts the shared transaction) must be reported to its own caller only, while
+the other answers of the batch still commit.
+"""
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from database import tenant_router, TENANT_HEADER
+from group_commit import GroupCommitter
+from models import SessionAnswer
+from routes.sessions import _submit_answer
+from schemas import SessionAnswer as SessionAnswerSchema
+import main
+
+TENANT = "group-commit"
+WINDOW_MS = 500  # long enough for every submit of a test to land in one batch
+
+
+@pytest.fixture(scope="module")
+def client(data_dir):
+    client = TestClient(main.app, headers={TENANT_HEADER: TENANT})
+    yield client
+    tenant_router.close(TENANT)
+
+
+@pytest.fixture(scope="module")
+def quiz_id(client) -> int:
+    response = client.post("/api/quizzes", json={"name": "Group commit"})
+    quiz_id = response.json()["id"]
+    response = client.post("/api/questions/bulk", json={"quiz_id": quiz_id, "questions": [
+        {
+            "quiz_id": quiz_id,
+            "topic": "Batching",
+            "question_text": f"Batched question {i + 1}?",
+            "alternatives": ["A", "B"],
+            "correct_answer": "A",
+            "difficulty": 1
+        }
+        for i in range(4)
+    ]})
+    response.raise_for_status()
+    return quiz_id
+
+
+@pytest.fixture
+def committer():
+    committer = GroupCommitter(TENANT, WINDOW_MS, max_batch=64)
+    yield committer
+    committer.stop()
+
+
+@pytest.fixture
+def started(client, quiz_id) -> dict:
+    response = client.post("/api/sessions/start", json={"quiz_id": quiz_id})
+    response.raise_for_status()
+    return response.json()
+
+
+def answer(question: dict) -> SessionAnswerSchema:
+    return SessionAnswerSchema(
+        question_id=question["id"], answer_index=0, permutation=question["permutation"], time_spent=2.0
+    )
+
+
+def submit_together(committer: GroupCommitter, calls: dict) -> dict:
+    """Submit every call from its own thread at once; returns name -> result or exception"""
+    outcomes = {}
+    barrier = threading.Barrier(len(calls))
+
+    def run(name, func, args):
+        barrier.wait()
+        try:
+            outcomes[name] = committer.submit(func, *args)
+        except Exception as e:
+            outcomes[name] = e
+
+    threads = [threading.Thread(target=run, args=(name, *call)) for name, call in calls.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def stored_answers(session_id: int) -> dict:
+    with tenant_router.get_sessionmaker(TENANT)() as db:
+        return {
+            a.question_id: a.answer_index
+            for a in db.query(SessionAnswer).filter(SessionAnswer.session_id == session_id)
+        }
+
+
+def test_duplicate_fails_alone(committer, started):
+    session_id = started["session_id"]
+    first, second, third = started["questions"][:3]
+
+    outcomes = submit_together(committer, {
+        "first": (_submit_answer, (session_id, None, answer(first))),
+        "first-again": (_submit_answer, (session_id, None, answer(first))),
+        "second": (_submit_answer, (session_id, None, answer(second))),
+        "third": (_submit_answer, (session_id, None, answer(third))),
+        "missing-session": (_submit_answer, (999999, None, answer(third))),
+    })
+
+    assert committer.snapshot()["batches"] == 1
+    duplicates = [outcomes["first"], outcomes["first-again"]]
+    errors = [o for o in duplicates if isinstance(o, HTTPException)]
+    assert len(errors) == 1 and errors[0].status_code == 400
+    assert isinstance(outcomes["missing-session"], HTTPException)
+    assert outcomes["missing-session"].status_code == 404
+    # Applied in arrival order within the batch: the running counts are 1, 2 and 3
+    accepted = [o for o in outcomes.values() if not isinstance(o, Exception)]
+    assert sorted(o.questions_answered for o in accepted) == [1, 2, 3]
+
+    assert set(stored_answers(session_id)) == {first["id"], second["id"], third["id"]}
+
+
+def test_database_error_fails_alone(client, committer, started):
+    session_id = started["session_id"]
+    first, second = started["questions"][:2]
+
+    def broken(db):
+        db.execute(text("INSERT INTO session_answers (id) VALUES (NULL)"))  # violates NOT NULL
+
+    outcomes = submit_together(committer, {
+        "first": (_submit_answer, (session_id, None, answer(first))),
+        "broken": (broken, ()),
+        "second": (_submit_answer, (session_id, None, answer(second))),
+    })
+
+    snapshot = committer.snapshot()
+    assert (snapshot["batches"], snapshot["fallbacks"]) == (1, 1)
+    assert not isinstance(outcomes["broken"], HTTPException) and isinstance(outcomes["broken"], Exception)
+    assert not isinstance(outcomes["first"], Exception)
+    assert not isinstance(outcomes["second"], Exception)
+    assert set(stored_answers(session_id)) == {first["id"], second["id"]}
+
+    session = client.get(f"/api/sessions/{session_id}").json()
+    assert session["correct_answers"] + session["wrong_answers"] == 2
@@ -0,0 +1,111 @@
+"""
+Live quiz channel (/ws/sessions/{id}): answers, errors and finish over one connection.
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from database import tenant_router, TENANT_HEADER
+import main
+
+TENANT = "live"
+HEADERS = {TENANT_HEADER: TENANT}
+QUESTIONS = 3
+
+
+@pytest.fixture(scope="module")
+def client(data_dir):
+    client = TestClient(main.app, headers=HEADERS)
+    yield client
+    tenant_router.close(TENANT)
+
+
+@pytest.fixture
+def started(client) -> dict:
+    """A started session on a fresh quiz whose correct answer is always "A" """
+    quiz = client.post("/api/quizzes", json={"name": f"Live {uuid.uuid4().hex[:8]}"})
+    quiz_id = quiz.json()["id"]
+    response = client.post("/api/questions/bulk", json={"quiz_id": quiz_id, "questions": [
+        {
+            "quiz_id": quiz_id,
+            "topic": "Live",
+            "question_text": f"Live question {i + 1}?",
+            "alternatives": ["A", "B", "C"],
+            "correct_answer": "A",
+            "difficulty": 1
+        }
+        for i in range(QUESTIONS)
+    ]})
+    response.raise_for_status()
+    response = client.post("/api/sessions/start", json={"quiz_id": quiz_id})
+    response.raise_for_status()
+    return response.json()
+
+
+def answer(question: dict, choice: str) -> dict:
+    return {
+        "type": "answer",
+        "question_id": question["id"],
+        "answer_index": question["alternatives"].index(choice),
+        "permutation": question["permutation"],
+        "time_spent": 4.0
+    }
+
+
+def test_answer_and_finish(client, started):
+    session_id = started["session_id"]
+    first, *rest = started["questions"]
+
+    with client.websocket_connect(f"/ws/sessions/{session_id}") as ws:
+        state = ws.receive_json()
+        assert state["type"] == "session" and state["questions_answered"] == 0
+
+        ws.send_json(answer(first, "A"))
+        result = ws.receive_json()
+        assert result["type"] == "result" and result["is_correct"]
+        assert result["questions_answered"] == 1 and result["current_score"] == 1
+
+        ws.send_json(answer(first, "B"))
+        assert ws.receive_json() == {"type": "error", "status": 400, "detail": "Question already answered"}
+
+        for question in rest:
+            ws.send_json(answer(question, "B"))
+            assert ws.receive_json()["is_correct"] is False
+
+        ws.send_json({"type": "finish"})
+        finished = ws.receive_json()
+        assert finished["type"] == "finished"
+        with pytest.raises(WebSocketDisconnect):
+            ws.receive_json()
+
+    session = client.get(f"/api/sessions/{session_id}").json()
+    assert session["is_completed"]
+    assert (session["correct_answers"], session["wrong_answers"]) == (1, QUESTIONS - 1)
+
+
+def test_bad_messages_keep_connection_open(client, started):
+    question = started["questions"][0]
+
+    with client.websocket_connect(f"/ws/sessions/{started['session_id']}") as ws:
+        ws.receive_json()
+
+        ws.send_text("{not json")
+        assert ws.receive_json() == {"type": "error", "status": 400, "detail": "Message is not valid JSON"}
+
+        ws.send_json({"type": "nope"})
+        assert ws.receive_json()["type"] == "error"
+
+        ws.send_json({"type": "answer", "question_id": question["id"]})
+        assert ws.receive_json()["status"] == 422
+
+        ws.send_json(answer(question, "A"))
+        assert ws.receive_json()["is_correct"]
+
+
+def test_missing_session_closes(client):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/ws/sessions/999999") as ws:
+            ws.receive_json()
+    assert closed.value.code == 4404
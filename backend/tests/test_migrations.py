@@ -0,0 +1,86 @@
+"""
+Upgrades of databases created by the first release.
+
+Answers used to be stored as alternative text; the upgrade indexes them against their
+question and keeps the text only of answers that match no alternative.
+"""
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect
+
+import database
+from database import tenant_router, upgrade_db
+
+CREATED = "'2024-01-01 00:00:00'"
+
+LEGACY_ROWS = [
+    f"INSERT INTO quizzes (id, uuid, name, created_at, updated_at, is_active) "
+    f"VALUES (1, 'quiz-1', 'Legacy quiz', {CREATED}, {CREATED}, 1)",
+    # 10 and 010 are distinct alternatives; JSON numbers are compared as their text
+    f"INSERT INTO questions (id, uuid, quiz_id, topic, question_text, alternatives, correct_answer, "
+    f"difficulty, created_at, updated_at, is_active) VALUES "
+    f"(1, 'question-1', 1, 'Algebra', '2 + 2?', '[\"3\", \"4\", \"5\"]', '4', 1, {CREATED}, {CREATED}, 1), "
+    f"(2, 'question-2', 1, 'Algebra', '5 + 5?', '[\"010\", 10, \"11\"]', '10', 1, {CREATED}, {CREATED}, 1)",
+    f"INSERT INTO study_sessions (id, uuid, quiz_id, total_questions, correct_answers, wrong_answers, "
+    f"total_time, started_at, is_completed) VALUES (1, 'session-1', 1, 2, 1, 1, 10.0, {CREATED}, 1), "
+    f"(2, 'session-2', 1, 2, 0, 2, 10.0, {CREATED}, 1)",
+    f"INSERT INTO session_answers (id, session_id, question_id, user_answer, is_correct, time_spent, "
+    f"answered_at) VALUES "
+    f"(1, 1, 1, '4', 1, 5.0, {CREATED}), "        # matches the correct alternative
+    f"(2, 1, 2, '11', 0, 5.0, {CREATED}), "       # matches a wrong alternative
+    f"(3, 2, 1, 'four', 0, 5.0, {CREATED}), "     # matches no alternative
+    f"(4, 2, 2, '10', 1, 5.0, {CREATED})",        # matches a JSON number alternative
+]
+
+
+def answers(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            row[0]: row[1:] for row in conn.execute(
+                "SELECT id, answer_index, user_answer, is_correct FROM session_answers ORDER BY id"
+            )
+        }
+    finally:
+        conn.close()
+
+
+def test_answers_indexed_and_unmatched_text_kept(baseline_tenant):
+    path = baseline_tenant("migrate-answers", LEGACY_ROWS)
+
+    engine = tenant_router.get_engine("migrate-answers")
+
+    assert answers(path) == {
+        1: (1, None, 1),
+        2: (2, None, 0),
+        3: (None, "four", 0),
+        4: (1, None, 1),
+    }
+    conn = sqlite3.connect(path)
+    try:
+        assert dict(conn.execute("SELECT id, correct_index FROM questions")) == {1: 1, 2: 1}
+        columns = {row[1]: row for row in conn.execute("PRAGMA table_info(session_answers)")}
+    finally:
+        conn.close()
+    assert "legacy_user_answer" not in columns
+    assert columns["user_answer"][3] == 0  # nullable: new answers store only the index
+
+    # A second upgrade finds nothing to do and keeps the data
+    upgrade_db(engine)
+    assert answers(path)[3] == (None, "four", 0)
+    tenant_router.close("migrate-answers")
+
+
+def test_old_sqlite_refused_before_any_change(baseline_tenant, monkeypatch):
+    path = baseline_tenant("migrate-old-sqlite", LEGACY_ROWS)
+    engine = database.create_sqlite_engine(f"sqlite:///{path}", 1)
+    monkeypatch.setattr(database.sqlite3, "sqlite_version_info", (3, 34, 1))
+
+    with pytest.raises(RuntimeError, match=r"needs SQLite 3\.35\.0 or newer"):
+        upgrade_db(engine)
+
+    inspector = inspect(engine)
+    assert "answer_index" not in {c["name"] for c in inspector.get_columns("session_answers")}
+    assert not inspector.has_table("question_stats")
+    engine.dispose()
@@ -0,0 +1,274 @@
+"""
+SQL statement budgets per endpoint.
+
+Counts the statements each request sends to SQLite (engine cursor events) and checks
+them against a fixed budget at several data scales. The budget of an endpoint does not
+grow with the data, so a change that brings back per-row queries (N+1) exceeds it at
+the larger scales; the failure names the most repeated statement.
+
+Each scale gets a fresh tenant database (qbudget-<rows>) in a temporary data directory,
+filled with roughly that many answer rows plus matching sessions, themes, question
+statistics, reviews, review queue and topic rollup.
+"""
+import os
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from database import tenant_router, TENANT_HEADER
+from review_queue import rebuild_review_queue
+from topic_rollup import rebuild_topic_rollup
+from models import (
+    Quiz, Topic, Question, StudySession, SessionTheme, SessionAnswer,
+    QuestionStat, QuestionReview
+)
+import main
+
+# Maximum statements per request; independent of the amount of data
+BUDGETS = {
+    "GET /quizzes": 3,
+    "GET /quizzes/{id}": 3,
+    "GET /quizzes/{id}/hardest-questions": 2,
+    "GET /questions": 1,
+    "GET /questions/random": 2,
+    "GET /sessions": 2,
+    "GET /sessions/summary": 1,
+    "GET /sessions/{id}": 2,
+    "POST /sessions/start": 4,
+    "POST /sessions/{id}/answer": 7,
+    "POST /sessions/{id}/finish": 13,
+    "GET /analytics/dashboard": 5,
+    "GET /analytics/prediction/{id}": 4,
+    "GET /analytics/retention/{id}": 4,
+    "GET /analytics/topics": 1,
+    "GET /analytics/schedule": 1,
+}
+
+QUESTIONS_PER_QUIZ = 20
+TOPICS_PER_QUIZ = 5
+ANSWERS_PER_SESSION = 10
+
+
+class StatementCounter:
+    """Counts statements on every engine while active"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+        self.active = False
+        self._lock = threading.Lock()
+        event.listen(Engine, "before_cursor_execute", self._record)
+
+    def close(self):
+        event.remove(Engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            with self._lock:
+                self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+
+def seed(tenant_id: str, answer_rows: int):
+    """Fill a fresh tenant database with about answer_rows answers of completed sessions"""
+    path = tenant_router.database_path(tenant_id)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    engine = tenant_router.get_engine(tenant_id)
+
+    rng = random.Random(answer_rows)
+    quiz_count = max(2, min(50, round(answer_rows ** 0.5 / 6)))
+    session_count = max(1, answer_rows // ANSWERS_PER_SESSION)
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        conn.execute(insert(Topic.__table__), [
+            {"id": t + 1, "name": f"Topic {t + 1}"} for t in range(quiz_count * TOPICS_PER_QUIZ)
+        ])
+        conn.execute(insert(Quiz.__table__), [
+            {"id": q + 1, "name": f"Quiz {q + 1}", "is_active": True} for q in range(quiz_count)
+        ])
+
+        questions = []
+        for q in range(quiz_count):
+            for i in range(QUESTIONS_PER_QUIZ):
+                topic_id = q * TOPICS_PER_QUIZ + i % TOPICS_PER_QUIZ + 1
+                questions.append({
+                    "id": len(questions) + 1,
+                    "quiz_id": q + 1,
+                    "topic": f"Topic {topic_id}",
+                    "topic_id": topic_id,
+                    "question_text": f"Question {i + 1} of quiz {q + 1}?",
+                    "alternatives": ["A", "B", "C", "D"],
+                    "correct_answer": "A",
+                    "correct_index": 0,
+                    "difficulty": i % 5 + 1,
+                    "is_active": True
+                })
+        conn.execute(insert(Question.__table__), questions)
+
+        sessions, themes, answers = [], [], []
+        stats: Dict[int, List[int]] = {}
+        for s in range(session_count):
+            quiz_id = rng.randrange(quiz_count) + 1
+            started = now - timedelta(days=rng.uniform(0, 60))
+            picked = rng.sample(questions[(quiz_id - 1) * QUESTIONS_PER_QUIZ:quiz_id * QUESTIONS_PER_QUIZ],
+                                ANSWERS_PER_SESSION)
+            per_topic: Dict[int, List[float]] = {}
+            correct = 0
+            for question in picked:
+                is_correct = rng.random() < 0.6
+                time_spent = rng.uniform(2, 30)
+                correct += is_correct
+                answers.append({
+                    "session_id": s + 1,
+                    "question_id": question["id"],
+                    "answer_index": 0 if is_correct else 1,
+                    "is_correct": is_correct,
+                    "time_spent": time_spent,
+                    "answered_at": started
+                })
+                totals = per_topic.setdefault(question["topic_id"], [0, 0, 0.0])
+                totals[0 if is_correct else 1] += 1
+                totals[2] += time_spent
+                stat = stats.setdefault(question["id"], [question["quiz_id"], 0, 0])
+                stat[1] += 1
+                stat[2] += is_correct
+
+            total_time = sum(a["time_spent"] for a in answers[-ANSWERS_PER_SESSION:])
+            sessions.append({
+                "id": s + 1,
+                "quiz_id": quiz_id,
+                "total_questions": ANSWERS_PER_SESSION,
+                "correct_answers": correct,
+                "wrong_answers": ANSWERS_PER_SESSION - correct,
+                "total_time": total_time,
+                "average_time": total_time / ANSWERS_PER_SESSION,
+                "score": round(correct / ANSWERS_PER_SESSION * 10, 2),
+                "started_at": started,
+                "finished_at": started + timedelta(minutes=10),
+                "is_completed": True
+            })
+            for topic_id, (right, wrong, spent) in per_topic.items():
+                themes.append({
+                    "session_id": s + 1,
+                    "topic": f"Topic {topic_id}",
+                    "topic_id": topic_id,
+                    "correct_answers": right,
+                    "wrong_answers": wrong,
+                    "total_time": spent,
+                    "average_time": spent / (right + wrong)
+                })
+
+        conn.execute(insert(StudySession.__table__), sessions)
+        conn.execute(insert(SessionTheme.__table__), themes)
+        conn.execute(insert(SessionAnswer.__table__), answers)
+        conn.execute(insert(QuestionStat.__table__), [
+            {"question_id": qid, "quiz_id": quiz_id, "attempts": attempts, "correct_count": right,
+             "mean_time": 15.0, "m2_time": 0.0, "p_value": right / attempts}
+            for qid, (quiz_id, attempts, right) in stats.items()
+        ])
+        conn.execute(insert(QuestionReview.__table__), [
+            {"question_id": qid, "quiz_id": quiz_id, "repetitions": 1, "interval_days": 1.0,
+             "ease_factor": 2.5, "last_reviewed_at": now - timedelta(days=2), "due_at": now - timedelta(days=1)}
+            for qid, (quiz_id, _, _) in stats.items()
+        ])
+    
+    with Session(bind=engine) as db:
+        rebuild_review_queue(db)
+        rebuild_topic_rollup(db)
+        db.commit()
+
+
+def measure(client: TestClient, counter: StatementCounter, tenant_id: str) -> Dict[str, Tuple[int, List[str]]]:
+    """Statement count and statements of each budgeted request"""
+    headers = {TENANT_HEADER: tenant_id}
+    results = {}
+
+    def call(name: str, method: str, url: str, **kwargs):
+        with counter:
+            response = client.request(method, url, headers=headers, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} failed with {response.status_code}: {response.text}")
+        results[name] = (len(counter.statements), list(counter.statements))
+        return response.json()
+
+    call("GET /quizzes", "GET", "/api/quizzes")
+    call("GET /quizzes/{id}", "GET", "/api/quizzes/1")
+    call("GET /quizzes/{id}/hardest-questions", "GET", "/api/quizzes/1/hardest-questions")
+    call("GET /questions", "GET", "/api/questions", params={"quiz_id": 1})
+    call("GET /questions/random", "GET", "/api/questions/random", params={"quiz_id": 1, "count": 5})
+    call("GET /sessions", "GET", "/api/sessions")
+    call("GET /sessions/summary", "GET", "/api/sessions/summary")
+    call("GET /sessions/{id}", "GET", "/api/sessions/1")
+    call("GET /analytics/dashboard", "GET", "/api/analytics/dashboard")
+    call("GET /analytics/prediction/{id}", "GET", "/api/analytics/prediction/1",
+         params={"exam_questions": 10, "min_score": 6})
+    call("GET /analytics/retention/{id}", "GET", "/api/analytics/retention/1")
+    call("GET /analytics/topics", "GET", "/api/analytics/topics")
+    call("GET /analytics/schedule", "GET", "/api/analytics/schedule", params={"within_hours": 72})
+
+    started = call("POST /sessions/start", "POST", "/api/sessions/start", json={"quiz_id": 1})
+    session_id = started["session_id"]
+    for position, question in enumerate(started["questions"]):
+        payload = {
+            "question_id": question["id"],
+            "answer_index": 0,
+            "permutation": question["permutation"],
+            "time_spent": 5.0
+        }
+        if position == 1:
+            # Questions have statistics and reviews already, as in steady state
+            call("POST /sessions/{id}/answer", "POST", f"/api/sessions/{session_id}/answer", json=payload)
+        else:
+            response = client.post(f"/api/sessions/{session_id}/answer", headers=headers, json=payload)
+            response.raise_for_status()
+    call("POST /sessions/{id}/finish", "POST", f"/api/sessions/{session_id}/finish")
+    return results
+
+
+
+SCALES = [10, 1000, 100000]
+
+
+@pytest.fixture(scope="module")
+def counter():
+    counter = StatementCounter()
+    yield counter
+    counter.close()
+
+
+@pytest.fixture(scope="module", params=SCALES, ids=lambda rows: f"{rows}-rows")
+def statement_counts(request, data_dir, counter) -> Dict[str, Tuple[int, List[str]]]:
+    """Statements of each budgeted request against a tenant seeded with request.param answers"""
+    tenant_id = f"qbudget-{request.param}"
+    seed(tenant_id, request.param)
+    try:
+        yield measure(TestClient(main.app), counter, tenant_id)
+    finally:
+        tenant_router.close(tenant_id)
+
+
+@pytest.mark.parametrize("endpoint", list(BUDGETS))
+def test_statement_budget(statement_counts, endpoint):
+    count, statements = statement_counts[endpoint]
+    statement, times = Counter(statements).most_common(1)[0]
+    assert count <= BUDGETS[endpoint], (
+        f"{endpoint}: {count} statements (budget {BUDGETS[endpoint]}); "
+        f"repeated {times}x: {' '.join(statement.split())[:160]}"
+    )
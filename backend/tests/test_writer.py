@@ -0,0 +1,102 @@
+"""
+Single-writer mode with tenant shards that are not migrated yet.
+
+Starts writer.py with two read workers, then sends concurrent requests for an old
+(first release) shard and a new one. Read workers must leave the migration to the
+writer: every request succeeds and each shard ends up with the current schema.
+"""
+import asyncio
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from database import tenant_router, TENANT_HEADER
+
+READ_WORKERS = 2
+REQUESTS_PER_TENANT = 40
+
+LEGACY_ROWS = [
+    "INSERT INTO quizzes (id, uuid, name, created_at, updated_at, is_active) "
+    "VALUES (1, 'legacy-quiz', 'Legacy quiz', '2024-01-01 00:00:00', '2024-01-01 00:00:00', 1)",
+    "INSERT INTO questions (id, uuid, quiz_id, topic, question_text, alternatives, correct_answer, "
+    "difficulty, created_at, updated_at, is_active) VALUES (1, 'legacy-question', 1, 'Algebra', '1 + 1?', "
+    "'[\"1\", \"2\"]', '2', 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00', 1)",
+]
+
+
+@pytest.fixture(scope="module")
+def writer_url(data_dir, free_port):
+    """Writer plus read workers on a temporary data directory; yields the read workers' URL"""
+    port = free_port()
+    socket_path = str(data_dir / "writer.sock")
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Own process group: stopping it stops the writer and the read workers it started
+    process = subprocess.Popen(
+        [sys.executable, "writer.py", "--workers", str(READ_WORKERS), "--host", "127.0.0.1",
+         "--port", str(port), "--socket", socket_path],
+        cwd=backend_dir, start_new_session=True, stdout=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            assert process.poll() is None, "writer.py exited during startup"
+            assert time.monotonic() < deadline, "read workers did not become ready"
+            try:
+                if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        yield url
+    finally:
+        os.killpg(process.pid, signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+async def get_all(url: str, tenant_ids) -> list:
+    """Concurrent GETs, each on its own connection so they spread over the read workers"""
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        async def get(tenant_id: str, path: str):
+            response = await client.get(path, headers={TENANT_HEADER: tenant_id})
+            return tenant_id, path, response.status_code, response.text
+
+        return await asyncio.gather(*(
+            get(tenant_id, path)
+            for _ in range(REQUESTS_PER_TENANT // 2)
+            for tenant_id in tenant_ids
+            for path in ("/api/quizzes", "/api/sessions")
+        ))
+
+
+def test_read_workers_leave_migrations_to_writer(writer_url, baseline_tenant):
+    legacy_path = baseline_tenant("writer-legacy", LEGACY_ROWS)
+    new_path = tenant_router.database_path("writer-new")
+
+    results = asyncio.run(get_all(writer_url, ["writer-legacy", "writer-new"]))
+
+    failed = [result for result in results if result[2] != 200]
+    assert failed == []
+    quizzes = {r[3] for r in results if r[0] == "writer-legacy" and r[1] == "/api/quizzes"}
+    assert len(quizzes) == 1 and "Legacy quiz" in quizzes.pop()
+
+    for path in (legacy_path, new_path):
+        conn = sqlite3.connect(path)
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(session_answers)")}
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conn.close()
+        assert {"user_id", "answer_index", "user_answer"} <= columns
+        assert {"question_stats", "review_queue", "jobs"} <= tables
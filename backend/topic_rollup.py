@@ -0,0 +1,130 @@
+"""
+Maintained per-topic totals of completed sessions.
+
+topic_rollups keeps, per user and topic, the summed correct and wrong answers, answer
+time and number of sessions. Finishing a session adds its session_themes rows with one
+upsert and deleting sessions subtracts them again, so the topic analytics read one row
+per topic instead of grouping the whole session_themes table.
+"""
+from typing import Dict, Tuple
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import StudySession, SessionTheme, TopicRollup
+
+# (correct, wrong, total_time) of one session's answers on a topic
+TopicTotals = Tuple[int, int, float]
+
+
+def add_session_topics(db: Session, user_id: str, topic_totals: Dict[int, TopicTotals]):
+    """Add a completed session's totals per topic id (not committed)"""
+    if not topic_totals:
+        return
+    
+    statement = sqlite_insert(TopicRollup)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "topic_id"],
+        set_={
+            "correct_answers": TopicRollup.correct_answers + statement.excluded.correct_answers,
+            "wrong_answers": TopicRollup.wrong_answers + statement.excluded.wrong_answers,
+            "total_time": TopicRollup.total_time + statement.excluded.total_time,
+            "sessions": TopicRollup.sessions + statement.excluded.sessions
+        }
+    ), [
+        {
+            "user_id": user_id,
+            "topic_id": topic_id,
+            "correct_answers": correct,
+            "wrong_answers": wrong,
+            "total_time": total_time,
+            "sessions": 1
+        }
+        for topic_id, (correct, wrong, total_time) in topic_totals.items()
+    ])
+
+
+def _subtract(db: Session, totals: Dict[Tuple[str, int], Tuple[int, int, float, int]]):
+    """
+    Subtract (correct, wrong, total_time, sessions) per (user_id, topic_id) of
+    deleted sessions and drop rows left without sessions (not committed).
+    """
+    if not totals:
+        return
+    
+    table = TopicRollup.__table__
+    db.execute(update(table).where(
+        table.c.user_id == bindparam("b_user_id"),
+        table.c.topic_id == bindparam("b_topic_id")
+    ).values(
+        correct_answers=table.c.correct_answers - bindparam("b_correct"),
+        wrong_answers=table.c.wrong_answers - bindparam("b_wrong"),
+        total_time=table.c.total_time - bindparam("b_total_time"),
+        sessions=table.c.sessions - bindparam("b_sessions")
+    ), [
+        {
+            "b_user_id": user_id,
+            "b_topic_id": topic_id,
+            "b_correct": correct,
+            "b_wrong": wrong,
+            "b_total_time": total_time,
+            "b_sessions": sessions
+        }
+        for (user_id, topic_id), (correct, wrong, total_time, sessions) in totals.items()
+    ])
+    db.query(TopicRollup).filter(TopicRollup.sessions <= 0).delete(synchronize_session=False)
+
+
+def remove_session_topics(db: Session, session: StudySession):
+    """Subtract a completed session's topic rows before it is deleted (not committed)"""
+    _subtract(db, {
+        (session.user_id, theme.topic_id): (
+            theme.correct_answers, theme.wrong_answers, theme.total_time or 0.0, 1
+        )
+        for theme in session.topics if theme.topic_id is not None
+    })
+
+
+def remove_quiz_topics(db: Session, quiz_id: int):
+    """Subtract the topic rows of every session of a quiz before it is deleted (not committed)"""
+    rows = _theme_totals(db).filter(StudySession.quiz_id == quiz_id).all()
+    _subtract(db, {
+        (user_id, topic_id): (correct or 0, wrong or 0, total_time or 0.0, sessions)
+        for user_id, topic_id, correct, wrong, total_time, sessions in rows
+    })
+
+
+def rebuild_topic_rollup(db: Session) -> int:
+    """Recompute every rollup row from session themes (not committed); returns the row count"""
+    rows = _theme_totals(db).all()
+    db.query(TopicRollup).delete(synchronize_session=False)
+    db.add_all([
+        TopicRollup(
+            user_id=user_id,
+            topic_id=topic_id,
+            correct_answers=correct or 0,
+            wrong_answers=wrong or 0,
+            total_time=total_time or 0.0,
+            sessions=sessions
+        )
+        for user_id, topic_id, correct, wrong, total_time, sessions in rows
+    ])
+    return len(rows)
+
+
+def _theme_totals(db: Session):
+    """Session theme totals of completed sessions grouped by (user_id, topic_id)"""
+    return db.query(
+        StudySession.user_id,
+        SessionTheme.topic_id,
+        func.sum(SessionTheme.correct_answers),
+        func.sum(SessionTheme.wrong_answers),
+        func.sum(SessionTheme.total_time),
+        func.count(SessionTheme.id)
+    ).join(
+        StudySession, StudySession.id == SessionTheme.session_id
+    ).filter(
+        StudySession.is_completed == True,
+        SessionTheme.topic_id.isnot(None)
+    ).group_by(StudySession.user_id, SessionTheme.topic_id)
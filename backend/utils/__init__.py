@@ -1,14 +1,22 @@
 from .analytics import (
+    DEFAULT_DECAY_CONSTANT,
     erf,
     normal_cdf,
     calculate_msle,
     calculate_retention_rate,
     calculate_next_review,
+    fit_decay_constants,
+    welford_update,
+    welford_variance,
+    welford_merge,
+    sm2_update,
     calculate_entropy,
     calculate_priority_index,
     calculate_pass_probability,
     predict_performance,
+    predict_performance_arrays,
     analyze_topic_retention,
+    describe_next_review,
     generate_study_schedule,
     format_time,
     format_interval,
@@ -16,16 +24,24 @@ from .analytics import (
 )
 
 __all__ = [
+    "DEFAULT_DECAY_CONSTANT",
     "erf",
     "normal_cdf",
     "calculate_msle",
     "calculate_retention_rate",
     "calculate_next_review",
+    "fit_decay_constants",
+    "welford_update",
+    "welford_variance",
+    "welford_merge",
+    "sm2_update",
     "calculate_entropy",
     "calculate_priority_index",
     "calculate_pass_probability",
     "predict_performance",
+    "predict_performance_arrays",
     "analyze_topic_retention",
+    "describe_next_review",
     "generate_study_schedule",
     "format_time",
     "format_interval",
@@ -6,6 +6,16 @@ import math
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 
+import numpy as np
+from scipy.optimize import least_squares
+from scipy.sparse import csr_matrix
+
+# Forgetting-curve decay per hour used for topics without a fitted constant
+DEFAULT_DECAY_CONSTANT = 0.0005
+MAX_DECAY_CONSTANT = 0.5
+# Elapsed-time buckets (hours) of repeat exposures, from 15 minutes to two years
+DECAY_BUCKET_EDGES = np.geomspace(0.25, 24 * 730, 25)
+
 
 def erf(x: float) -> float:
     """Compute error function using Abramowitz and Stegun approximation"""
@@ -34,7 +44,7 @@ def calculate_msle(actual: float, predicted: float) -> float:
 def calculate_retention_rate(
     accuracy: float,
     hours_since_review: float,
-    decay_constant: float = 0.0005
+    decay_constant: float = DEFAULT_DECAY_CONSTANT
 ) -> float:
     """
     Calculate retention rate using Ebbinghaus forgetting curve.
@@ -46,15 +56,155 @@ def calculate_retention_rate(
 def calculate_next_review(
     current_retention: float,
     target_retention: float = 0.85,
-    decay_constant: float = 0.0005
+    decay_constant: float = DEFAULT_DECAY_CONSTANT
 ) -> float:
     """Calculate hours until retention drops to target level"""
-    if current_retention <= 0 or current_retention <= target_retention:
+    if current_retention <= 0 or current_retention <= target_retention or decay_constant <= 0:
         return 0
     
     return -math.log(target_retention / current_retention) / decay_constant
 
 
+def fit_decay_constants(
+    topic_index: np.ndarray,
+    elapsed_hours: np.ndarray,
+    correct: np.ndarray,
+    topic_count: int,
+    min_observations: int = 30
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit R(t) = a * e^(-λt) per topic to the outcome of repeat exposures.
+    Each observation is one answer to a question the learner has seen before:
+    its topic (0..topic_count-1), the hours since the previous exposure and
+    whether it was correct. Observations are binned by elapsed time and all
+    topics are solved as one bounded least-squares problem (block-sparse
+    Jacobian), weighting each bin by its number of answers.
+    Returns (initial_accuracy, decay_constant, observations) per topic; topics
+    with fewer than min_observations repeats or a single time bin get NaN.
+    """
+    buckets = len(DECAY_BUCKET_EDGES) - 1
+    initial = np.full(topic_count, np.nan)
+    decay = np.full(topic_count, np.nan)
+    
+    bucket = np.clip(np.searchsorted(DECAY_BUCKET_EDGES, elapsed_hours, side="right") - 1, 0, buckets - 1)
+    cell = topic_index * buckets + bucket
+    size = topic_count * buckets
+    counts = np.bincount(cell, minlength=size).reshape(topic_count, buckets)
+    hits = np.bincount(cell, weights=correct, minlength=size).reshape(topic_count, buckets)
+    hours = np.bincount(cell, weights=elapsed_hours, minlength=size).reshape(topic_count, buckets)
+    observations = counts.sum(axis=1)
+    
+    fitted = (observations >= min_observations) & ((counts > 0).sum(axis=1) >= 2)
+    topics = np.flatnonzero(fitted)
+    if len(topics) == 0:
+        return initial, decay, observations
+    
+    # One residual per non-empty (topic, bucket) cell of the fitted topics
+    rows, cols = np.nonzero(counts[topics])
+    n = counts[topics][rows, cols]
+    t = hours[topics][rows, cols] / n
+    y = hits[topics][rows, cols] / n
+    w = np.sqrt(n)
+    k = len(topics)
+    m = len(rows)
+    
+    def residuals(x):
+        return w * (x[rows] * np.exp(-x[k + rows] * t) - y)
+    
+    def jacobian(x):
+        e = w * np.exp(-x[k + rows] * t)
+        data = np.concatenate([e, -x[rows] * t * e])
+        return csr_matrix(
+            (data, (np.tile(np.arange(m), 2), np.concatenate([rows, k + rows]))), shape=(m, 2 * k)
+        )
+    
+    accuracy = hits[topics].sum(axis=1) / observations[topics]
+    x0 = np.concatenate([np.clip(accuracy, 0.05, 1.0), np.full(k, DEFAULT_DECAY_CONSTANT)])
+    result = least_squares(
+        residuals, x0, jac=jacobian,
+        bounds=(np.concatenate([np.full(k, 1e-3), np.zeros(k)]),
+                np.concatenate([np.ones(k), np.full(k, MAX_DECAY_CONSTANT)])),
+        x_scale="jac", tr_solver="lsmr", method="trf"
+    )
+    
+    initial[topics] = result.x[:k]
+    decay[topics] = result.x[k:]
+    return initial, decay, observations
+
+
+def welford_update(
+    count: int,
+    mean: float,
+    m2: float,
+    value: float
+) -> Tuple[int, float, float]:
+    """
+    Update running mean and sum of squared deviations with a new value.
+    Welford's online algorithm, O(1) per observation.
+    """
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return count, mean, m2
+
+
+def welford_variance(count: int, m2: float) -> float:
+    """Sample variance from Welford accumulators"""
+    if count < 2:
+        return 0.0
+    return m2 / (count - 1)
+
+
+def welford_merge(
+    count_a: int,
+    mean_a: float,
+    m2_a: float,
+    count_b: int,
+    mean_b: float,
+    m2_b: float
+) -> Tuple[int, float, float]:
+    """
+    Combine two sets of Welford accumulators (Chan et al. parallel algorithm).
+    """
+    count = count_a + count_b
+    if count == 0:
+        return 0, 0.0, 0.0
+    
+    delta = mean_b - mean_a
+    mean = mean_a + delta * count_b / count
+    m2 = m2_a + m2_b + delta * delta * count_a * count_b / count
+    return count, mean, m2
+
+
+def sm2_update(
+    repetitions: int,
+    interval_days: float,
+    ease_factor: float,
+    quality: int
+) -> Tuple[int, float, float]:
+    """
+    Update spaced-repetition state using the SM-2 algorithm.
+    quality ranges from 0 (blackout) to 5 (perfect recall).
+    """
+    if quality < 3:
+        repetitions = 0
+        interval_days = 1.0
+    else:
+        if repetitions == 0:
+            interval_days = 1.0
+        elif repetitions == 1:
+            interval_days = 6.0
+        else:
+            interval_days = interval_days * ease_factor
+        repetitions += 1
+    
+    ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    ease_factor = max(1.3, ease_factor)
+    
+    return repetitions, interval_days, ease_factor
+
+
 def calculate_entropy(correct: int, total: int) -> float:
     """
     Calculate entropy (uncertainty/complexity) of a topic.
@@ -171,12 +321,59 @@ def predict_performance(
     }
 
 
+def predict_performance_arrays(
+    correct: np.ndarray,
+    wrong: np.ndarray,
+    times: np.ndarray,
+    exam_questions: int,
+    min_score: float
+) -> Dict:
+    """
+    Vectorized predict_performance over per-session columns
+    (correct, wrong and total time of each session).
+    """
+    total_correct = int(correct.sum())
+    total_questions = total_correct + int(wrong.sum())
+    
+    if len(correct) == 0 or total_questions == 0:
+        return {
+            "predicted_correct": 0,
+            "predicted_time": "0s",
+            "pass_probability": 0,
+            "topics_retention": {},
+            "study_schedule": []
+        }
+    
+    accuracy = total_correct / total_questions
+    predicted_correct = round(accuracy * exam_questions)
+    predicted_time = float(times.sum()) / total_questions * exam_questions
+    
+    # MSLE over sessions with at least one answer, averaged over all sessions
+    totals = correct + wrong
+    answered = totals > 0
+    errors = (np.log1p(correct[answered]) - np.log1p(accuracy * totals[answered])) ** 2
+    msle = float(errors.sum()) / len(correct)
+    
+    pass_prob = calculate_pass_probability(
+        total_correct, total_questions, exam_questions, min_score, msle / exam_questions
+    )
+    
+    return {
+        "predicted_correct": predicted_correct,
+        "predicted_time": format_time(predicted_time),
+        "pass_probability": pass_prob,
+        "accuracy": accuracy * 100
+    }
+
+
 def analyze_topic_retention(
     topic_data: Dict,
-    current_time: datetime
+    current_time: datetime,
+    decay_constant: float = DEFAULT_DECAY_CONSTANT
 ) -> Dict:
     """
-    Analyze retention for a specific topic.
+    Analyze retention for a specific topic, with the topic's fitted decay constant
+    when there is one.
     """
     correct = topic_data.get('correct', 0)
     wrong = topic_data.get('wrong', 0)
@@ -198,10 +395,10 @@ def analyze_topic_retention(
     hours_diff = (current_time - last_review).total_seconds() / 3600
     days_diff = int(hours_diff / 24)
     
-    retention = calculate_retention_rate(accuracy, hours_diff)
+    retention = calculate_retention_rate(accuracy, hours_diff, decay_constant)
     entropy = calculate_entropy(correct, total)
     priority = calculate_priority_index(entropy, exposures)
-    hours_until = calculate_next_review(retention)
+    hours_until = calculate_next_review(retention, decay_constant=decay_constant)
     
     return {
         "accuracy": round(accuracy * 100, 1),
@@ -213,6 +410,16 @@ def analyze_topic_retention(
     }
 
 
+def describe_next_review(hours: float) -> Tuple[str, str]:
+    """Label and priority of a review due in the given number of hours"""
+    if hours <= 0:
+        return "Review now", "High"
+    if hours < 24:
+        return f"In {int(hours)} hour{'s' if hours > 1 else ''}", "Medium"
+    days = int(hours / 24)
+    return f"In {days} day{'s' if days > 1 else ''}", "Low"
+
+
 def generate_study_schedule(topics_analysis: List[Dict]) -> List[Dict]:
     """
     Generate prioritized study schedule based on retention analysis.
@@ -225,18 +432,7 @@ def generate_study_schedule(topics_analysis: List[Dict]) -> List[Dict]:
     
     schedule = []
     for topic in sorted_topics:
-        hours = topic.get('hours_until_review', 0)
-        
-        if hours <= 0:
-            next_review = "Review now"
-            priority = "High"
-        elif hours < 24:
-            next_review = f"In {int(hours)} hour{'s' if hours > 1 else ''}"
-            priority = "Medium"
-        else:
-            days = int(hours / 24)
-            next_review = f"In {days} day{'s' if days > 1 else ''}"
-            priority = "Low"
+        next_review, priority = describe_next_review(topic.get('hours_until_review', 0))
         
         schedule.append({
             "topic": topic.get('topic', 'Unknown'),
@@ -0,0 +1,211 @@
+"""
+Single-writer deployment for multiple worker processes.
+
+SQLite allows one writer at a time, so several uvicorn workers committing to the same
+file contend for its lock. In this mode one writer process owns every write: read
+workers serve GET requests themselves and forward writes (POST/PUT/PATCH/DELETE and
+live WebSocket sessions) to the writer over a Unix socket.
+
+Run with:
+    python writer.py --workers 4 [--host 0.0.0.0] [--port 8000] [--socket /tmp/knowmetrics-writer.sock]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+DEFAULT_SOCKET = "/tmp/knowmetrics-writer.sock"
+FORWARD_TIMEOUT = 300.0  # seconds; synchronous imports can take a while
+TENANT_OPEN_PATH = "/internal/tenants/open"
+
+# Connection-level headers that must not be copied between hops
+HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"upgrade", b"host"}
+
+
+class WriteForwardingMiddleware:
+    """ASGI middleware of read workers that forwards writes to the writer process"""
+
+    def __init__(self, app, socket_path: str):
+        self.app = app
+        self.socket_path = socket_path
+        self._client: httpx.AsyncClient = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] in WRITE_METHODS:
+            await self._forward_http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._forward_websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.socket_path),
+                base_url="http://writer",
+                timeout=FORWARD_TIMEOUT
+            )
+        return self._client
+
+    @staticmethod
+    def _target(scope) -> str:
+        path = scope.get("raw_path") or scope["path"].encode()
+        if scope.get("query_string"):
+            path += b"?" + scope["query_string"]
+        return path.decode("latin-1")
+
+    async def _forward_http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        
+        headers = [(name, value) for name, value in scope["headers"] if name.lower() not in HOP_HEADERS]
+        request = self.client.build_request(
+            scope["method"], self._target(scope), headers=headers, content=bytes(body)
+        )
+        try:
+            response = await self.client.send(request, stream=True)
+        except httpx.TransportError:
+            await self._unavailable(send)
+            return
+        
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [
+                    (name, value) for name, value in response.headers.raw
+                    if name.lower() not in HOP_HEADERS
+                ]
+            })
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await response.aclose()
+
+    async def _forward_websocket(self, scope, receive, send):
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in scope["headers"]
+            if name.lower() not in HOP_HEADERS and not name.lower().startswith(b"sec-websocket")
+        ]
+        try:
+            upstream = await websockets.unix_connect(
+                self.socket_path, f"ws://writer{self._target(scope)}", extra_headers=headers
+            )
+        except (OSError, websockets.InvalidHandshake):
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        
+        await send({"type": "websocket.accept"})
+
+        async def client_to_writer():
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                data = message.get("text")
+                await upstream.send(data if data is not None else message.get("bytes"))
+
+        async def writer_to_client():
+            try:
+                async for data in upstream:
+                    key = "text" if isinstance(data, str) else "bytes"
+                    await send({"type": "websocket.send", key: data})
+            except websockets.ConnectionClosed:
+                pass
+            await send({"type": "websocket.close", "code": upstream.close_code or 1000})
+        
+        tasks = [asyncio.ensure_future(client_to_writer()), asyncio.ensure_future(writer_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await upstream.close()
+
+    @staticmethod
+    async def _unavailable(send):
+        body = json.dumps({"detail": "Writer process unavailable"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [(b"content-type", b"application/json")]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def open_tenant_on_writer(socket_path: str, tenant_id: str):
+    """Have the writer create and migrate a tenant shard before a read worker opens it"""
+    with httpx.Client(transport=httpx.HTTPTransport(uds=socket_path), timeout=FORWARD_TIMEOUT) as client:
+        try:
+            response = client.post(f"http://writer{TENANT_OPEN_PATH}", headers={"X-Tenant-Id": tenant_id})
+        except httpx.TransportError as e:
+            raise RuntimeError(f"Writer process unavailable to open tenant {tenant_id}") from e
+    if response.status_code != 200:
+        raise RuntimeError(f"Writer failed to open tenant {tenant_id}: {response.text}")
+
+
+def _wait_for_socket(path: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Writer process failed to start")
+        time.sleep(0.1)
+
+
+def serve(workers: int, host: str, port: int, socket_path: str):
+    """Start the writer on a Unix socket, then the read workers on host:port"""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    
+    uvicorn = [sys.executable, "-m", "uvicorn", "main:app", "--log-level", "warning"]
+    writer = subprocess.Popen(uvicorn + ["--uds", socket_path])
+    processes = [writer]
+    try:
+        _wait_for_socket(socket_path, writer)
+        print(f"✍️  Writer listening on {socket_path}")
+        
+        env = dict(os.environ, KNOWMETRICS_WRITER_SOCKET=socket_path)
+        readers = subprocess.Popen(
+            uvicorn + ["--host", host, "--port", str(port), "--workers", str(workers)],
+            env=env
+        )
+        processes.append(readers)
+        print(f"📖 {workers} read workers on http://{host}:{port}")
+        readers.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run KnowMetrics with a single writer process")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    args = parser.parse_args()
+    
+    print("🚀 Starting KnowMetrics with a single writer...")
+    serve(args.workers, args.host, args.port, args.socket)
@@ -84,7 +84,7 @@ const Quiz = () => {
     }
   };
 
-  const submitAnswer = async (answer) => {
+  const submitAnswer = async (answerIndex) => {
     if (answered || !session) return;
     
     setAnswered(true);
@@ -95,11 +95,12 @@ const Quiz = () => {
       const result = await api.submitAnswer(
         session.session_id,
         question.id,
-        answer,
+        answerIndex,
+        question.permutation,
         timeSpent
       );
       
-      setLastResult({ ...result, selectedAnswer: answer });
+      setLastResult({ ...result, selectedIndex: answerIndex });
       
       // Play sound effect (using Web Audio API fallback)
       try {
@@ -275,9 +276,9 @@ const Quiz = () => {
             let buttonClass = 'card hover:bg-card/80 cursor-pointer transition-all py-4 px-6';
             
             if (answered && lastResult) {
-              if (alt === lastResult.correct_answer) {
+              if (index === lastResult.correct_index) {
                 buttonClass = 'card bg-success/20 border-2 border-success py-4 px-6';
-              } else if (alt === lastResult.selectedAnswer && !lastResult.is_correct) {
+              } else if (index === lastResult.selectedIndex && !lastResult.is_correct) {
                 buttonClass = 'card bg-error/20 border-2 border-error py-4 px-6';
               } else {
                 buttonClass = 'card opacity-50 py-4 px-6';
@@ -287,7 +288,7 @@ const Quiz = () => {
             return (
               <button
                 key={index}
-                onClick={() => submitAnswer(alt)}
+                onClick={() => submitAnswer(index)}
                 disabled={answered}
                 className={buttonClass}
               >
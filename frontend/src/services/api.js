@@ -213,13 +213,14 @@ const api = {
     return handleResponse(response);
   },
 
-  async submitAnswer(sessionId, questionId, userAnswer, timeSpent) {
+  async submitAnswer(sessionId, questionId, answerIndex, permutation, timeSpent) {
     const response = await fetch(`${API_BASE_URL}/sessions/${sessionId}/answer`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
         question_id: questionId,
-        user_answer: userAnswer,
+        answer_index: answerIndex,
+        permutation: permutation,
         time_spent: timeSpent
       })
     });